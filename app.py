@@ -1,11 +1,22 @@
 from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional
-from databahn.scripts.main import Chat
+from databahn.tools.tool_registry import ToolRegistry
+from databahn.utils.state_store import StateConflictError, create_state_store, history_lengths, new_history_entries
+from settings import (
+    CHAT_HISTORY_LIMIT,
+    MCP_TOOL_REGISTRY_TTL_SECONDS,
+    STATE_STORE_MAX_HISTORY,
+    STATE_STORE_MAX_THREADS,
+    STATE_STORE_REDIS_URL,
+    STATE_STORE_TTL_SECONDS,
+)
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from mcp import ClientSession, StdioServerParameters
-from copy import deepcopy
 from pydantic import BaseModel
+import json
 import logging
+import os
 from mcp.client.stdio import stdio_client
 import asyncio
 
@@ -16,14 +27,17 @@ app_state: Dict[str, Any] = {}
 
 # npx mcp-remote https://browser.mcp.cloudflare.com/sse
 # create server
+# MCP starts servers with a minimal default environment; pass ours so exported settings reach them
 cyber_sec_server_params=StdioServerParameters(
     command="python",
-    args=["databahn/mcp_servers/scripts/cyber_sec_server.py"]
+    args=["-m", "databahn.mcp_servers.scripts.cyber_sec_server"],
+    env=dict(os.environ),
     )
 
 internet_search_server_params = StdioServerParameters(
     command="python",
-    args=["databahn/mcp_servers/scripts/internet_search_server.py"]
+    args=["-m", "databahn.mcp_servers.scripts.internet_search_server"],
+    env=dict(os.environ),
 )
 
 cloudflare_browser_params = StdioServerParameters(
@@ -31,12 +45,6 @@ cloudflare_browser_params = StdioServerParameters(
     args=["mcp-remote", "https://browser.mcp.cloudflare.com/sse"]
 )
 
-redis_object = {
-        "user_message": "",
-        "orchestrator": {"chat_history": []},
-        "response": {"chat_history": []}
-    }
-
 # Define the request model for the API endpoint, now with thread_id
 class QueryRequest(BaseModel):
     query: str
@@ -52,7 +60,15 @@ async def lifespan(app: FastAPI):
     # This code runs on startup
     logger.info("Application startup...")
     logger.info("Initializing Chat instance...")
+    # Imported here: building the retrieval indexes is startup work, not something importing the app should do
+    from databahn.scripts.main import Chat
     app_state["chat_instance"] = Chat()
+    app_state["state_store"] = create_state_store(
+        STATE_STORE_REDIS_URL,
+        max_threads=STATE_STORE_MAX_THREADS,
+        max_history=STATE_STORE_MAX_HISTORY,
+        ttl_seconds=STATE_STORE_TTL_SECONDS,
+    )
     
     logger.info("Connecting to MCP server...")
     # The stdio_client context manager will handle the read/write streams
@@ -60,10 +76,12 @@ async def lifespan(app: FastAPI):
                stdio_client(internet_search_server_params) as (is_read, is_write), \
                stdio_client(cloudflare_browser_params) as (cf_read, cf_write):
         
+        tool_registry = ToolRegistry(ttl_seconds=MCP_TOOL_REGISTRY_TTL_SECONDS)
+
         # Create client sessions for both servers
-        async with ClientSession(cs_read, cs_write) as cs_session, \
-                   ClientSession(is_read, is_write) as is_session, \
-                   ClientSession(cf_read, cf_write) as cf_session:
+        async with ClientSession(cs_read, cs_write, message_handler=tool_registry.message_handler("cyber_security")) as cs_session, \
+                   ClientSession(is_read, is_write, message_handler=tool_registry.message_handler("internet_search")) as is_session, \
+                   ClientSession(cf_read, cf_write, message_handler=tool_registry.message_handler("cloudflare_browser")) as cf_session:
             
             # Initialize both sessions concurrently
             await asyncio.gather(
@@ -76,6 +94,13 @@ async def lifespan(app: FastAPI):
             # app_state["mcp_sessions"]["cyber_security"] = cs_session
             # app_state["mcp_sessions"]["internet_search"] = is_session
             app_state['mcp_sessions'] = [cs_session, is_session, cf_session]
+
+            # Fetch every session's tools once, concurrently, for the Agent and Dispatcher to share
+            tool_registry.register("cyber_security", cs_session)
+            tool_registry.register("internet_search", is_session)
+            tool_registry.register("cloudflare_browser", cf_session)
+            await tool_registry.refresh()
+            app_state['tool_registry'] = tool_registry
             
             logger.info("All MCP sessions initialized and ready.")
             yield
@@ -95,27 +120,68 @@ async def handle_query(request: QueryRequest):
     Accepts a user query, processes it through the Chat class, 
     and returns the final response.
     """
-    if "mcp_sessions" not in app_state or "chat_instance" not in app_state:
+    if "tool_registry" not in app_state or "chat_instance" not in app_state:
         raise HTTPException(status_code=503, detail="MCP session not ready. Please try again shortly.")
 
-    session_list = app_state["mcp_sessions"]
+    tool_registry = app_state["tool_registry"]
     chat = app_state["chat_instance"]
+    state_store = app_state["state_store"]
 
-    # read state from redis using user_id in cache_id
-    # Initialize a new, clean state for each request to ensure statelessness
-    global redis_object
-    state = deepcopy(redis_object)
-    state['user_message'] = request.query
-    # limit chat history to last 5 messages
-    state["orchestrator"]["chat_history"] = state["orchestrator"]["chat_history"][-5:]
-    state["response"]["chat_history"] = state["response"]["chat_history"][-5:]
     try:
-        # Process the query using the shared session and a fresh state
-        response_content, state = await chat.process_query(request.query, session_list, state)
-        redis_object = deepcopy(state)
-        # write state to redis using the cache_id created above(based on user_id)
+        # load the recent history of this thread; only the entries this turn adds are written back
+        state, version = await state_store.load(request.thread_id, CHAT_HISTORY_LIMIT)
+        state['user_message'] = request.query
+        loaded_lengths = history_lengths(state)
+        response_content, state = await chat.process_query(request.query, tool_registry, state)
+        await state_store.append(request.thread_id, new_history_entries(state, loaded_lengths), version)
         logger.info(f"the response content we are returning:{response_content}")
         return QueryResponse(response=response_content, state=state)
+    except StateConflictError as e:
+        logger.warning(f"Concurrent turn on thread {request.thread_id}: {e}")
+        raise HTTPException(status_code=409, detail="Another query on this thread finished first. Please retry.")
     except Exception as e:
         logger.error(f"An error occurred while processing query: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="An internal error occurred.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="An internal error occurred.")
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Formats one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/query/stream")
+async def handle_query_stream(request: QueryRequest):
+    """
+    Accepts a user query and streams progress as server-sent events: `started` at once,
+    the tables and tools retrieved for the query, the tool calls chosen, each tool as it
+    finishes, the response tokens as they are generated, and a final `done` event with
+    the full response and state. The turn's history is appended to the thread's state
+    once the response is complete.
+    """
+    if "tool_registry" not in app_state or "chat_instance" not in app_state:
+        raise HTTPException(status_code=503, detail="MCP session not ready. Please try again shortly.")
+
+    tool_registry = app_state["tool_registry"]
+    chat = app_state["chat_instance"]
+    state_store = app_state["state_store"]
+
+    state, version = await state_store.load(request.thread_id, CHAT_HISTORY_LIMIT)
+    state['user_message'] = request.query
+    loaded_lengths = history_lengths(state)
+
+    async def event_stream():
+        try:
+            async for event, data in chat.process_query_stream(request.query, tool_registry, state):
+                if event == "done":
+                    await state_store.append(request.thread_id, new_history_entries(state, loaded_lengths), version)
+                    logger.info(f"the response content we streamed:{data.get('response')}")
+                    data = {**data, "state": state}
+                yield format_sse(event, data)
+        except StateConflictError as e:
+            logger.warning(f"Concurrent turn on thread {request.thread_id}: {e}")
+            yield format_sse("error", {"detail": "Another query on this thread finished first. Please retry.", "status": 409})
+        except Exception as e:
+            logger.error(f"An error occurred while streaming query: {e}", exc_info=True)
+            yield format_sse("error", {"detail": "An internal error occurred."})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
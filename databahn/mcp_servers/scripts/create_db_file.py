@@ -1,11 +1,15 @@
 import pandas as pd
 import sqlite3
 import os
+import time
 
-def convert_csv_to_sqlite(db_name='cybersecurity_mcp.db'):
+def convert_csv_to_sqlite(db_name='cybersecurity_mcp.db', chunk_size=10_000):
     """
     Reads all CSV files in the current directory, and converts each
     to a table in a new SQLite database.
+
+    Each CSV is read and written `chunk_size` rows at a time, so memory stays
+    constant for large files. Column types are inferred from the first chunk.
     """
     # Find all CSV files in the current directory
     csv_files = [
@@ -22,26 +26,35 @@ def convert_csv_to_sqlite(db_name='cybersecurity_mcp.db'):
 
     # Create a connection to the SQLite database
     conn = sqlite3.connect(db_name)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
 
     # Process each CSV file
     for csv_file in csv_files:
         try:
-            # Read the CSV file into a pandas DataFrame
-            df = pd.read_csv(csv_file)
-
-           # Get the base filename from the full path (e.g., 'cloud.csv')
+            # Get the base filename from the full path (e.g., 'cloud.csv')
             base_filename = os.path.basename(csv_file)
             # Use the filename (without .csv) as the table name (e.g., 'cloud')
-            table_name = os.path.splitext(base_filename)[0]            # Write the DataFrame to a table in the SQLite database
-            df.to_sql(table_name, conn, if_exists='replace', index=False)
-            print(f"Successfully converted '{csv_file}' to table '{table_name}' in '{db_name}'.")
+            table_name = os.path.splitext(base_filename)[0]
+            start = time.perf_counter()
+            rows = 0
+            # Write the CSV to a table in the SQLite database one chunk at a time
+            for i, df in enumerate(pd.read_csv(csv_file, chunksize=chunk_size)):
+                df.to_sql(table_name, conn, if_exists='replace' if i == 0 else 'append', index=False, chunksize=chunk_size)
+                conn.commit()
+                rows += len(df)
+            elapsed = time.perf_counter() - start
+            print(f"Successfully converted '{csv_file}' to table '{table_name}' in '{db_name}' "
+                  f"({rows} rows, {rows / max(elapsed, 1e-9):,.0f} rows/s).")
 
         except Exception as e:
             print(f"Error processing '{csv_file}': {e}")
 
     # Close the database connection
+    conn.execute("PRAGMA synchronous=NORMAL")
     conn.close()
     print(f"\nDatabase '{db_name}' created successfully with {len(csv_files)} tables.")
 
 if __name__ == '__main__':
+    # Run from the repository root: python -m databahn.mcp_servers.scripts.create_db_file
     convert_csv_to_sqlite()
\ No newline at end of file
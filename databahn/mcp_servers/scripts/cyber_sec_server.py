@@ -1,16 +1,31 @@
-import sqlite3
 from mcp.server.fastmcp import FastMCP
 import logging
+from databahn.utils.sqlite_pool import SQLitePool
+from databahn.utils.sql_results import tsv_fetcher
+from databahn.utils.sql_cache import SQLResultCache
+from databahn.utils.columnar import ColumnarEngine
+from settings import (SQLITE_POOL_SIZE, SQL_QUERY_TIMEOUT_SECONDS, SQL_WORKLOAD_LOG, SQL_RESULT_MAX_ROWS, SQL_RESULT_MAX_BYTES, SQL_ENGINE,
+                  SQL_RESULT_CACHE_SIZE, SQL_RESULT_CACHE_MAX_BYTES)
 logger = logging.getLogger(__name__)
 
+# Run from the repository root: python -m databahn.mcp_servers.scripts.cyber_sec_server
+
 # --- Server Definition ---
 mcp = FastMCP(name="CYBER_SECURITY_SERVER")
 
-conn = sqlite3.connect('databahn/mcp_servers/data/cybersecurity_mcp.db')
+DB_FILE = 'databahn/mcp_servers/data/cybersecurity_mcp.db'
+# Queries run read-only in worker threads, so concurrent tool calls do not block the server's event loop
+db_pool = SQLitePool(DB_FILE, max_connections=SQLITE_POOL_SIZE, timeout_seconds=SQL_QUERY_TIMEOUT_SECONDS, workload_log=SQL_WORKLOAD_LOG)
+# Row- and byte-capped TSV, the same format lookup_cybser_security_data returns
+fetch_result = tsv_fetcher(SQL_RESULT_MAX_ROWS, SQL_RESULT_MAX_BYTES)
+# Repeated queries are answered from memory until the database file changes
+sql_result_cache = SQLResultCache(max_entries=SQL_RESULT_CACHE_SIZE, max_bytes=SQL_RESULT_CACHE_MAX_BYTES)
+# Aggregations can run on DuckDB over the Parquet export instead, depending on SQL_ENGINE
+columnar_engine = ColumnarEngine(DB_FILE, max_workers=SQLITE_POOL_SIZE, timeout_seconds=SQL_QUERY_TIMEOUT_SECONDS)
 
 
 @mcp.tool()
-def get_cybser_security_info(sql_query: str) -> str:
+async def get_cybser_security_info(sql_query: str) -> str:
     """
     Execute SQL queries safely
     Here is the description of tables handled by this tool.
@@ -65,9 +80,14 @@ def get_cybser_security_info(sql_query: str) -> str:
     print(f"The incoming SQL query: {sql_query}")
 
     try:
-        result = conn.execute(sql_query).fetchall()
-        conn.commit()
-        return "\n".join(str(row) for row in result)
+        cache_key = sql_result_cache.make_key(DB_FILE, sql_query)
+        result = sql_result_cache.get(cache_key)
+        if result is None:
+            result = await columnar_engine.try_execute(sql_query, fetch_result, SQL_ENGINE)
+            if result is None:
+                result = await db_pool.execute(sql_query, fetch=fetch_result)
+            sql_result_cache.put(cache_key, result)
+        return result
     except Exception as e:
         return ValueError
 
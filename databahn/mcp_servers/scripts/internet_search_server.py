@@ -2,35 +2,127 @@ import asyncio
 import aiohttp
 from bs4 import BeautifulSoup
 import logging
-import html2text
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Optional
+from urllib.parse import parse_qs, urljoin, urlparse
 from mcp.server.fastmcp import FastMCP
+from databahn.utils.crawl_cache import CrawlCache
+from databahn.utils.embedding_client import embedding_client
+from databahn.utils.html_extraction import LandmarkTracker, extract_document, sniff_content_kind
+from databahn.utils.passage_ranking import rank_passages
+from settings import (SEARCH_ENDPOINT, SEARCH_USER_AGENT, SEARCH_MAX_LINKS, CRAWL_MAX_CONCURRENCY, HTTP_MAX_CONNECTIONS,
+                  HTTP_MAX_CONNECTIONS_PER_HOST, HTTP_TOTAL_TIMEOUT_SECONDS, HTTP_CONNECT_TIMEOUT_SECONDS,
+                  HTTP_READ_TIMEOUT_SECONDS, HTTP_DNS_CACHE_TTL_SECONDS, CRAWL_CACHE_FILE, CRAWL_CACHE_TTL_SECONDS,
+                  CRAWL_CACHE_MAX_BYTES, SEARCH_CACHE_TTL_SECONDS, EXTRACTION_WORKERS, EXTRACTION_MAX_INPUT_CHARS,
+                  EXTRACTION_MAX_OUTPUT_CHARS, EXTRACTION_BACKEND, CRAWL_MAX_BYTES, CRAWL_MAX_PDF_BYTES, CRAWL_CHUNK_BYTES,
+                  PASSAGE_RANKING_ENABLED, PASSAGE_TOKEN_BUDGET, PASSAGE_MAX_TOKENS, PASSAGE_RERANK_ENABLED,
+                  PASSAGE_RERANK_CANDIDATES)
 
 # --- Prerequisite Installation ---
 # Make sure you have the required libraries installed:
 # pip install aiohttp beautifulsoup4 html2text
+# Optional, for faster main-content extraction: pip install lxml
+# Optional, to read PDF advisories: pip install pypdf
+
+# Run from the repository root: python -m databahn.mcp_servers.scripts.internet_search_server
 
 logger = logging.getLogger(__name__)
 
+# One pooled session for the life of the server, so searches and crawls reuse
+# keep-alive connections and cached DNS instead of paying TCP/TLS setup per call.
+http_session: Optional[aiohttp.ClientSession] = None
+# Follow-up questions re-crawl the same advisories; fresh pages come back without network I/O or parsing.
+crawl_cache = CrawlCache(CRAWL_CACHE_FILE, ttl_seconds=CRAWL_CACHE_TTL_SECONDS, search_ttl_seconds=SEARCH_CACHE_TTL_SECONDS,
+                         max_bytes=CRAWL_CACHE_MAX_BYTES) if CRAWL_CACHE_FILE else None
+# Parsing large pages is CPU-bound, so it runs in worker processes rather than on the event loop
+extraction_pool: Optional[ProcessPoolExecutor] = None
+
+
+def create_http_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_MAX_CONNECTIONS,
+        limit_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL_SECONDS,
+        keepalive_timeout=30,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=HTTP_TOTAL_TIMEOUT_SECONDS,
+        connect=HTTP_CONNECT_TIMEOUT_SECONDS,
+        sock_read=HTTP_READ_TIMEOUT_SECONDS,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, headers={"User-Agent": SEARCH_USER_AGENT})
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Returns the shared session, creating it if the server lifespan has not (e.g. in method_main_test)."""
+    global http_session
+    if http_session is None or http_session.closed:
+        http_session = create_http_session()
+    return http_session
+
+
+async def extract_markdown(url: str, body: bytes, kind: str, encoding: Optional[str] = None, content_type: str = "",
+                           truncated: bool = False) -> str:
+    """Runs extract_document in the extraction process pool, or a thread if EXTRACTION_WORKERS is 0."""
+    global extraction_pool
+    extract = partial(extract_document, url, body, kind, encoding=encoding, content_type=content_type, truncated=truncated,
+                      max_input_chars=EXTRACTION_MAX_INPUT_CHARS, max_output_chars=EXTRACTION_MAX_OUTPUT_CHARS,
+                      backend=EXTRACTION_BACKEND)
+    if EXTRACTION_WORKERS <= 0:
+        return await asyncio.to_thread(extract)
+    if extraction_pool is None:
+        # Forking a process that runs an event loop and executor threads can deadlock the child
+        extraction_pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+    return await asyncio.get_running_loop().run_in_executor(extraction_pool, extract)
+
+
+@asynccontextmanager
+async def http_session_lifespan(server: FastMCP):
+    global extraction_pool
+    session = get_http_session()
+    try:
+        yield {"http_session": session}
+    finally:
+        await session.close()
+        if extraction_pool is not None:
+            extraction_pool.shutdown(wait=False, cancel_futures=True)
+            extraction_pool = None
+
+
 # --- Server Definition ---
-mcp = FastMCP(name="INTERNET_SEARCH_CRAWLER_SERVER")
+mcp = FastMCP(name="INTERNET_SEARCH_CRAWLER_SERVER", lifespan=http_session_lifespan)
+
+
+def resolve_result_url(href: str) -> str:
+    """Unwraps DuckDuckGo's //duckduckgo.com/l/?uddg=<target> redirect links, saving a round trip per crawl."""
+    url = urljoin(SEARCH_ENDPOINT, href)
+    parsed = urlparse(url)
+    target = parse_qs(parsed.query).get("uddg")
+    if parsed.path.startswith("/l/") and target:
+        return target[0]
+    return url
+
 
 async def internet_search(session: aiohttp.ClientSession, query: str) -> list:
     """
     Performs an asynchronous internet search using DuckDuckGo's HTML endpoint 
-    and returns the result URLs.
+    (or SEARCH_ENDPOINT) and returns the result URLs, deduplicated in rank order.
     """
     if not query:
         return []
+    if crawl_cache is not None:
+        cached_links = await asyncio.to_thread(crawl_cache.get_search, query, SEARCH_ENDPOINT)
+        if cached_links is not None:
+            return cached_links
     
     # Using DuckDuckGo's HTML version which is more scraper-friendly
-    search_url = "https://html.duckduckgo.com/html/"
     params = {"q": query}
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
 
     try:
-        async with session.post(search_url, data=params, headers=headers) as response:
+        async with session.post(SEARCH_ENDPOINT, data=params) as response:
             response.raise_for_status()
             html = await response.text()
             soup = BeautifulSoup(html, 'html.parser')
@@ -40,7 +132,11 @@ async def internet_search(session: aiohttp.ClientSession, query: str) -> list:
             for result in soup.find_all('div', class_='result'):
                 link_tag = result.find('a', class_='result__a')
                 if link_tag and link_tag.has_attr('href'):
-                    links.append(link_tag['href'])
+                    link = resolve_result_url(link_tag['href'])
+                    if link not in links:
+                        links.append(link)
+            if crawl_cache is not None and links:
+                await asyncio.to_thread(crawl_cache.put_search, query, SEARCH_ENDPOINT, links)
             return links
     except aiohttp.ClientError as e:
         logger.error(f"An error occurred during internet search: {e}")
@@ -49,28 +145,65 @@ async def internet_search(session: aiohttp.ClientSession, query: str) -> list:
         logger.error(f"An unexpected error occurred during search: {e}")
         return []
 
+async def read_body(response: aiohttp.ClientResponse, content_type: str) -> tuple:
+    """
+    Streams a response body in CRAWL_CHUNK_BYTES chunks and stops as soon as there is enough of it.
+
+    The kind is sniffed from the first chunk. Binary bodies stop there; HTML stops once its
+    main content has closed (see LandmarkTracker); text stops after what the extractor can
+    keep; anything stops at CRAWL_MAX_BYTES (CRAWL_MAX_PDF_BYTES for PDFs). Only the bytes
+    read are held, so memory stays flat however large the page is.
+    Returns (body, kind, truncated), where truncated means the body was cut short.
+    """
+    chunks = []
+    size = 0
+    kind = None
+    limit = CRAWL_MAX_BYTES
+    tracker = LandmarkTracker()
+    async for chunk in response.content.iter_chunked(CRAWL_CHUNK_BYTES):
+        chunks.append(chunk)
+        size += len(chunk)
+        if kind is None:
+            kind = sniff_content_kind(content_type, chunk)
+            if kind == "pdf":
+                limit = CRAWL_MAX_PDF_BYTES
+            elif kind == "text":
+                limit = min(limit, EXTRACTION_MAX_OUTPUT_CHARS * 4)  # at most 4 UTF-8 bytes per character
+        if kind == "binary" or size >= limit or (kind == "html" and tracker.feed(chunk)):
+            return b"".join(chunks)[:limit], kind, not response.content.at_eof()
+    return b"".join(chunks), kind or "text", False
+
+
 async def crawl_page(session: aiohttp.ClientSession, url: str) -> str:
     """
     Asynchronously crawls a single web page and converts its main content to Markdown.
+
+    A fresh copy in the crawl cache is returned directly. A stale copy is revalidated
+    with a conditional GET and reused on 304 Not Modified. The body is streamed with a
+    byte ceiling (see read_body); PDFs and plain text get their own extractors and other
+    binary content is skipped.
     """
+    cached = await asyncio.to_thread(crawl_cache.get_page, url) if crawl_cache is not None else None
+    if cached is not None and crawl_cache.is_fresh(cached):
+        return cached.markdown
     print(f"Crawling: {url}")
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
     try:
-        async with session.get(url, headers=headers, timeout=10) as response:
+        headers = cached.conditional_headers() if cached is not None else {}
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and cached is not None:
+                await asyncio.to_thread(crawl_cache.mark_revalidated, url, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+                return cached.markdown
             response.raise_for_status()
-            html = await response.text()
+            content_type = response.headers.get("Content-Type", "")
+            body, kind, truncated = await read_body(response, content_type)
+            if kind == "binary":
+                body = b""  # nothing to keep; the skip note is cached so the download is not retried
 
-            soup = BeautifulSoup(html, 'html.parser')
-            content = soup.find('article') or soup.find('main') or soup.body
-            
-            if content:
-                h = html2text.HTML2Text()
-                h.ignore_links = False
-                markdown = h.handle(str(content))
-                return f"--- Content from {url} ---\n\n{markdown}"
-            return f"--- No main content found at {url} ---"
+            markdown = await extract_markdown(url, body, kind, response.charset, content_type, truncated)
+            if crawl_cache is not None:
+                await asyncio.to_thread(crawl_cache.put_page, url, response.headers.get("ETag"),
+                                        response.headers.get("Last-Modified"), body, markdown)
+            return markdown
         
     except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error(f"Failed to crawl {url}. Error: {e}")
@@ -83,8 +216,9 @@ async def crawl_page(session: aiohttp.ClientSession, url: str) -> str:
 @mcp.tool()
 async def perform_internet_search_and_crawl(query: str, top_k_links: int = 3) -> str:
     """
-    Asynchronously searches the internet, crawls the first two results concurrently, 
-    and returns their content as Markdown.
+    Asynchronously searches the internet, crawls the top results concurrently, 
+    and returns the passages most relevant to the query as Markdown, each page's
+    passages under its source URL.
     query: 
       input_query with for which user wants information about
       top_k_links - number of top most searched links we want to use - by deault its 3.
@@ -93,21 +227,34 @@ async def perform_internet_search_and_crawl(query: str, top_k_links: int = 3) ->
     """
     print(f"Received async search and crawl query: {query}")
     try:
-        async with aiohttp.ClientSession() as session:
-            search_results = await internet_search(session, query)
-            
-            if not search_results:
-                return "No search results found."
-            
-            # Limit to the first 2 links
-            links_to_crawl = search_results[:2]
-            # Create a list of crawl tasks to run concurrently
-            tasks = [crawl_page(session, link) for link in links_to_crawl]
-            
-            # Run tasks concurrently and gather results
-            crawled_results = await asyncio.gather(*tasks)
-            joined_crawled_results = "\n\n".join(crawled_results)
-            return joined_crawled_results
+        session = get_http_session()
+        search_results = await internet_search(session, query)
+        
+        if not search_results:
+            return "No search results found."
+        
+        # Limit to the top_k_links links, capped by SEARCH_MAX_LINKS
+        links_to_crawl = search_results[:max(1, min(top_k_links, SEARCH_MAX_LINKS))]
+        # Crawl concurrently, but no more than CRAWL_MAX_CONCURRENCY pages at a time
+        semaphore = asyncio.Semaphore(CRAWL_MAX_CONCURRENCY)
+
+        async def bounded_crawl(link: str) -> str:
+            async with semaphore:
+                return await crawl_page(session, link)
+
+        # Run tasks concurrently and gather results, in rank order
+        crawled_results = await asyncio.gather(*(bounded_crawl(link) for link in links_to_crawl))
+        if PASSAGE_RANKING_ENABLED:
+            return await rank_passages(
+                query,
+                list(zip(links_to_crawl, crawled_results)),
+                token_budget=PASSAGE_TOKEN_BUDGET,
+                passage_tokens=PASSAGE_MAX_TOKENS,
+                embedding_client=embedding_client if PASSAGE_RERANK_ENABLED else None,
+                rerank_candidates=PASSAGE_RERANK_CANDIDATES,
+            )
+        joined_crawled_results = "\n\n".join(crawled_results)
+        return joined_crawled_results
 
     except Exception as e:
         logger.error(f"Failed to execute search and crawl: {e}")
@@ -119,6 +266,7 @@ async def method_main_test():
     results = await perform_internet_search_and_crawl("what are the incidents reported in April 2025 w.r.t cloud misconfigurations?")
     print("--- Test Results ---")
     print(results)
+    await get_http_session().close()
 
 
 if __name__ == '__main__':
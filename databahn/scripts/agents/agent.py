@@ -1,6 +1,6 @@
 import json
 import logging
-from typing import cast, List, Dict
+from typing import cast, AsyncIterator, List, Dict, Optional, Tuple
 
 from mcp import ClientSession
 from openai.types.chat import (
@@ -8,41 +8,101 @@ from openai.types.chat import (
     ChatCompletionToolParam,
 )
 from databahn.tools.tools import MANUAL_FUNCTION_MAP
-from databahn.utils.vector_search import setup_vector_db, get_embedding, find_top_k_relevant_tables, MANUAL_TOOL_TABLE_COLLECTION
+from databahn.tools.tool_registry import ToolRegistry
+from databahn.utils.vector_search import MANUAL_TOOL_COLUMN_INDEX, MANUAL_TOOL_TABLE_INDEX, refresh_manual_tool_indexes_if_changed
+from databahn.utils.embedding_client import embedding_client
+from databahn.utils.embedding_store import EmbeddingStore
+from databahn.utils.query_cache import QueryEmbeddingCache
+from databahn.utils.schema_pruning import build_schema_block
+from databahn.utils.tool_retrieval import mcp_tool_index
 from databahn.utils.file_util import ReadFile
-from copy import deepcopy
+from databahn.utils.context_builder import build_context, lookup
+from databahn.utils.tokens import count_tokens
 import openai
 from base import openai_client
+from settings import (
+    QUERY_EMBEDDING_CACHE_FILE,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+    SCHEMA_PRUNING_ENABLED,
+)
 
 
 logging.basicConfig(level=logging.INFO)
 # Configure a logger for this module
 logger = logging.getLogger(__name__)
 
+
+def create_query_embedding_cache() -> QueryEmbeddingCache:
+    """Builds the query-embedding cache from the QUERY_EMBEDDING_CACHE_* settings."""
+    return QueryEmbeddingCache(
+        max_entries=QUERY_EMBEDDING_CACHE_SIZE,
+        ttl_seconds=QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+        disk_store=EmbeddingStore(QUERY_EMBEDDING_CACHE_FILE) if QUERY_EMBEDDING_CACHE_FILE else None,
+    )
+
+
 class Agent:
     """An agent that processes queries using LLMs and a set of tools."""
     
-    def __init__(self, system_prompt_path: str, user_prompt_path: str):
+    def __init__(self, system_prompt_path: str, user_prompt_path: str, context_token_budget: Optional[int] = None,
+                 query_embedding_cache: Optional[QueryEmbeddingCache] = None):
         """
         Initializes the Agent by loading prompts from file paths and setting up state.
+
+        With a `context_token_budget`, tool results substituted into the user prompt are
+        fitted into whatever the budget leaves after the prompts and the chat history.
+        Query embeddings are cached in `query_embedding_cache` when one is given
+        (see create_query_embedding_cache).
         """
         self.system_prompt = ReadFile.read_file(system_prompt_path)
         self.user_prompt = ReadFile.read_file(user_prompt_path)
+        self.context_token_budget = context_token_budget
+        self.query_embedding_cache = query_embedding_cache
         
-    async def _get_manual_tools(self, query: str) -> list[ChatCompletionToolParam]:
-        """Generates tool definitions based on semantic search."""
-        query_embeddings = get_embedding(query)
-        top_k_tables = find_top_k_relevant_tables(query_embeddings, MANUAL_TOOL_TABLE_COLLECTION, top_k=3)
-        modified_top_k_tables = {}
-        for table in top_k_tables:
-            current_table_object = {}
-            for key in table:
-                if key == "table_name":
-                    current_table_name = table.get(key)
-                else:
-                    current_table_object[key] = table.get(key)
-            modified_top_k_tables[current_table_name] = current_table_object
-        logger.info(f"the top k tables chosen for the query are: {modified_top_k_tables}")
+    async def _embed_query(self, query: str):
+        """Returns the query embedding, serving repeated questions from the query-embedding cache."""
+        cache = self.query_embedding_cache
+        if cache is not None:
+            query_embeddings = await cache.get(query, embedding_client.model)
+            if query_embeddings is not None:
+                logger.info(f"query embedding cache hit, stats: {cache.stats()}")
+                return query_embeddings
+        query_embeddings = await embedding_client.embed(query)
+        if cache is not None and query_embeddings is not None:
+            await cache.put(query, embedding_client.model, query_embeddings)
+        return query_embeddings
+
+    async def _get_manual_tools(self, query_embeddings) -> Tuple[list[ChatCompletionToolParam], Dict, List[str]]:
+        """
+        Generates tool definitions based on semantic search.
+
+        Tables are retrieved first; with schema pruning enabled, a second column-level
+        stage keeps only the columns relevant to the query plus join keys. Returns the
+        tools, a report of the schema prompt tokens saved by pruning and the names of
+        the tables retrieved.
+        """
+        added, removed = await refresh_manual_tool_indexes_if_changed()
+        if added or removed:
+            logger.info(f"table and column indexes refreshed after a metadata change: {added} tables added, {removed} removed")
+        top_k_tables = MANUAL_TOOL_TABLE_INDEX.search(query_embeddings, top_k=3)
+        schema_report = {}
+        if SCHEMA_PRUNING_ENABLED and query_embeddings is not None:
+            table_descriptions, schema_report = build_schema_block(query_embeddings, top_k_tables, MANUAL_TOOL_COLUMN_INDEX)
+            logger.info(f"the pruned schema chosen for the query is:\n{table_descriptions}")
+            logger.info(f"schema pruning token report: {schema_report}")
+        else:
+            modified_top_k_tables = {}
+            for table in top_k_tables:
+                current_table_object = {}
+                for key in table:
+                    if key == "table_name":
+                        current_table_name = table.get(key)
+                    else:
+                        current_table_object[key] = table.get(key)
+                modified_top_k_tables[current_table_name] = current_table_object
+            table_descriptions = modified_top_k_tables
+            logger.info(f"the top k tables chosen for the query are: {modified_top_k_tables}")
         manual_function_tools_list: List[ChatCompletionToolParam] = []
         for val in MANUAL_FUNCTION_MAP.values():
             manual_function_tools_list.append(
@@ -50,7 +110,7 @@ class Agent:
                     "type": "function",
                     "function": {
                         "name": val.name,
-                        "description": val.description + f"<table_descriptions>{modified_top_k_tables}</table_descriptions>",
+                        "description": val.description + f"<table_descriptions>{table_descriptions}</table_descriptions>",
                         "parameters": {
                             "type": "object",
                             "properties": val.args,
@@ -59,26 +119,25 @@ class Agent:
                     }
                 }
             )
-        return manual_function_tools_list
-
-    async def _get_mcp_tools(self, session_list: ClientSession) -> list[ChatCompletionToolParam]:
-        """Retrieves tool definitions from an active MCP session."""
-        mcp_tools_list: list[ChatCompletionToolParam] = []
-        for session in session_list:
-            session_tool_list = await session.list_tools()
-            mcp_tools_list += [{
-                    "type": "function",
-                    "function": {
-                        "name": tool.name,
-                        "description": tool.description or "",
-                        "parameters": tool.inputSchema,
-                    },
-                }
-                for tool in session_tool_list.tools if tool.inputSchema.get("properties")]
-        return mcp_tools_list
+        return manual_function_tools_list, schema_report, [table.get("table_name") for table in top_k_tables]
+
+    async def _get_mcp_tools(self, tool_registry: ToolRegistry, query_embeddings=None) -> list[ChatCompletionToolParam]:
+        """
+        Retrieves tool definitions for the MCP sessions from the shared tool registry.
 
-    async def _llm_call(self, messages: list[ChatCompletionMessageParam], tools: list[ChatCompletionToolParam] = None):
-        """A dedicated method for making calls to the OpenAI API."""
+        Each session's tool list is embedded once (and again only when it changes), and
+        only the tools relevant to the query plus the pinned tools are returned.
+        """
+        catalogs = []
+        for session_name, mcp_tools_list in (await tool_registry.get_tool_schemas()).items():
+            catalogs.append(await mcp_tool_index.refresh(session_name, mcp_tools_list))
+        return mcp_tool_index.select(catalogs, query_embeddings)
+
+    async def _llm_call(self, messages: list[ChatCompletionMessageParam], tools: list[ChatCompletionToolParam] = None, stream: bool = False):
+        """
+        A dedicated method for making calls to the OpenAI API.
+        With stream=True the OpenAI async stream of completion chunks is returned instead of the full response.
+        """
         params = {
             "model": "gpt-4o", # Using a recommended model
             "max_tokens": 4096,
@@ -88,6 +147,8 @@ class Agent:
         if tools:
             params["tools"] = tools
             params["tool_choice"] = "auto"
+        if stream:
+            params["stream"] = True
         
         logger.info(f"Making LLM call with {len(messages)} messages and {len(tools) if tools else 0} tools.")
         try:
@@ -101,58 +162,105 @@ class Agent:
         except Exception as e:
             logger.error(f"An unexpected error occurred during the LLM call: {e}")
 
-    def replace_keys(self, prompt, state, replace_keys):
-        val = ""
+    def replace_keys(self, prompt, state, replace_keys, results_token_budget: Optional[int] = None):
+        """
+        Substitutes each (possibly dotted) key in the prompt with its value from the state, as JSON.
+
+        When `results_token_budget` is given, a list of tool results is rendered with
+        build_context instead, and its report is returned under the key.
+        """
         updated_prompt = prompt
+        context_reports = {}
         for key in replace_keys:
-            if "." in key:
-                key_list = key.split(".")
-                if isinstance(state, dict):
-                    val = deepcopy(state)
-                    for key_part in key_list:
-                        if isinstance(val, dict):
-                            val = val.get(key_part)
-                json_val = json.dumps(val)
-                updated_prompt = updated_prompt.replace(key, json_val)
+            val = lookup(state, key)
+            if results_token_budget is not None and isinstance(val, list):
+                replacement, context_reports[key] = build_context(val, results_token_budget)
             else:
-                val = state.get(key) or val
-                json_val = json.dumps(val)
-                updated_prompt = updated_prompt.replace(key, json_val)
-        return updated_prompt
+                replacement = json.dumps(val)
+            updated_prompt = updated_prompt.replace(key, replacement)
+        return updated_prompt, context_reports
 
 
-    async def process_query(self, input_query: str, session_list: List[ClientSession], state: Dict, agent_type: str = "orchestrator") -> str:
+    async def prepare_call(self, input_query: str, tool_registry: ToolRegistry, state: Dict, agent_type: str):
         """
-        Processes a user query by orchestrating tools and LLM calls.
+        Builds the messages and tools for an LLM call and returns them with the updated chat history.
+
+        For the orchestrator this is the retrieval stage: the tables and tools chosen for the
+        query are recorded in `state[agent_type]['tables']` and `state[agent_type]['tools']`.
         """
         # Add the user's query to the chat history
         # self.messages.append({"role": "user", "content": input_query})
         system_prompt_replace_keys = []
-        system_prompt = self.replace_keys(self.system_prompt, state, system_prompt_replace_keys)
+        system_prompt, _ = self.replace_keys(self.system_prompt, state, system_prompt_replace_keys)
         if agent_type == "orchestrator":
             user_prompt_replace_keys = ["user_message"]
         if agent_type == "response":
             user_prompt_replace_keys = ["user_message", "orchestrator.results"]
-        user_prompt = self.replace_keys(self.user_prompt, state, user_prompt_replace_keys)
-
         chat_history = state.get(agent_type, {}).get("chat_history", []) or []
+
+        results_token_budget = None
+        if self.context_token_budget is not None:
+            # Whatever the prompts and the chat history leave of the budget goes to the tool results
+            used_tokens = count_tokens(system_prompt) + count_tokens(self.user_prompt) + count_tokens(state.get("user_message") or "")
+            used_tokens += sum(count_tokens(str(message.get("content") or "")) for message in chat_history)
+            results_token_budget = max(self.context_token_budget - used_tokens, 0)
+        user_prompt, context_reports = self.replace_keys(self.user_prompt, state, user_prompt_replace_keys, results_token_budget)
+        if context_reports:
+            state[agent_type]['context'] = context_reports
+            logger.info(f"{agent_type} context report: {context_reports}")
         available_tools = []
         if agent_type == "orchestrator":
-            tools_from_manual_functions = await self._get_manual_tools(input_query)
-            tools_from_mcp_servers = await self._get_mcp_tools(session_list)
+            query_embeddings = await self._embed_query(input_query)
+            tools_from_manual_functions, schema_report, table_names = await self._get_manual_tools(query_embeddings)
+            state[agent_type]['schema_pruning'] = schema_report
+            state[agent_type]['tables'] = table_names
+            tools_from_mcp_servers = await self._get_mcp_tools(tool_registry, query_embeddings)
             # collect the tools
             tools_set_from_manual_functions = set([obj.get("function", {}).get("name", "") for obj in tools_from_manual_functions])
             tools_set_from_mcp_servers = set([obj.get("function", {}).get("name", "") for obj in tools_from_mcp_servers])
             # response = await session.list_tools()
 
             available_tools = tools_from_manual_functions + tools_from_mcp_servers
+            state[agent_type]['tools'] = [tool.get("function", {}).get("name", "") for tool in available_tools]
 
         # 2. Make the initial LLM call to decide on an action
         system_message = {"role": "system", "content": system_prompt}
         current_message = {"role": "user", "content": user_prompt}
         chat_history.append(current_message)
         messages = [system_message] + chat_history
+        state[agent_type]['prompt_tokens'] = sum(count_tokens(str(message.get("content") or "")) for message in messages)
+        logger.info(f"{agent_type} prompt tokens: {state[agent_type]['prompt_tokens']}")
+        return messages, available_tools, chat_history
+
+    async def process_query(self, input_query: str, tool_registry: ToolRegistry, state: Dict, agent_type: str = "orchestrator") -> str:
+        """
+        Processes a user query by orchestrating tools and LLM calls.
+        """
+        messages, available_tools, chat_history = await self.prepare_call(input_query, tool_registry, state, agent_type)
+        return await self.complete_call(messages, available_tools, chat_history, state, agent_type)
+
+    async def complete_call(self, messages: list[ChatCompletionMessageParam], available_tools: list[ChatCompletionToolParam],
+                            chat_history: list, state: Dict, agent_type: str):
+        """Makes the LLM call `prepare_call` built and records the chat history in the state."""
         res = await self._llm_call(messages=messages, tools=available_tools)
         logger.info(f"recieved response from {agent_type}: \n {res}")
         state[agent_type]['chat_history'] = chat_history
-        return res, state
\ No newline at end of file
+        return res, state
+
+    async def process_query_stream(self, input_query: str, tool_registry: ToolRegistry, state: Dict, agent_type: str = "response") -> AsyncIterator[str]:
+        """
+        Processes a user query like `process_query`, but yields the completion's text as it is generated.
+        The chat history in `state` is updated before the first token is yielded.
+        """
+        messages, available_tools, chat_history = await self.prepare_call(input_query, tool_registry, state, agent_type)
+        state[agent_type]['chat_history'] = chat_history
+        stream = await self._llm_call(messages=messages, tools=available_tools, stream=True)
+        if stream is None:
+            return
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except openai.APIError as e:
+            logger.error(f"OpenAI API Error while streaming from {agent_type}: {e}")
+        logger.info(f"finished streaming the response from {agent_type}")
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import math
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Dict
+
+from databahn.scripts.benchmark_ingestion import generate_firewall_logs
+from databahn.scripts.db_generator import create_database_and_tables
+from databahn.utils.columnar import ColumnarEngine, export_parquet
+from databahn.utils.sql_results import tsv_fetcher
+
+# Group-by and top-k questions the orchestrator asks of firewall_logs. Every ORDER BY has a
+# tiebreaker, so both engines must return the same rows in the same order. The data has
+# NULL policies and mixed-case actions, so NULL ordering and LIKE's case folding are exercised.
+BENCHMARK_QUERIES = {
+    "top_denied_sources": (
+        "SELECT source_ip, COUNT(*) AS denied FROM firewall_logs WHERE action = 'deny' "
+        "GROUP BY source_ip ORDER BY denied DESC, source_ip LIMIT 10"
+    ),
+    "actions_by_protocol": "SELECT protocol, action, COUNT(*) FROM firewall_logs GROUP BY protocol, action ORDER BY protocol, action",
+    "busiest_ports_per_policy": (
+        "SELECT policy, destination_port, COUNT(*) AS hits, COUNT(DISTINCT source_ip) AS sources FROM firewall_logs "
+        "GROUP BY policy, destination_port ORDER BY hits DESC, policy, destination_port LIMIT 10"
+    ),
+    "denied_per_hour": (
+        "SELECT strftime('%Y-%m-%d %H', timestamp) AS hour, COUNT(*) FROM firewall_logs WHERE action LIKE 'DENY' "
+        "GROUP BY hour ORDER BY hour LIMIT 24"
+    ),
+    "average_source_port": "SELECT protocol, AVG(source_port), MAX(destination_port) / 2 FROM firewall_logs GROUP BY protocol ORDER BY protocol",
+    "hits_per_policy": "SELECT policy, COUNT(*) FROM firewall_logs GROUP BY policy ORDER BY policy",
+    "policies_desc": "SELECT DISTINCT policy FROM firewall_logs ORDER BY policy DESC",
+}
+# Every seventh row loses its policy
+NULL_POLICY_EVERY = 7
+# What the SQL tools return, so headers and NULL rendering are compared too
+fetch_result = tsv_fetcher(200, 32000)
+
+
+def _cells_match(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    try:
+        return math.isclose(float(a), float(b), rel_tol=1e-9)
+    except ValueError:
+        return False
+
+
+def results_match(left: str, right: str) -> bool:
+    """Compares two rendered TSV results cell by cell, allowing float aggregates to differ in summation order."""
+    left_lines, right_lines = left.split("\n"), right.split("\n")
+    if len(left_lines) != len(right_lines):
+        return False
+    for left_line, right_line in zip(left_lines, right_lines):
+        left_cells, right_cells = left_line.split("\t"), right_line.split("\t")
+        if len(left_cells) != len(right_cells) or not all(map(_cells_match, left_cells, right_cells)):
+            return False
+    return True
+
+
+async def time_engines(db_name: str, repeats: int) -> Dict[str, tuple]:
+    """Returns the best-of-`repeats` SQLite and DuckDB time per query in ms, and whether their rendered results matched."""
+    engine = ColumnarEngine(db_name)
+    timings = {}
+    try:
+        with sqlite3.connect(db_name) as conn:
+            for name, query in BENCHMARK_QUERIES.items():
+                sqlite_best, duckdb_best = float('inf'), float('inf')
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    sqlite_result = fetch_result(conn.execute(query))
+                    sqlite_best = min(sqlite_best, time.perf_counter() - start)
+                    start = time.perf_counter()
+                    duckdb_result = await engine.execute(query, fetch_result)
+                    duckdb_best = min(duckdb_best, time.perf_counter() - start)
+                timings[name] = (sqlite_best * 1000, duckdb_best * 1000, results_match(sqlite_result, duckdb_result))
+    finally:
+        engine.close()
+    return timings
+
+
+if __name__ == '__main__':
+    # Run from the repository root: python -m databahn.scripts.benchmark_columnar --rows 1000000 10000000
+    parser = argparse.ArgumentParser(description="Compare SQLite and DuckDB-over-Parquet on group-by/top-k firewall_logs queries.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--metadata", default='data_1_1/metadata.csv', help="Metadata CSV with column types.")
+    args = parser.parse_args()
+
+    for num_rows in args.rows:
+        with tempfile.TemporaryDirectory() as work_directory:
+            csv_path = os.path.join(work_directory, 'firewall_logs.csv')
+            db_path = os.path.join(work_directory, 'firewall.db')
+            generate_firewall_logs(csv_path, num_rows, malformed_every=0)
+            create_database_and_tables(db_path, [csv_path], metadata_file=args.metadata)
+            with sqlite3.connect(db_path) as conn:
+                conn.execute(f"UPDATE firewall_logs SET policy = NULL WHERE rowid % {NULL_POLICY_EVERY} = 0")
+            start = time.perf_counter()
+            export_parquet(db_path)
+            export_seconds = time.perf_counter() - start
+            timings = asyncio.run(time_engines(db_path, args.repeats))
+
+        print(f"\n{num_rows:,} rows (Parquet export {export_seconds:.1f}s)")
+        print(f"{'query':<26} {'sqlite_ms':>10} {'duckdb_ms':>10} {'speedup':>8} {'match':>6}")
+        for name, (sqlite_ms, duckdb_ms, matched) in timings.items():
+            print(f"{name:<26} {sqlite_ms:>10.1f} {duckdb_ms:>10.1f} {sqlite_ms / duckdb_ms:>7.1f}x {'yes' if matched else 'NO':>6}")
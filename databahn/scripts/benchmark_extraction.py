@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import glob
+import os
+import random
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, Set, Tuple
+
+from databahn.utils.html_extraction import html_to_markdown
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def synthetic_advisory(index: int, table_rows: int, with_landmark: bool, rng: random.Random) -> Tuple[str, Set[str], Set[str]]:
+    """
+    Builds an advisory-style page surrounded by navigation, sidebar, cookie banner and footer.
+
+    Every main-content paragraph and table row carries a unique `mainN` token and every
+    boilerplate block a `boilerN` token, so extraction recall and boilerplate leakage
+    can be measured exactly. Returns (html, main tokens, boilerplate tokens).
+    """
+    main_tokens, boiler_tokens = set(), set()
+
+    def token(prefix: str, bucket: Set[str]) -> str:
+        value = f"{prefix}{index}x{len(bucket)}"
+        bucket.add(value)
+        return value
+
+    nav = "".join(f'<li><a href="/section/{i}">Menu {token("boiler", boiler_tokens)}</a></li>' for i in range(30))
+    sidebar = "".join(f'<li><a href="/related/{i}">Related advisory {token("boiler", boiler_tokens)}</a></li>' for i in range(15))
+    paragraphs = "".join(
+        f"<p>The vulnerability {token('main', main_tokens)} allows a remote attacker to execute code, bypass authentication, "
+        f"or escalate privileges on affected {rng.choice(['routers', 'servers', 'agents', 'gateways'])}, "
+        f"as described in the vendor bulletin {token('main', main_tokens)}.</p>"
+        for _ in range(12)
+    )
+    rows = "".join(
+        f"<tr><td>product-{i}</td><td>{rng.randint(1, 9)}.{rng.randint(0, 20)}</td><td>fixed {token('main', main_tokens)}</td></tr>"
+        for i in range(table_rows)
+    )
+    article = (
+        f"<h1>Security advisory {token('main', main_tokens)}</h1>{paragraphs}"
+        f"<table><tr><th>Product</th><th>Version</th><th>Status</th></tr>{rows}</table>"
+        f"<pre>curl -X POST /api/{token('main', main_tokens)}</pre>"
+    )
+    body_main = f"<article>{article}</article>" if with_landmark else f'<div class="advisory-body">{article}</div>'
+    html = (
+        "<!DOCTYPE html><html><head><title>Advisory</title><style>body{font:14px sans-serif}</style>"
+        "<script>window.analytics = {};</script></head><body>"
+        f'<header><nav class="top-nav"><ul>{nav}</ul></nav></header>'
+        f'<div class="cookie-banner">We use cookies {token("boiler", boiler_tokens)}</div>'
+        f'<div class="layout"><div class="sidebar"><ul>{sidebar}</ul></div>{body_main}</div>'
+        f'<footer>Copyright {token("boiler", boiler_tokens)} | <a href="/privacy">Privacy</a></footer>'
+        "</body></html>"
+    )
+    return html, main_tokens, boiler_tokens
+
+
+def load_corpus(corpus_directory: str = None, crawl_cache_file: str = None) -> List[Tuple[str, str]]:
+    """Reads saved pages as (url, html) from a directory of .html files or from the crawl cache's stored bodies."""
+    pages = []
+    if corpus_directory:
+        for path in sorted(glob.glob(os.path.join(corpus_directory, "**", "*.htm*"), recursive=True)):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                pages.append((f"file://{os.path.abspath(path)}", f.read()))
+    if crawl_cache_file:
+        with sqlite3.connect(crawl_cache_file) as conn:
+            for url, body in conn.execute("SELECT url, body FROM pages"):
+                pages.append((url, body.decode("utf-8", errors="replace")))
+    return pages
+
+
+def words(text: str) -> Set[str]:
+    return set(WORD_PATTERN.findall(text.lower()))
+
+
+def time_backend(pages: List[Tuple[str, str]], backend: str) -> Tuple[float, List[str]]:
+    """Extracts every page inline with one backend; returns the seconds taken and the outputs."""
+    start = time.perf_counter()
+    outputs = [html_to_markdown(url, html, max_output_chars=10**9, backend=backend) for url, html in pages]
+    return time.perf_counter() - start, outputs
+
+
+async def max_loop_stall(pages: List[Tuple[str, str]], backend: str, workers: int) -> Tuple[float, float]:
+    """
+    Extracts all pages concurrently from an event loop, inline or in a process pool, while a
+    ticker measures the longest stall of the loop. Returns (wall seconds, longest stall in ms).
+    """
+    loop = asyncio.get_running_loop()
+    stalls = [0.0]
+    done = asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stalls[0] = max(stalls[0], now - last)
+            last = now
+
+    async def extract_inline(url, html):
+        await asyncio.sleep(0)
+        return html_to_markdown(url, html, backend=backend)
+
+    ticker_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            await asyncio.gather(*(loop.run_in_executor(pool, partial(html_to_markdown, url, html, backend=backend)) for url, html in pages))
+    else:
+        await asyncio.gather(*(extract_inline(url, html) for url, html in pages))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ticker_task
+    return elapsed, stalls[0] * 1000
+
+
+if __name__ == '__main__':
+    # Run from the repository root: python -m databahn.scripts.benchmark_extraction [--corpus DIR] [--crawl-cache FILE]
+    parser = argparse.ArgumentParser(description="Compare html2text extraction with the lxml main-content extractor.")
+    parser.add_argument("--corpus", help="Directory of saved .html pages.")
+    parser.add_argument("--crawl-cache", help="A CRAWL_CACHE_FILE whose stored page bodies are used as the corpus.")
+    parser.add_argument("--pages", type=int, default=40, help="Synthetic pages when no corpus is given.")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    labelled = []
+    if args.corpus or args.crawl_cache:
+        pages = load_corpus(args.corpus, args.crawl_cache)
+    else:
+        # A mix of small and ~0.5 MB pages, half without an <article> landmark
+        pages = []
+        for i in range(args.pages):
+            html, main_tokens, boiler_tokens = synthetic_advisory(i, 5000 if i % 4 == 0 else 40, with_landmark=i % 2 == 0, rng=rng)
+            pages.append((f"https://advisories.example/{i}", html))
+            labelled.append((main_tokens, boiler_tokens))
+    megabytes = sum(len(html) for _, html in pages) / 1e6
+    print(f"{len(pages)} pages, {megabytes:.1f} MB of HTML")
+
+    results: Dict[str, Tuple[float, List[str]]] = {backend: time_backend(pages, backend) for backend in ("html2text", "lxml")}
+    print(f"\n{'backend':<10} {'pages/s':>8} {'MB/s':>6} {'output_kb':>10}")
+    for backend, (seconds, outputs) in results.items():
+        print(f"{backend:<10} {len(pages) / seconds:>8.1f} {megabytes / seconds:>6.2f} {sum(map(len, outputs)) / 1e3:>10.0f}")
+
+    if labelled:
+        print(f"\n{'backend':<10} {'main recall':>12} {'boilerplate leaked':>19}")
+        for backend, (_, outputs) in results.items():
+            recall = sum(len(main & words(output)) / len(main) for (main, _), output in zip(labelled, outputs)) / len(labelled)
+            leaked = sum(len(boiler & words(output)) / len(boiler) for (_, boiler), output in zip(labelled, outputs)) / len(labelled)
+            print(f"{backend:<10} {recall:>12.1%} {leaked:>19.1%}")
+    else:
+        legacy_outputs, new_outputs = results["html2text"][1], results["lxml"][1]
+        overlap = sum(len(words(old) & words(new)) / max(len(words(old)), 1) for old, new in zip(legacy_outputs, new_outputs)) / len(pages)
+        print(f"\nWords of the html2text output also in the lxml output: {overlap:.1%}")
+
+    print(f"\n{'event loop':<28} {'wall_s':>7} {'max_stall_ms':>13}")
+    for label, backend, workers in (("html2text inline", "html2text", 0), ("lxml inline", "lxml", 0),
+                                    (f"lxml in {args.workers} processes", "lxml", args.workers)):
+        elapsed, stall = asyncio.run(max_loop_stall(pages, backend, workers))
+        print(f"{label:<28} {elapsed:>7.2f} {stall:>13.1f}")
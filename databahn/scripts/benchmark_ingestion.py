@@ -0,0 +1,83 @@
+import argparse
+import csv
+import os
+import random
+import resource
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from databahn.scripts.db_generator import create_database_and_tables
+
+FIREWALL_LOG_HEADER = ['log_id', 'timestamp', 'source_ip', 'source_port', 'destination_ip', 'destination_port', 'protocol', 'action', 'policy']
+PROTOCOLS = ['TCP', 'UDP', 'ICMP']
+POLICIES = ['Allow-DNS-Outbound', 'Default-Deny-Inbound', 'Allow-HTTPS-Outbound', 'Allow-SSH-Internal', 'Block-Known-Bad']
+
+
+def generate_firewall_logs(path: str, num_rows: int, malformed_every: int = 0, seed: int = 0) -> None:
+    """
+    Streams a synthetic firewall_logs.csv with the data_1_1 columns to `path`.
+
+    Args:
+        path (str): Output CSV path.
+        num_rows (int): Rows to write.
+        malformed_every (int): If set, every n-th row is written with a missing column, to exercise bad-row reporting.
+        seed (int): Random seed.
+    """
+    rng = random.Random(seed)
+    start = datetime(2023, 10, 26)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIREWALL_LOG_HEADER)
+        batch = []
+        for i in range(1, num_rows + 1):
+            row = [
+                i,
+                (start + timedelta(seconds=i // 10)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                f"192.168.{rng.randint(0, 15)}.{rng.randint(1, 254)}",
+                rng.randint(1024, 65535),
+                f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+                rng.choice((53, 80, 443, 22, 3389)),
+                rng.choice(PROTOCOLS),
+                'deny' if rng.random() < 0.2 else 'allow',
+                rng.choice(POLICIES),
+            ]
+            if malformed_every and i % malformed_every == 0:
+                row = row[:-1]
+            batch.append(row)
+            if len(batch) >= 100_000:
+                writer.writerows(batch)
+                batch = []
+        writer.writerows(batch)
+
+
+if __name__ == '__main__':
+    # Run from the repository root: python -m databahn.scripts.benchmark_ingestion
+    parser = argparse.ArgumentParser(description="Measure CSV ingestion throughput on a generated firewall_logs.csv.")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--malformed-every", type=int, default=1_000_000, help="Write a malformed row every n rows (0 for none).")
+    parser.add_argument("--metadata", default='data_1_1/metadata.csv', help="Metadata CSV with column types.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_directory:
+        csv_path = os.path.join(work_directory, 'firewall_logs.csv')
+        start = time.perf_counter()
+        generate_firewall_logs(csv_path, args.rows, args.malformed_every)
+        print(f"Generated {args.rows} rows ({os.path.getsize(csv_path) / 1e6:.0f} MB) in {time.perf_counter() - start:.1f}s")
+
+        results = []
+        for chunk_size in args.chunk_sizes:
+            db_path = os.path.join(work_directory, f'firewall_{chunk_size}.db')
+            start = time.perf_counter()
+            rows = create_database_and_tables(db_path, [csv_path], metadata_file=args.metadata, chunk_size=chunk_size)
+            elapsed = time.perf_counter() - start
+            results.append((chunk_size, rows, elapsed, os.path.getsize(db_path) / 1e6))
+            os.remove(db_path)
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if os.uname().sysname == 'Linux' else 1024 * 1024)
+    print(f"\n{'chunk_size':>10} {'rows':>10} {'seconds':>8} {'rows/s':>10} {'db_mb':>7}")
+    for chunk_size, rows, elapsed, db_mb in results:
+        print(f"{chunk_size:>10} {rows:>10} {elapsed:>8.1f} {rows / elapsed:>10,.0f} {db_mb:>7.0f}")
+    print(f"Peak RSS of the whole run: {peak_rss_mb:.0f} MB")
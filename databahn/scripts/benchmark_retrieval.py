@@ -0,0 +1,94 @@
+import argparse
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from databahn.utils.retrieval_backends import create_backend, faiss
+
+
+def make_synthetic_catalog(num_entries: int, dim: int, num_clusters: int = 64, seed: int = 0):
+    """
+    Generates a clustered synthetic catalog and a set of queries near catalog entries.
+
+    Real schema embeddings cluster by domain (logs, assets, vulnerabilities), so the
+    vectors are drawn around a fixed number of centroids rather than uniformly.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(num_clusters, dim)).astype(np.float32)
+    assignments = rng.integers(0, num_clusters, size=num_entries)
+    catalog = centroids[assignments] + 0.35 * rng.normal(size=(num_entries, dim)).astype(np.float32)
+    return catalog.astype(np.float32), rng
+
+
+def make_queries(catalog: np.ndarray, rng, num_queries: int) -> np.ndarray:
+    picks = rng.integers(0, catalog.shape[0], size=num_queries)
+    noise = 0.25 * rng.normal(size=(num_queries, catalog.shape[1])).astype(np.float32)
+    return (catalog[picks] + noise).astype(np.float32)
+
+
+def recall_at_k(exact_ids: np.ndarray, approx_ids: np.ndarray) -> float:
+    """Fraction of the exact top-k ids that the approximate search also returned."""
+    hits = sum(len(set(exact_row.tolist()) & set(approx_row.tolist())) for exact_row, approx_row in zip(exact_ids, approx_ids))
+    return hits / exact_ids.size
+
+
+def run_benchmark(sizes: List[int], dim: int, top_k: int, num_queries: int, backends: List[str]) -> List[Dict]:
+    """
+    Builds every backend on synthetic catalogs and measures build time, query latency and recall@k.
+
+    Exact brute-force numpy search is the ground truth for recall.
+    """
+    results = []
+    for size in sizes:
+        catalog, rng = make_synthetic_catalog(size, dim)
+        queries = make_queries(catalog, rng, num_queries)
+        ids = np.arange(size)
+
+        exact = create_backend("numpy", dim)
+        exact.add(ids, catalog)
+        _, exact_ids = exact.search(queries, top_k)
+
+        for backend_name in backends:
+            backend = create_backend(backend_name, dim)
+            start = time.perf_counter()
+            backend.add(ids, catalog)
+            build_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for query in queries:
+                backend.search(query, top_k)
+            single_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+            start = time.perf_counter()
+            _, approx_ids = backend.search(queries, top_k)
+            batch_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+            results.append({
+                "entries": size,
+                "backend": backend_name,
+                "build_s": build_seconds,
+                "query_ms": single_ms,
+                "batched_query_ms": batch_ms,
+                f"recall@{top_k}": recall_at_k(exact_ids, approx_ids),
+            })
+    return results
+
+
+if __name__ == '__main__':
+    # Run from the repository root: python -m databahn.scripts.benchmark_retrieval
+    parser = argparse.ArgumentParser(description="Compare retrieval backends against exact search on synthetic catalogs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--dim", type=int, default=256, help="Embedding dimension (text-embedding-3-small is 1536).")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", default=None)
+    args = parser.parse_args()
+
+    backends = args.backends or (["numpy", "faiss_flat", "faiss_ivf", "faiss_hnsw"] if faiss is not None else ["numpy"])
+    rows = run_benchmark(args.sizes, args.dim, args.top_k, args.queries, backends)
+
+    recall_key = f"recall@{args.top_k}"
+    print(f"{'entries':>8} {'backend':>11} {'build_s':>8} {'query_ms':>9} {'batch_ms':>9} {recall_key:>10}")
+    for row in rows:
+        print(f"{row['entries']:>8} {row['backend']:>11} {row['build_s']:>8.2f} {row['query_ms']:>9.3f} {row['batched_query_ms']:>9.3f} {row[recall_key]:>10.3f}")
@@ -0,0 +1,127 @@
+import argparse
+import csv
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from databahn.scripts.db_generator import create_database_and_tables, suggest_indexes
+from databahn.scripts.query_db import CRITICAL_PENDING_VULNERABILITIES_QUERY
+
+SAMPLE_DIRECTORY = 'data_1_1/'
+SCALED_TABLES = ['asset_inventory', 'vulnerability_scans', 'firewall_logs', 'endpoint_security']
+
+# Canned analyst questions: the query from query_db.py plus the timestamp-range, IP-join and
+# asset lookups the orchestrator generates most often.
+BENCHMARK_QUERIES = {
+    "critical_pending_vulnerabilities": CRITICAL_PENDING_VULNERABILITIES_QUERY,
+    "firewall_last_hour": "SELECT COUNT(*) FROM firewall_logs WHERE timestamp BETWEEN '2023-10-26T11:00:00Z' AND '2023-10-26T12:00:00Z'",
+    "denied_traffic_by_asset": (
+        "SELECT ai.asset_name, COUNT(*) FROM firewall_logs fl JOIN asset_inventory ai ON fl.source_ip = ai.ip_address "
+        "WHERE fl.action = 'deny' GROUP BY ai.asset_name"
+    ),
+    "endpoint_events_for_asset": "SELECT * FROM endpoint_security WHERE asset_id = 42",
+}
+
+
+def asset_ip(asset_index: int) -> str:
+    return f"10.{asset_index // 65536 % 256}.{asset_index // 256 % 256}.{asset_index % 256}"
+
+
+def write_scaled_csvs(output_directory: str, num_rows: int, seed: int = 0) -> List[str]:
+    """
+    Writes scaled-up copies of the data_1_1 sample tables by resampling their rows.
+
+    Ids are renumbered, asset_id references point at one of num_rows / 100 assets, asset
+    IPs are made unique (half the firewall traffic comes from them) and log timestamps
+    advance one second per row from the sample's start, so filters and joins keep
+    realistic selectivity.
+    """
+    rng = random.Random(seed)
+    num_assets = max(num_rows // 100, 10)
+    start = datetime(2023, 10, 26, 0, 0, 0)
+    csv_files = []
+    for table_name in SCALED_TABLES:
+        with open(os.path.join(SAMPLE_DIRECTORY, f"{table_name}.csv"), 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            samples = [row for row in reader if len(row) == len(header)]
+        size = num_assets if table_name == 'asset_inventory' else num_rows
+        path = os.path.join(output_directory, f"{table_name}.csv")
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for i in range(size):
+                row = dict(zip(header, rng.choice(samples)))
+                row[header[0]] = str(i + 1)
+                if 'asset_id' in row and header[0] != 'asset_id':
+                    row['asset_id'] = str(rng.randint(1, num_assets))
+                if 'timestamp' in row:
+                    row['timestamp'] = (start + timedelta(seconds=i)).strftime('%Y-%m-%dT%H:%M:%SZ')
+                if table_name == 'asset_inventory':
+                    row['ip_address'] = asset_ip(i)
+                if table_name == 'firewall_logs' and rng.random() < 0.5:
+                    row['source_ip'] = asset_ip(rng.randrange(num_assets))
+                writer.writerow([row[column] for column in header])
+        csv_files.append(path)
+    metadata_file = os.path.join(output_directory, 'metadata.csv')
+    shutil.copy(os.path.join(SAMPLE_DIRECTORY, 'metadata.csv'), metadata_file)
+    return csv_files
+
+
+def time_queries(db_name: str, repeats: int) -> Dict[str, float]:
+    """Returns the best-of-`repeats` wall time of each benchmark query, in milliseconds."""
+    timings = {}
+    with sqlite3.connect(db_name) as conn:
+        for name, query in BENCHMARK_QUERIES.items():
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                conn.execute(query).fetchall()
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best * 1000
+    return timings
+
+
+if __name__ == '__main__':
+    # Run from the repository root: python -m databahn.scripts.benchmark_sqlite_indexes
+    parser = argparse.ArgumentParser(description="Compare the canned queries on an all-TEXT unindexed database and a typed, indexed one.")
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows per log table.")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_directory:
+        csv_files = write_scaled_csvs(work_directory, args.rows)
+        baseline_db = os.path.join(work_directory, 'baseline.db')
+        indexed_db = os.path.join(work_directory, 'indexed.db')
+
+        start = time.perf_counter()
+        create_database_and_tables(baseline_db, csv_files, metadata_file='', build_indexes=False)
+        baseline_build = time.perf_counter() - start
+        start = time.perf_counter()
+        create_database_and_tables(indexed_db, csv_files, metadata_file=os.path.join(work_directory, 'metadata.csv'))
+        indexed_build = time.perf_counter() - start
+
+        results = {"all TEXT, no indexes": time_queries(baseline_db, args.repeats),
+                   "typed + automatic indexes": time_queries(indexed_db, args.repeats)}
+
+        # Feed the canned queries in as the workload and apply the suggested indexes
+        suggestions = suggest_indexes(indexed_db, list(BENCHMARK_QUERIES.values()))
+        with sqlite3.connect(indexed_db) as conn:
+            for statement, _ in suggestions:
+                conn.execute(statement)
+            conn.execute("ANALYZE")
+        results["+ workload-suggested indexes"] = time_queries(indexed_db, args.repeats)
+
+    print(f"\nBuild: baseline {baseline_build:.1f}s, typed + indexed {indexed_build:.1f}s")
+    print("Suggested indexes:")
+    for statement, count in suggestions:
+        print(f"  {statement}  ({count} queries)")
+    names = list(BENCHMARK_QUERIES)
+    print(f"\n{'configuration':<30}" + "".join(f"{name[:26]:>28}" for name in names))
+    for configuration, timings in results.items():
+        print(f"{configuration:<30}" + "".join(f"{timings[name]:>26.2f}ms" for name in names))
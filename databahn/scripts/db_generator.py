@@ -1,25 +1,196 @@
 import sqlite3
 import csv
 import os
+import re
+import json
+import argparse
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+from databahn.utils.columnar import export_parquet, parquet_directory_for
+from databahn.utils.partitions import PARTITION_GRANULARITIES, archive_partitions, drop_partitioned_table, partition_table, roll_head
 
-def create_database_and_tables(db_name='security_logs.db', csv_files=None):
+# Column types metadata.csv may declare. Anything else is created as TEXT.
+SQLITE_COLUMN_TYPES = {"INTEGER", "REAL", "NUMERIC", "TEXT", "DATE", "DATETIME", "BLOB"}
+# Columns that are indexed automatically: join keys (asset_id, cve_id, CVE, source_ip, ip_address) and timestamps.
+INDEX_COLUMN_PATTERN = re.compile(r"(^|_)(id|cve|ip|ip_address)$|(^|_)(timestamp|date|time)$", re.IGNORECASE)
+# Bad rows printed in full per file; the rest are only counted.
+MAX_REPORTED_BAD_ROWS = 20
+# FROM/JOIN clauses, to map the aliases EXPLAIN QUERY PLAN reports back to table names.
+TABLE_ALIAS_PATTERN = re.compile(r"\b(?:from|join)\s+([A-Za-z_]\w*)(?:\s+(?:as\s+)?([A-Za-z_]\w*))?", re.IGNORECASE)
+SQL_KEYWORDS = {"where", "join", "inner", "left", "right", "full", "cross", "outer", "on", "group", "order", "limit", "union", "natural", "using"}
+
+
+def sanitize_column_name(column: str) -> str:
+    """Sanitize column names for SQL (replace spaces, etc.)"""
+    return column.strip().replace(' ', '_').replace('-', '_').replace('.', '_')
+
+
+def load_column_types(metadata_file: Optional[str]) -> Dict[str, Dict[str, str]]:
+    """
+    Reads the declared column types from a metadata CSV with table_name, column_name and data_type columns.
+
+    Returns:
+        Dict[str, Dict[str, str]]: table name -> column name -> SQLite type. Empty if the file
+        is missing or has no data_type column, in which case every column is created as TEXT.
+    """
+    if not metadata_file or not os.path.exists(metadata_file):
+        return {}
+    column_types: Dict[str, Dict[str, str]] = {}
+    with open(metadata_file, 'r', newline='', encoding='utf-8') as csvfile:
+        reader = csv.DictReader(csvfile)
+        if not reader.fieldnames or 'data_type' not in reader.fieldnames:
+            print(f"Warning: '{metadata_file}' has no data_type column, so every column will be created as TEXT "
+                  f"and only name-matched columns indexed. Use data_1_1/metadata.csv for the typed schema.")
+            return {}
+        for row in reader:
+            data_type = (row.get('data_type') or '').strip().upper()
+            if row.get('table_name') and row.get('column_name'):
+                column_types.setdefault(row['table_name'].strip(), {})[sanitize_column_name(row['column_name'])] = \
+                    data_type if data_type in SQLITE_COLUMN_TYPES else 'TEXT'
+    return column_types
+
+
+def index_columns(columns: List[str], column_types: Dict[str, str]) -> List[str]:
+    """Returns the columns of a table that get an index: join keys and DATE/DATETIME or timestamp columns."""
+    return [
+        column for column in columns
+        if INDEX_COLUMN_PATTERN.search(column) or column_types.get(column) in ('DATE', 'DATETIME')
+    ]
+
+
+def create_indexes(cursor: sqlite3.Cursor, table_name: str, columns: List[str]) -> List[str]:
+    """Creates one single-column index per column and returns the index names."""
+    index_names = []
+    for column in columns:
+        index_name = f"idx_{table_name}_{column}"
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS "{index_name}" ON {table_name} ("{column}")')
+        index_names.append(index_name)
+    return index_names
+
+
+def create_table(cursor: sqlite3.Cursor, table_name: str, columns: List[str], column_types: Dict[str, str]) -> None:
+    """Creates a table with the declared column types (TEXT where none is declared)."""
+    columns_def = ", ".join([f'"{col}" {column_types.get(col, "TEXT")}' for col in columns])
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({columns_def})")
+
+
+def insert_rows(conn: sqlite3.Connection, insert_sql: str, reader, column_count: int, typed_positions: List[int],
+                file_path: str, chunk_size: int = 10_000, first_line: int = 2,
+                before_commit: Optional[Callable[[int], None]] = None) -> Tuple[int, int]:
+    """
+    Streams CSV rows into a table with executemany, one transaction per chunk.
+
+    Only one chunk is held in memory at a time. Empty and malformed rows are
+    skipped and reported (the first MAX_REPORTED_BAD_ROWS of them in full). If a
+    chunk fails to insert, it is rolled back and retried row by row, so only the
+    failing rows are lost. `before_commit`, if given, is called with the number of
+    rows the chunk inserted inside the chunk's transaction, e.g. to record progress
+    atomically with the rows.
+
+    Returns:
+        Tuple[int, int]: The number of rows inserted and the number skipped.
+    """
+    rows_inserted = 0
+    rows_skipped = 0
+
+    def report(message: str) -> None:
+        if rows_skipped <= MAX_REPORTED_BAD_ROWS:
+            print(message)
+
+    def flush(chunk: List[Tuple[int, list]]) -> None:
+        nonlocal rows_inserted, rows_skipped
+        try:
+            conn.executemany(insert_sql, [row for _, row in chunk])
+            if before_commit:
+                before_commit(len(chunk))
+            conn.commit()
+            rows_inserted += len(chunk)
+        except sqlite3.Error:
+            conn.rollback()
+            chunk_inserted = 0
+            for line_number, row in chunk:
+                try:
+                    conn.execute(insert_sql, row)
+                    chunk_inserted += 1
+                except sqlite3.Error as e:
+                    rows_skipped += 1
+                    report(f"Error inserting row {line_number} from {file_path}: {e}. Row data: {row}")
+            if before_commit:
+                before_commit(chunk_inserted)
+            conn.commit()
+            rows_inserted += chunk_inserted
+
+    chunk = []
+    # Enumerate to get line numbers for better error messages
+    for i, row in enumerate(reader, first_line):
+        # Skip empty rows
+        if not row:
+            continue
+        # Check if the row has the correct number of columns
+        if len(row) != column_count:
+            rows_skipped += 1
+            report(f"Warning: Skipping malformed row {i} in {file_path}. Expected {column_count} columns, but found {len(row)}. Data: {row}")
+            continue
+        for position in typed_positions:
+            if row[position] == '':
+                row[position] = None
+        chunk.append((i, row))
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    return rows_inserted, rows_skipped
+
+
+def create_database_and_tables(db_name='security_logs.db', csv_files=None, metadata_file=None, build_indexes=True, chunk_size=10_000,
+                               partition_by=None):
     """
     Creates a new SQLite database, creates tables based on CSV file names,
     and populates them with data from the CSV files.
 
+    Column types come from the data_type column of the metadata CSV (TEXT when it has
+    none). Rows are streamed in chunks of `chunk_size`, each inserted with executemany
+    in its own transaction, so memory stays constant however large the CSV is. The
+    load runs in WAL mode with synchronous=OFF. Once a table is loaded, its join keys
+    and timestamp columns are indexed, and ANALYZE is run at the end so the query
+    planner has statistics for them.
+
+    With `partition_by` set, each log feed in PARTITIONED_TABLES is split into one
+    table per day or week behind a UNION ALL view with the original name, so the
+    SQL tools can skip the partitions a timestamp predicate rules out.
+
     Args:
         db_name (str): The name of the SQLite database file to create.
         csv_files (list): A list of paths to the CSV files.
+        metadata_file (str): The metadata CSV declaring column types. Defaults to the metadata.csv in csv_files.
+        build_indexes (bool): Whether to create the automatic indexes and run ANALYZE.
+        chunk_size (int): Rows per executemany call and transaction.
+        partition_by (Optional[str]): 'day' or 'week' to partition the log feeds, None for flat tables.
+
+    Returns:
+        int: The total number of rows inserted.
     """
     if csv_files is None:
         print("No CSV files provided.")
-        return
+        return 0
 
+    if metadata_file is None:
+        metadata_file = next((f for f in csv_files if os.path.basename(f) == 'metadata.csv'), None)
+    column_types_by_table = load_column_types(metadata_file)
+
+    total_rows = 0
     # Connect to the SQLite database. This will create the file if it doesn't exist.
     try:
         conn = sqlite3.connect(db_name)
         cursor = conn.cursor()
         print(f"Database '{db_name}' created successfully.")
+        # WAL lets the SQL tools keep reading during a reload. synchronous=OFF skips the fsync per
+        # commit: a crash mid-load can corrupt the file, but the load is simply rerun from the CSVs.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        load_start = time.perf_counter()
 
         # Process each CSV file
         for file_path in csv_files:
@@ -32,47 +203,41 @@ def create_database_and_tables(db_name='security_logs.db', csv_files=None):
                     
                     # Get header row to define table columns
                     header = next(reader)
-                    # Sanitize column names for SQL (replace spaces, etc.)
-                    sql_columns = [col.strip().replace(' ', '_').replace('-', '_').replace('.', '_') for col in header]
+                    sql_columns = [sanitize_column_name(col) for col in header]
                     header_col_count = len(sql_columns)
+                    column_types = column_types_by_table.get(table_name, {})
+                    # Empty cells in typed columns are stored as NULL rather than ''
+                    typed_positions = [i for i, col in enumerate(sql_columns) if column_types.get(col, 'TEXT') != 'TEXT']
 
-                    # Drop table if it already exists
+                    # Drop table if it already exists, or its view and partitions if it was partitioned
+                    drop_partitioned_table(conn, table_name)
                     cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
-                    
-                    # Create table schema dynamically
-                    # For simplicity, all columns are treated as TEXT.
-                    columns_def = ", ".join([f'"{col}" TEXT' for col in sql_columns])
-                    create_table_sql = f"CREATE TABLE {table_name} ({columns_def})"
-                    
-                    cursor.execute(create_table_sql)
+                    create_table(cursor, table_name, sql_columns, column_types)
                     print(f"Table '{table_name}' created successfully.")
+                    # A rebuilt table starts over; incremental ingestion picks up from its max log_id/timestamp
+                    clear_manifest_entry(cursor, file_path)
 
                     # Insert data into the table
                     placeholders = ", ".join(['?'] * header_col_count)
                     insert_sql = f"INSERT INTO {table_name} VALUES ({placeholders})"
                     
-                    # Read the rest of the rows for insertion
-                    rows_inserted = 0
-                    # Enumerate to get line numbers for better error messages
-                    for i, row in enumerate(reader, 2): # Start from line 2
-                        # FIX: Skip empty rows
-                        if not row:
-                            print(f"Warning: Skipping empty line at row {i} in {file_path}")
-                            continue
-
-                        # FIX: Check if the row has the correct number of columns
-                        if len(row) != header_col_count:
-                            print(f"Warning: Skipping malformed row {i} in {file_path}. Expected {header_col_count} columns, but found {len(row)}. Data: {row}")
-                            continue
-                        
-                        # FIX: Added a try-except block for resilience
-                        try:
-                            cursor.execute(insert_sql, row)
-                            rows_inserted += 1
-                        except Exception as e:
-                            print(f"Error inserting row {i} from {file_path}: {e}. Row data: {row}")
-
-                    print(f"Inserted {rows_inserted} rows into '{table_name}'.")
+                    # Commit the (re)created table before streaming the rows in chunks
+                    conn.commit()
+                    table_start = time.perf_counter()
+                    rows_inserted, rows_skipped = insert_rows(conn, insert_sql, reader, header_col_count, typed_positions, file_path, chunk_size)
+                    elapsed = time.perf_counter() - table_start
+                    total_rows += rows_inserted
+                    if rows_skipped:
+                        print(f"Warning: Skipped {rows_skipped} malformed or failing rows in {file_path}.")
+                    print(f"Inserted {rows_inserted} rows into '{table_name}' in {elapsed:.2f}s ({rows_inserted / max(elapsed, 1e-9):,.0f} rows/s).")
+
+                    # Indexes are built after the load, which is faster than maintaining them per insert
+                    if build_indexes:
+                        index_names = create_indexes(cursor, table_name, index_columns(sql_columns, column_types))
+                        print(f"Created indexes on '{table_name}': {index_names}")
+                    if partition_by and table_name in PARTITIONED_TABLES:
+                        partitions = partition_table(conn, table_name, partition_by)
+                        print(f"Split '{table_name}' into {partitions} {partition_by} partitions behind a view.")
 
                 conn.commit()
 
@@ -82,17 +247,383 @@ def create_database_and_tables(db_name='security_logs.db', csv_files=None):
                 print(f"An error occurred while processing '{file_path}': {e}")
                 conn.rollback()
 
+        if build_indexes:
+            conn.execute("ANALYZE")
+            conn.commit()
+        conn.execute("PRAGMA synchronous=NORMAL")
+        elapsed = time.perf_counter() - load_start
+        print(f"Loaded {total_rows} rows in {elapsed:.2f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/s including indexing).")
+
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     finally:
         if conn:
             conn.close()
             print(f"Database connection to '{db_name}' closed.")
+    return total_rows
+
+# --- Incremental ingestion of append-only log feeds ---
+
+# Feeds that only ever grow, so new rows can be appended instead of rebuilding the table.
+APPEND_ONLY_TABLES = {'authentication_logs', 'dns_logs', 'firewall_logs', 'network_traffic'}
+# High-volume feeds that can be split into day/week partitions on their timestamp column.
+PARTITIONED_TABLES = {'authentication_logs', 'dns_logs', 'firewall_logs'}
+# Where each CSV's ingestion progress is kept, in the same database as the tables.
+MANIFEST_TABLE = 'ingestion_manifest'
+# Columns that increase monotonically in the log feeds, in order of preference.
+HIGH_WATER_MARK_COLUMNS = ('log_id', 'timestamp')
+
+
+class _CompleteLines:
+    """
+    Iterates over the complete lines of a binary file from a byte offset, tracking the offset.
+
+    A trailing line without a newline is still being written, so it is left for the next pass.
+    """
+
+    def __init__(self, f, offset: int):
+        self.f = f
+        self.offset = offset
+        f.seek(offset)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.f.readline()
+        if not line.endswith(b"\n"):
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode('utf-8')
+
+
+def ensure_manifest(conn: sqlite3.Connection) -> None:
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+            file_path TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            header TEXT NOT NULL,
+            byte_offset INTEGER NOT NULL,
+            rows_ingested INTEGER NOT NULL,
+            high_water_column TEXT,
+            high_water_mark TEXT,
+            updated_at TEXT NOT NULL
+        )""")
+
+
+def clear_manifest_entry(cursor: sqlite3.Cursor, file_path: str) -> None:
+    """Forgets a file's ingestion progress, e.g. after its table was rebuilt from scratch."""
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (MANIFEST_TABLE,)).fetchone():
+        cursor.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE file_path = ?", (os.path.abspath(file_path),))
+
+
+def _sort_key(value):
+    # log_id compares as a number; ISO-8601 timestamps compare correctly as strings
+    try:
+        return (0, float(value), '')
+    except (TypeError, ValueError):
+        return (1, 0.0, str(value))
+
+
+def append_new_rows(conn: sqlite3.Connection, file_path: str, column_types_by_table: Dict[str, Dict[str, str]],
+                    chunk_size: int = 10_000) -> int:
+    """
+    Appends the rows added to a CSV since its last ingestion.
+
+    The manifest records, per file, the byte offset up to which the file was read
+    and the high-water mark of its log_id (or timestamp) column. A pass seeks to the
+    offset and appends only complete new lines; the offset and mark are updated in
+    the same transaction as each chunk of rows. If the file shrank (rotated or
+    rewritten), it is re-read from the start and only rows past the high-water mark
+    are kept. A table built by a full rebuild starts from its current maximum.
+    Rows appended to a partitioned table land in its head partition and are then
+    rolled into their day/week partitions.
+
+    Returns:
+        int: The number of rows appended.
+    """
+    table_name = os.path.splitext(os.path.basename(file_path))[0]
+    manifest_key = os.path.abspath(file_path)
+    ensure_manifest(conn)
+    entry = conn.execute(
+        f"SELECT header, byte_offset, high_water_column, high_water_mark FROM {MANIFEST_TABLE} WHERE file_path = ?",
+        (manifest_key,),
+    ).fetchone()
+
+    with open(file_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        header_line = f.readline()
+        if not header_line.endswith(b"\n"):
+            return 0
+        sql_columns = [sanitize_column_name(col) for col in next(csv.reader([header_line.decode('utf-8')]))]
+        column_types = column_types_by_table.get(table_name, {})
+        high_water_column = next((col for col in HIGH_WATER_MARK_COLUMNS if col in sql_columns), None)
+
+        table_type = conn.execute("SELECT type FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?", (table_name,)).fetchone()
+        table_exists = table_type is not None
+        # Rows at or below the high-water mark are only dropped when we cannot trust the offset
+        filter_by_mark = False
+        if entry is None:
+            offset, high_water_mark = len(header_line), None
+            if table_exists and high_water_column:
+                high_water_mark = conn.execute(f'SELECT MAX("{high_water_column}") FROM {table_name}').fetchone()[0]
+                filter_by_mark = high_water_mark is not None
+            elif table_exists and conn.execute(f"SELECT 1 FROM {table_name} LIMIT 1").fetchone():
+                print(f"Warning: '{table_name}' already has rows, but neither a manifest entry nor a log_id/timestamp "
+                      f"column to resume from. Rebuild it once with the full loader before appending.")
+                return 0
+        else:
+            header, offset, high_water_column, high_water_mark = entry
+            if file_size < offset or header != ",".join(sql_columns):
+                print(f"'{file_path}' was rotated or rewritten since the last pass; re-reading it past {high_water_column}={high_water_mark}.")
+                offset = len(header_line)
+                filter_by_mark = high_water_column is not None and high_water_mark is not None
+        if file_size <= offset:
+            return 0
+
+        if not table_exists:
+            create_table(conn.cursor(), table_name, sql_columns, column_types)
+            create_indexes(conn.cursor(), table_name, index_columns(sql_columns, column_types))
+            conn.commit()
+
+        lines = _CompleteLines(f, offset)
+        mark_position = sql_columns.index(high_water_column) if high_water_column else None
+        state = {"mark": high_water_mark}
+
+        def new_rows():
+            for row in csv.reader(lines):
+                if mark_position is not None and len(row) == len(sql_columns):
+                    if filter_by_mark and _sort_key(row[mark_position]) <= _sort_key(high_water_mark):
+                        continue
+                    if state["mark"] is None or _sort_key(row[mark_position]) > _sort_key(state["mark"]):
+                        state["mark"] = row[mark_position]
+                yield row
+
+        def record_progress(rows_in_chunk: int) -> None:
+            conn.execute(f"""
+                INSERT INTO {MANIFEST_TABLE} (file_path, table_name, header, byte_offset, rows_ingested, high_water_column, high_water_mark, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
+                ON CONFLICT(file_path) DO UPDATE SET
+                    byte_offset = excluded.byte_offset,
+                    rows_ingested = rows_ingested + excluded.rows_ingested,
+                    high_water_mark = excluded.high_water_mark,
+                    updated_at = excluded.updated_at""",
+                (manifest_key, table_name, ",".join(sql_columns), lines.offset, rows_in_chunk, high_water_column,
+                 None if state["mark"] is None else str(state["mark"])))
+
+        placeholders = ", ".join(['?'] * len(sql_columns))
+        typed_positions = [i for i, col in enumerate(sql_columns) if column_types.get(col, 'TEXT') != 'TEXT']
+        rows_inserted, rows_skipped = insert_rows(conn, f"INSERT INTO {table_name} VALUES ({placeholders})", new_rows(),
+                                                  len(sql_columns), typed_positions, file_path, chunk_size,
+                                                  before_commit=record_progress)
+        # Also move past trailing rows that were all skipped, so they are not re-read next pass
+        record_progress(0)
+        conn.commit()
+        if table_type and table_type[0] == 'view' and rows_inserted:
+            roll_head(conn, table_name)
+    if rows_skipped:
+        print(f"Warning: Skipped {rows_skipped} malformed or failing rows in {file_path}.")
+    return rows_inserted
+
+
+def _connect_for_appending(db_name: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_name)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _partition_flat_tables(conn: sqlite3.Connection, csv_files: List[str], partition_by: str) -> None:
+    """Converts the PARTITIONED_TABLES among the CSVs' tables that are still flat to day/week partitions."""
+    for file_path in csv_files:
+        table_name = os.path.splitext(os.path.basename(file_path))[0]
+        if table_name in PARTITIONED_TABLES and conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone():
+            partition_table(conn, table_name, partition_by)
+
+
+def _append_pass(conn: sqlite3.Connection, csv_files: List[str], column_types_by_table: Dict[str, Dict[str, str]],
+                 chunk_size: int = 10_000) -> int:
+    """Runs append_new_rows over each CSV once and returns the total number of rows appended."""
+    total_rows = 0
+    for file_path in csv_files:
+        start = time.perf_counter()
+        try:
+            rows = append_new_rows(conn, file_path, column_types_by_table, chunk_size)
+        except (OSError, sqlite3.Error, UnicodeDecodeError) as e:
+            print(f"An error occurred while appending '{file_path}': {e}")
+            conn.rollback()
+            continue
+        if rows:
+            elapsed = time.perf_counter() - start
+            print(f"Appended {rows} rows from '{file_path}' in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s).")
+        total_rows += rows
+    return total_rows
+
+
+def ingest_incremental(db_name: str, csv_files: List[str], metadata_file: Optional[str] = None, chunk_size: int = 10_000,
+                       partition_by: Optional[str] = None) -> int:
+    """
+    Appends new rows from each append-only CSV to `db_name` without touching existing rows.
+
+    Runs in WAL mode so the SQL tools keep reading while rows are appended; their
+    result cache sees the new version stamp on the next query. With `partition_by`,
+    flat PARTITIONED_TABLES are converted to day/week partitions first.
+
+    Returns:
+        int: The total number of rows appended.
+    """
+    column_types_by_table = load_column_types(metadata_file)
+    conn = _connect_for_appending(db_name)
+    try:
+        if partition_by:
+            _partition_flat_tables(conn, csv_files, partition_by)
+        return _append_pass(conn, csv_files, column_types_by_table, chunk_size)
+    finally:
+        conn.close()
+
+
+def tail_logs(db_name: str, csv_files: List[str], metadata_file: Optional[str] = None, interval_seconds: float = 2.0,
+              partition_by: Optional[str] = None) -> int:
+    """
+    Keeps appending new rows from the given CSVs every `interval_seconds` until interrupted.
+
+    One connection is held for the whole tail, and the metadata is read once. An idle
+    pass only checks each file's size against its manifest offset; tables are converted
+    to partitions up front and again only after a pass that appended rows (which may
+    have created a flat table), and partitioned tables are only rolled when rows landed
+    in their head.
+
+    Returns:
+        int: The total number of rows appended.
+    """
+    print(f"Tailing {len(csv_files)} files into '{db_name}' every {interval_seconds}s. Press Ctrl+C to stop.")
+    column_types_by_table = load_column_types(metadata_file)
+    total_rows = 0
+    conn = _connect_for_appending(db_name)
+    try:
+        if partition_by:
+            _partition_flat_tables(conn, csv_files, partition_by)
+        while True:
+            rows = _append_pass(conn, csv_files, column_types_by_table)
+            total_rows += rows
+            if rows and partition_by:
+                _partition_flat_tables(conn, csv_files, partition_by)
+            time.sleep(interval_seconds)
+    except KeyboardInterrupt:
+        print("Stopped tailing.")
+    finally:
+        conn.close()
+    return total_rows
+
+
+def read_workload(workload_log: str, db_name: Optional[str] = None) -> List[str]:
+    """Reads the SQL statements recorded by SQLitePool's workload log, optionally only those run against db_name."""
+    queries = []
+    with open(workload_log, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if db_name is None or os.path.abspath(entry.get('db', '')) == os.path.abspath(db_name):
+                queries.append(entry['sql'])
+    return queries
+
+
+def suggest_indexes(db_name: str, queries: List[str], top_n: int = 10) -> List[Tuple[str, int]]:
+    """
+    Suggests indexes for a SQL workload.
+
+    Every query is run through EXPLAIN QUERY PLAN. For each table in the plan, the
+    columns the query filters or joins on but the plan does not look up through an
+    index are counted. The most frequent (table, column) pairs that are not already
+    the leading column of an index are returned as CREATE INDEX statements with
+    their counts.
+    """
+    conn = sqlite3.connect(db_name)
+    try:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        table_columns = {table: [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')] for table in tables}
+        indexed = set()
+        for table in tables:
+            for index in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+                leading = conn.execute(f'PRAGMA index_info("{index[1]}")').fetchall()
+                if leading:
+                    indexed.add((table, leading[0][2]))
+
+        counts = Counter()
+        for sql in queries:
+            try:
+                plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+            except sqlite3.Error:
+                continue
+            aliases = {}
+            for table, alias in TABLE_ALIAS_PATTERN.findall(sql):
+                aliases[table] = table
+                if alias and alias.lower() not in SQL_KEYWORDS:
+                    aliases[alias] = table
+            for detail in (row[-1] for row in plan):
+                # "SCAN vs" / "SEARCH vs USING INDEX idx (asset_id=?)" on current SQLite,
+                # "SCAN TABLE vulnerability_scans AS vs" on older versions
+                match = re.match(r"(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS (\w+))?(?:.*\((.*)\))?", detail)
+                if not match:
+                    continue
+                name = match.group(3) or match.group(2)
+                table = aliases.get(name, name)
+                used_columns = set(re.findall(r"(\w+)\s*[=<>]", match.group(4) or ""))
+                qualifiers = "|".join(re.escape(alias) for alias, target in aliases.items() if target == table)
+                for column in table_columns.get(table, []):
+                    if (table, column) in indexed or column in used_columns:
+                        continue
+                    reference = rf'(?<![\w".])(?:(?:{qualifiers})\.)?"?{re.escape(column)}"?(?![\w"])'
+                    predicate = rf'{reference}\s*(?:=|<|>|!=|\bIN\b|\bBETWEEN\b|\bLIKE\b|\bIS\b)|(?:=|<|>)\s*{reference}'
+                    if re.search(predicate, sql, re.IGNORECASE):
+                        counts[(table, column)] += 1
+    finally:
+        conn.close()
+    return [(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{column}" ON {table} ("{column}")', count)
+            for (table, column), count in counts.most_common(top_n)]
+
 
 if __name__ == '__main__':
+    # Run from the repository root: python -m databahn.scripts.db_generator
+    parser = argparse.ArgumentParser(description="Load CSV files into a typed, indexed SQLite database.")
+    parser.add_argument("--data-dir", default='databahn/data/', help="Directory of CSV files; use data_1_1/ for the typed metadata.")
+    parser.add_argument("--db", default='databahn/data/security_logs.db')
+    parser.add_argument("--no-indexes", action="store_true", help="Skip the automatic indexes and ANALYZE.")
+    parser.add_argument("--suggest-indexes", metavar="WORKLOAD_LOG", help="Suggest indexes from a SQL_WORKLOAD_LOG file instead of loading.")
+    parser.add_argument("--apply", action="store_true", help="With --suggest-indexes, create the suggested indexes.")
+    parser.add_argument("--incremental", action="store_true", help="Append only the new rows of the append-only log feeds.")
+    parser.add_argument("--tail", type=float, metavar="SECONDS", help="With --incremental, keep appending every SECONDS.")
+    parser.add_argument("--partition", choices=PARTITION_GRANULARITIES, help="Split the high-volume log tables into day or week partitions.")
+    parser.add_argument("--archive-before", metavar="YYYY-MM-DD", help="Move log partitions that end on or before this date out of the database.")
+    parser.add_argument("--archive-dir", default='databahn/data/archive/', help="With --archive-before, where the archived partition files go.")
+    parser.add_argument("--export-parquet", action="store_true", help="After loading, export the tables to Parquet for SQL_ENGINE=duckdb/auto.")
+    args = parser.parse_args()
+
+    if args.archive_before:
+        with sqlite3.connect(args.db) as conn:
+            for table_name in sorted(PARTITIONED_TABLES):
+                for path in archive_partitions(conn, table_name, args.archive_before, args.archive_dir):
+                    print(f"Archived a '{table_name}' partition to '{path}'.")
+        raise SystemExit(0)
+
+    if args.suggest_indexes:
+        suggestions = suggest_indexes(args.db, read_workload(args.suggest_indexes, args.db))
+        if not suggestions:
+            print("No index suggestions: the workload has no full scans on unindexed filter or join columns.")
+        for statement, count in suggestions:
+            print(f"{count:>6} queries  {statement};")
+        if args.apply and suggestions:
+            with sqlite3.connect(args.db) as conn:
+                for statement, _ in suggestions:
+                    conn.execute(statement)
+                conn.execute("ANALYZE")
+            print(f"Created {len(suggestions)} indexes on '{args.db}'.")
+        raise SystemExit(0)
+
     # List of CSV files to be loaded into the database.
-    # Assumes the script and CSV files are in the same directory.
-    data_directory = 'databahn/data/'
+    data_directory = args.data_dir
     # csv_file_list = [
     #     'data/asset_inventory.csv',
     #     'data/authentication_logs.csv',
@@ -124,6 +655,18 @@ if __name__ == '__main__':
             #         writer.writerow(['dummy_col1', 'dummy_col2'])
             #         writer.writerow(['data1', 'data2'])
 
-    create_database_and_tables(db_name='databahn/data/security_logs.db', csv_files=csv_file_list)
-    print("\nScript finished. Check for 'security_logs.db' in the current directory.")
+    if args.incremental:
+        metadata_file = next((f for f in csv_file_list if os.path.basename(f) == 'metadata.csv'), None)
+        feeds = [f for f in csv_file_list if os.path.splitext(os.path.basename(f))[0] in APPEND_ONLY_TABLES]
+        if args.tail:
+            tail_logs(args.db, feeds, metadata_file, args.tail, partition_by=args.partition)
+        else:
+            print(f"Appended {ingest_incremental(args.db, feeds, metadata_file, partition_by=args.partition)} new rows.")
+    else:
+        create_database_and_tables(db_name=args.db, csv_files=csv_file_list, build_indexes=not args.no_indexes, partition_by=args.partition)
+    # The DuckDB engine ignores an export older than the database, so re-export after every load
+    if args.export_parquet:
+        rows = export_parquet(args.db, skip_tables={MANIFEST_TABLE})
+        print(f"Exported {rows} rows to '{parquet_directory_for(args.db)}'.")
+    print(f"\nScript finished. Check for '{args.db}'.")
 
@@ -1,8 +1,11 @@
 
 
 from databahn.tools.tools import MANUAL_FUNCTION_MAP
+from databahn.tools.tool_registry import ToolRegistry
+from settings import TOOL_CALL_TIMEOUT_SECONDS, MCP_SESSION_MAX_CONCURRENCY
+import asyncio
 import json
-from typing import cast, Any, Dict, List
+from typing import cast, Any, AsyncIterator, Dict, List, Optional, Tuple
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -10,6 +13,11 @@ logger = logging.getLogger(__name__)
 
 
 class Dispatcher():
+    def __init__(self, tool_call_timeout: float = TOOL_CALL_TIMEOUT_SECONDS, max_calls_per_session: int = MCP_SESSION_MAX_CONCURRENCY):
+        self.tool_call_timeout = tool_call_timeout
+        self.max_calls_per_session = max_calls_per_session
+        self._session_semaphores: Dict[int, asyncio.Semaphore] = {}
+
     async def _handle_browser_tool(self, session: Any, tool_name: str, tool_args: Dict[str, Any], tools_dict: Dict[str, Any]) -> Any:
         """
         Handles the specific logic for browser tools, including setting the active account.
@@ -50,63 +58,101 @@ class Dispatcher():
         
         return result
 
-    async def dispatcher_invoke(self, tool_calls, session_list):
+    def _session_semaphore(self, session: Any) -> asyncio.Semaphore:
+        """Returns the semaphore that bounds how many tool calls run at once on one MCP session."""
+        semaphore = self._session_semaphores.get(id(session))
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_calls_per_session)
+            self._session_semaphores[id(session)] = semaphore
+        return semaphore
+
+    async def _call_tool(self, tool_name: str, tool_args: Dict[str, Any], tools_dict_from_mcp_servers: Dict[str, Any]) -> Any:
+        """
+        Runs a single tool call against a manual tool or the MCP session that serves it.
+        """
+        if tool_name in MANUAL_FUNCTION_MAP: 
+            logger.info(f"Dispatching the tool: {tool_name} in manual tools")
+            return await MANUAL_FUNCTION_MAP[tool_name].ainvoke(tool_args)
+        elif tools_dict_from_mcp_servers.get(tool_name):
+            session = tools_dict_from_mcp_servers[tool_name]
+            # stdio MCP sessions serve requests over a single pipe, so cap the calls in flight per session
+            async with self._session_semaphore(session):
+                # --- MODIFIED: Check if the tool belongs to the browser server ---
+                browser_session = tools_dict_from_mcp_servers.get("accounts_list")
+                if browser_session and session is browser_session:
+                    return await self._handle_browser_tool(session, tool_name, tool_args, tools_dict_from_mcp_servers)
+                logger.info(f"Dispatching tool: {tool_name} under a non-browser mcp server")
+                return await session.call_tool(tool_name, cast(dict, tool_args))
+        return ""
+
+    async def _dispatch_tool_call(self, tool_call, tools_dict_from_mcp_servers: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Dispatches one tool call with its own timeout and converts the result to a tool message.
+        Returns None if the call's arguments are not valid JSON.
+        """
+        tool_name = tool_call.function.name
+        # Arguments from OpenAI come as a JSON string
+        tool_args_str = tool_call.function.arguments
+        try:
+            tool_args = json.loads(tool_args_str)
+        except json.JSONDecodeError:
+            print(f"Error: Invalid JSON in tool arguments: {tool_args_str}")
+            return None
+        try:
+            result = await asyncio.wait_for(
+                self._call_tool(tool_name, tool_args, tools_dict_from_mcp_servers),
+                timeout=self.tool_call_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Tool call {tool_name} timed out after {self.tool_call_timeout} seconds and was cancelled.")
+            result = ""
+        except Exception as e:
+            logger.error(f"Tool call {tool_name} failed: {e}")
+            result = ""
+
+        logger.info(f"dispatched tool result:{result}")
+        if result and isinstance(result.content, list) and result.content:
+            content = getattr(result.content[0], "text", "")
+        else:
+            content = ""
+        # Add the tool result to our list for the next API call
+        return {
+            "role": "tool",
+            "tool_call_id": tool_call.id,
+            "content": content,
+        }
+
+    async def dispatcher_invoke(self, tool_calls, tool_registry: ToolRegistry):
         """
         method to dispatch the tool calls and get the results
+
+        The tool calls run concurrently, so the request waits for the slowest tool
+        rather than the sum of all of them. Results keep the order of `tool_calls`.
         """
-        tool_results  = []
-        tools_dict_from_mcp_servers = {tool.name: session for session in session_list
-                                          for tool in (await session.list_tools()).tools}
-
-        for tool_call in tool_calls:
-            tool_name = tool_call.function.name
-            # Arguments from OpenAI come as a JSON string
-            tool_args_str = tool_call.function.arguments
-            try:
-                tool_args = json.loads(tool_args_str)
-            except json.JSONDecodeError:
-                print(f"Error: Invalid JSON in tool arguments: {tool_args_str}")
-                continue
-            try:
-                if tool_name in MANUAL_FUNCTION_MAP: 
-                    logger.info(f"Dispatching the tool: {tool_name} in manual tools")
-                    result = await MANUAL_FUNCTION_MAP[tool_name].ainvoke(tool_args)
-                elif tools_dict_from_mcp_servers.get(tool_name):
-                    session = tools_dict_from_mcp_servers[tool_name]
-                    # --- MODIFIED: Check if the tool belongs to the browser server ---
-                    browser_session = tools_dict_from_mcp_servers.get("accounts_list")
-                    if browser_session and session is browser_session:
-                        result = await self._handle_browser_tool(session, tool_name, tool_args, tools_dict_from_mcp_servers)
-                    else:
-                        logger.info(f"Dispatching tool: {tool_name} under a non-browser mcp server")
-                        result = await session.call_tool(tool_name, cast(dict, tool_args))
-                    # session = tools_dict_from_mcp_servers.get(tool_name)
-                    # logger.info(f"Dispatching the tool the tool: {tool_name} under mcp server")
-                    # # Execute tool call (this part remains the same)
-                    # result = await session.call_tool(tool_name, cast(dict, tool_args))
-                else: 
-                    result = ""
-            except Exception as e:
-                result = ""
-        
-            logger.info(f"dispatched tool result:{result}")
-            if result and isinstance(result.content, list) and result.content:
-                # Add the tool result to our list for the next API call
-                tool_results.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "content": getattr(result.content[0], "text", ""),
-                    }
-                )
-            else:
-                # Add the tool result to our list for the next API call
-                tool_results.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "content": "",
-                    }
-                )
+        tools_dict_from_mcp_servers = await tool_registry.get_tool_sessions()
+        dispatched = await asyncio.gather(
+            *(self._dispatch_tool_call(tool_call, tools_dict_from_mcp_servers) for tool_call in tool_calls)
+        )
+        tool_results = [tool_result for tool_result in dispatched if tool_result is not None]
         logger.info(f"the tool_results are: {str(tool_results)[:100]}")
         return tool_results
+
+    async def dispatch_as_completed(self, tool_calls, tool_registry: ToolRegistry) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]]]]:
+        """
+        Dispatches the tool calls concurrently like `dispatcher_invoke`, yielding
+        (position in tool_calls, tool message) pairs as each call finishes.
+        The tool message is None for calls whose arguments are not valid JSON.
+        """
+        tools_dict_from_mcp_servers = await tool_registry.get_tool_sessions()
+
+        async def dispatch_at(position, tool_call):
+            return position, await self._dispatch_tool_call(tool_call, tools_dict_from_mcp_servers)
+
+        tasks = [asyncio.ensure_future(dispatch_at(position, tool_call)) for position, tool_call in enumerate(tool_calls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # If the consumer stops early (e.g. the client disconnected), cancel the calls still running.
+            for task in tasks:
+                task.cancel()
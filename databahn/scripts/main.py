@@ -7,16 +7,18 @@ from openai import AsyncOpenAI
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 from base import openai_client
+from settings import RESPONSE_CONTEXT_TOKEN_BUDGET
 from openai.types.chat import (
     ChatCompletionMessageParam,
     ChatCompletionToolParam,
 )
-from typing import cast, List
+from typing import cast, Any, AsyncIterator, Dict, List, Tuple
 from databahn.tools.tools import MANUAL_FUNCTION_MAP
 import sqlite3
 import logging
-from databahn.scripts.agents.agent import Agent
+from databahn.scripts.agents.agent import Agent, create_query_embedding_cache
 from databahn.scripts.dispatcher import Dispatcher
+from databahn.tools.tool_registry import ToolRegistry
 from databahn.tools.tools import MANUAL_FUNCTION_MAP
 
 logging.basicConfig(level=logging.INFO)
@@ -41,14 +43,15 @@ server_params=StdioServerParameters(
 class Chat:
 
     def __init__(self):
-        self.orchestrator_agent = Agent(orchestrator_system_prompt_path, orchestrator_user_prompt_path)
-        self.response_agent = Agent(response_system_prompt_path, response_user_prompt_path)
+        self.orchestrator_agent = Agent(orchestrator_system_prompt_path, orchestrator_user_prompt_path,
+                                        query_embedding_cache=create_query_embedding_cache())
+        self.response_agent = Agent(response_system_prompt_path, response_user_prompt_path, context_token_budget=RESPONSE_CONTEXT_TOKEN_BUDGET)
         self.dispatcher = Dispatcher()
 
 
-    async def process_query(self, input_query: str, session_list: List[ClientSession], state) -> None:
+    async def process_query(self, input_query: str, tool_registry: ToolRegistry, state) -> None:
 
-        orchestrator_res, state = await self.orchestrator_agent.process_query(input_query, session_list, state, agent_type="orchestrator")
+        orchestrator_res, state = await self.orchestrator_agent.process_query(input_query, tool_registry, state, agent_type="orchestrator")
         orchestrator_agent_res = orchestrator_res.choices[0].message
 
         if orchestrator_agent_res.content:
@@ -72,7 +75,7 @@ class Chat:
         # This list will hold the tool results to be sent back to the model
         tool_results_for_next_call: list[ChatCompletionMessageParam] = []
 
-        results = await self.dispatcher.dispatcher_invoke(tool_calls, session_list)
+        results = await self.dispatcher.dispatcher_invoke(tool_calls, tool_registry)
 
         # Append all tool results to the main message history
         state['orchestrator']['results'] = results
@@ -92,7 +95,59 @@ class Chat:
             final_response_content = ERROR_MESSAGE
         return final_response_content, state
 
-    async def chat_loop(self, session: ClientSession):
+    async def process_query_stream(self, input_query: str, tool_registry: ToolRegistry, state) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Processes a query like `process_query`, yielding (event, data) progress events as they happen:
+        `started` at once, `retrieval` with the tables and tools retrieved for the query (before the
+        orchestrator LLM call), `tools_selected` once the orchestrator has chosen its tool calls,
+        `tool_finished` as each call completes, `token` for each piece of the streamed response, and
+        finally `done` with the full response. `state` is updated in place and is complete once `done`
+        has been yielded.
+        """
+        yield "started", {}
+        messages, available_tools, chat_history = await self.orchestrator_agent.prepare_call(input_query, tool_registry, state, "orchestrator")
+        yield "retrieval", {"tables": state['orchestrator'].get('tables', []), "tools": state['orchestrator'].get('tools', [])}
+        orchestrator_res, state = await self.orchestrator_agent.complete_call(messages, available_tools, chat_history, state, "orchestrator")
+        orchestrator_agent_res = orchestrator_res.choices[0].message if orchestrator_res and orchestrator_res.choices else None
+        tool_calls = orchestrator_agent_res.tool_calls if orchestrator_agent_res and not orchestrator_agent_res.content else None
+        if not tool_calls:
+            logger.info(f"The orchestrator did not return tool calls: {orchestrator_agent_res}")
+            yield "done", {"response": ERROR_MESSAGE}
+            return
+
+        logger.info(f"the tool calls are:{tool_calls}")
+        state['orchestrator']['chat_history'].append({
+            "role": "assistant", 
+            "content": json.dumps([{tool.function.name: tool.function.arguments} for tool in tool_calls])})
+        yield "tools_selected", {"tools": [{"id": tool.id, "name": tool.function.name} for tool in tool_calls]}
+
+        results_by_position = {}
+        async for position, tool_result in self.dispatcher.dispatch_as_completed(tool_calls, tool_registry):
+            results_by_position[position] = tool_result
+            yield "tool_finished", {
+                "id": tool_calls[position].id,
+                "name": tool_calls[position].function.name,
+                "ok": bool(tool_result and tool_result["content"]),
+            }
+        state['orchestrator']['results'] = [
+            results_by_position[position] for position in sorted(results_by_position) if results_by_position[position] is not None
+        ]
+
+        response_parts = []
+        async for token in self.response_agent.process_query_stream(input_query, None, state, "response"):
+            response_parts.append(token)
+            yield "token", {"text": token}
+
+        final_response_content = "".join(response_parts)
+        if final_response_content:
+            final_response_content_chat_hist = {"role": "assistant", "content": final_response_content}
+            state['response']['chat_history'].append(final_response_content_chat_hist)
+            state['orchestrator']['chat_history'].append(final_response_content_chat_hist)
+        else:
+            final_response_content = ERROR_MESSAGE
+        yield "done", {"response": final_response_content}
+
+    async def chat_loop(self, tool_registry: ToolRegistry):
         state = {"user_message": "",
         "orchestrator": {}, 
         "response": {}
@@ -102,17 +157,19 @@ class Chat:
             if not query:
                 continue
             state['user_message'] = query
-            response, state = await self.process_query(query, [session], state)
+            response, state = await self.process_query(query, tool_registry, state)
             logger.info(f"\n{response}\n")
 
     async def run(self):
         # This connection logic remains unchanged
         async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
+            tool_registry = ToolRegistry()
+            async with ClientSession(read, write, message_handler=tool_registry.message_handler("mcp_server")) as session:
                 # Initialize the connection
                 await session.initialize()
+                tool_registry.register("mcp_server", session)
 
-                await self.chat_loop(session)
+                await self.chat_loop(tool_registry)
 
 
 
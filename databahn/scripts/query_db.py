@@ -2,6 +2,24 @@ import sqlite3
 import os
 import pandas as pd
 
+# The SQL query to select specific vulnerabilities
+# We also join with asset_inventory to get the asset_name for better context.
+CRITICAL_PENDING_VULNERABILITIES_QUERY = """
+SELECT
+    vs.scan_id,
+    vs.asset_id,
+    ai.asset_name,
+    vs.vulnerability,
+    vs.cvss_score,
+    vs.status
+FROM
+    vulnerability_scans vs
+JOIN
+    asset_inventory ai ON vs.asset_id = ai.asset_id
+WHERE
+    vs.severity = 'Critical' AND vs.status = 'Pending'
+"""
+
 def query_vulnerabilities(db_name='security_logs.db'):
     """
     Connects to the specified SQLite database and runs a query to find
@@ -15,23 +33,7 @@ def query_vulnerabilities(db_name='security_logs.db'):
         print("\n--- Running Example Query ---")
         print("Query: Find all 'Critical' severity vulnerabilities with a 'Pending' status.")
 
-        # The SQL query to select specific vulnerabilities
-        # We also join with asset_inventory to get the asset_name for better context.
-        query = """
-        SELECT
-            vs.scan_id,
-            vs.asset_id,
-            ai.asset_name,
-            vs.vulnerability,
-            vs.cvss_score,
-            vs.status
-        FROM
-            vulnerability_scans vs
-        JOIN
-            asset_inventory ai ON vs.asset_id = ai.asset_id
-        WHERE
-            vs.severity = 'Critical' AND vs.status = 'Pending'
-        """
+        query = CRITICAL_PENDING_VULNERABILITIES_QUERY
 
         # Using pandas to execute the query and display the results in a clean table
         df = pd.read_sql_query(query, conn)
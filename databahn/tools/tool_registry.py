@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from mcp import ClientSession, types
+from openai.types.chat import ChatCompletionToolParam
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ToolRegistry:
+    """
+    A cache of the tools exposed by every MCP session, shared by the Agent and the Dispatcher.
+
+    Tool lists are fetched from all sessions concurrently and kept as a name->session
+    map plus the converted OpenAI tool schemas, so a request does not re-list tools
+    over stdio. A session's entry is refreshed after `ttl_seconds`, or on the next
+    read after the server sends a `notifications/tools/list_changed` notification.
+    """
+
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self.sessions: Dict[str, ClientSession] = {}
+        self._tools: Dict[str, List[types.Tool]] = {}
+        self._tool_schemas: Dict[str, List[ChatCompletionToolParam]] = {}
+        self._tool_sessions: Dict[str, ClientSession] = {}
+        self._refreshed_at: Dict[str, float] = {}
+        self._stale: set = set()
+        self._lock = asyncio.Lock()
+
+    def message_handler(self, session_name: str):
+        """
+        Returns an MCP `message_handler` for the named session that marks its tools stale
+        when the server announces that its tool list changed.
+        """
+        async def handle_message(message) -> None:
+            if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+                logger.info(f"MCP session '{session_name}' reported a tool list change.")
+                self._stale.add(session_name)
+        return handle_message
+
+    def register(self, session_name: str, session: ClientSession) -> None:
+        """Adds an initialized session to the registry. Its tools are fetched on the next refresh."""
+        self.sessions[session_name] = session
+        self._stale.add(session_name)
+
+    async def refresh(self, session_names: Optional[List[str]] = None) -> None:
+        """
+        Re-lists the tools of the given sessions (all sessions by default) concurrently.
+
+        A session whose list_tools call fails keeps its previously cached tools.
+        """
+        session_names = list(self.sessions) if session_names is None else session_names
+        results = await asyncio.gather(
+            *(self.sessions[name].list_tools() for name in session_names),
+            return_exceptions=True,
+        )
+        now = time.monotonic()
+        for name, result in zip(session_names, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to list tools for MCP session '{name}': {result}")
+                continue
+            self._tools[name] = list(result.tools)
+            self._tool_schemas[name] = [
+                {
+                    "type": "function",
+                    "function": {
+                        "name": tool.name,
+                        "description": tool.description or "",
+                        "parameters": tool.inputSchema,
+                    },
+                }
+                for tool in result.tools if tool.inputSchema.get("properties")
+            ]
+            self._refreshed_at[name] = now
+            self._stale.discard(name)
+        self._tool_sessions = {tool.name: self.sessions[name] for name, tools in self._tools.items() for tool in tools}
+        logger.info(f"Tool registry refreshed {session_names}: {len(self._tool_sessions)} tools across {len(self._tools)} sessions.")
+
+    async def ensure_fresh(self) -> None:
+        """Refreshes the sessions that were notified as changed or whose cache is older than the TTL."""
+        now = time.monotonic()
+        due = [name for name in self.sessions
+               if name in self._stale or now - self._refreshed_at.get(name, float("-inf")) > self.ttl_seconds]
+        if not due:
+            return
+        async with self._lock:
+            # Another request may have refreshed these sessions while we waited for the lock.
+            now = time.monotonic()
+            due = [name for name in due
+                   if name in self._stale or now - self._refreshed_at.get(name, float("-inf")) > self.ttl_seconds]
+            if due:
+                await self.refresh(due)
+
+    async def get_tool_schemas(self) -> Dict[str, List[ChatCompletionToolParam]]:
+        """Returns the OpenAI tool schemas of every session, keyed by session name."""
+        await self.ensure_fresh()
+        return self._tool_schemas
+
+    async def get_tool_sessions(self) -> Dict[str, ClientSession]:
+        """Returns the map from tool name to the session that serves it."""
+        await self.ensure_fresh()
+        return self._tool_sessions
@@ -1,11 +1,26 @@
 from langchain.tools import tool
 from databahn.utils.data_objects import Result, ContentObject
-import sqlite3
+from databahn.utils.sqlite_pool import SQLitePool
+from databahn.utils.sql_results import tsv_fetcher
+from databahn.utils.sql_cache import SQLResultCache
+from databahn.utils.columnar import ColumnarEngine
+from databahn.utils.partitions import PartitionPruner
+from settings import (SQLITE_POOL_SIZE, SQL_QUERY_TIMEOUT_SECONDS, SQL_WORKLOAD_LOG, SQL_RESULT_MAX_ROWS, SQL_RESULT_MAX_BYTES, SQL_ENGINE,
+                  SQL_RESULT_CACHE_SIZE, SQL_RESULT_CACHE_MAX_BYTES)
 
 
 # --- Configuration ---
 DB_FILE = 'databahn/data/security_logs.db'
-conn = sqlite3.connect(DB_FILE)
+# Queries run read-only in worker threads, so a slow JOIN does not block the event loop
+db_pool = SQLitePool(DB_FILE, max_connections=SQLITE_POOL_SIZE, timeout_seconds=SQL_QUERY_TIMEOUT_SECONDS, workload_log=SQL_WORKLOAD_LOG)
+# Results are read in batches and rendered as capped TSV, so an unbounded SELECT cannot flood the context
+fetch_result = tsv_fetcher(SQL_RESULT_MAX_ROWS, SQL_RESULT_MAX_BYTES)
+# Repeated queries are answered from memory until the database file changes
+sql_result_cache = SQLResultCache(max_entries=SQL_RESULT_CACHE_SIZE, max_bytes=SQL_RESULT_CACHE_MAX_BYTES)
+# Aggregations can run on DuckDB over the Parquet export instead, depending on SQL_ENGINE
+columnar_engine = ColumnarEngine(DB_FILE, max_workers=SQLITE_POOL_SIZE, timeout_seconds=SQL_QUERY_TIMEOUT_SECONDS)
+# On a partitioned database, timestamp-bounded queries skip the partitions outside their range
+partition_pruner = PartitionPruner(DB_FILE)
 
 @tool
 async def lookup_cybser_security_data(sql_query: str) -> str:
@@ -19,9 +34,13 @@ async def lookup_cybser_security_data(sql_query: str) -> str:
     """
     print(f"The incoming SQL query: {sql_query}")
     try:
-        result = conn.execute(sql_query).fetchall()
-        conn.commit()
-        content = "\n".join(str(row) for row in result)
+        cache_key = sql_result_cache.make_key(DB_FILE, sql_query)
+        content = sql_result_cache.get(cache_key)
+        if content is None:
+            content = await columnar_engine.try_execute(sql_query, fetch_result, SQL_ENGINE)
+            if content is None:
+                content = await db_pool.execute(await partition_pruner.rewrite(sql_query), fetch=fetch_result)
+            sql_result_cache.put(cache_key, content)
         return Result(content=[ContentObject(text=content)])
     except Exception as e:
         raise ValueError
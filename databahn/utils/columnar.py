@@ -0,0 +1,346 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Set
+
+import pandas as pd
+
+from databahn.utils.partitions import PARTITION_CATALOG_TABLE
+from databahn.utils.sql_cache import SQL_TOKEN_PATTERN, database_version
+from databahn.utils.sqlite_pool import QueryTimeoutError
+
+try:
+    import duckdb
+except ImportError:  # duckdb is optional; without it every query runs on SQLite
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+SQL_ENGINES = ("sqlite", "duckdb", "auto")
+# Written last by export_parquet; records the database version the Parquet files were exported from.
+EXPORT_MANIFEST = "_export.json"
+ROWS_PER_PARQUET_FILE = 1_000_000
+DUCKDB_TYPES = {"INTEGER": "BIGINT", "REAL": "DOUBLE"}
+
+# Queries that aggregate whole columns, where a columnar scan beats SQLite's row store.
+ANALYTICAL_KEYWORDS = {"group", "distinct", "over", "count", "sum", "avg", "min", "max", "total", "group_concat"}
+# SQLite date functions, mapped to DuckDB macros with SQLite's text results and 'now' handling.
+DUCKDB_SHIM_MACROS = [
+    "CREATE MACRO sqlite_ts(x) AS CASE WHEN lower(CAST(x AS VARCHAR)) = 'now' "
+    "THEN CAST(now() AT TIME ZONE 'UTC' AS TIMESTAMP) ELSE TRY_CAST(x AS TIMESTAMP) END",
+    "CREATE MACRO sqlite_date(x) AS strftime(sqlite_ts(x), '%Y-%m-%d'), "
+    "(x, modifier) AS strftime(sqlite_ts(x) + CAST(modifier AS INTERVAL), '%Y-%m-%d')",
+    "CREATE MACRO sqlite_datetime(x) AS strftime(sqlite_ts(x), '%Y-%m-%d %H:%M:%S'), "
+    "(x, modifier) AS strftime(sqlite_ts(x) + CAST(modifier AS INTERVAL), '%Y-%m-%d %H:%M:%S')",
+    "CREATE MACRO sqlite_strftime(format, x) AS strftime(sqlite_ts(x), format), "
+    "(format, x, modifier) AS strftime(sqlite_ts(x) + CAST(modifier AS INTERVAL), format)",
+]
+
+
+def parquet_directory_for(db_file: str) -> str:
+    """Where the Parquet export of `db_file` lives: next to it, named after it."""
+    return f"{os.path.splitext(db_file)[0]}_parquet"
+
+
+def exportable_tables(conn: sqlite3.Connection, skip_tables: Set[str] = frozenset()) -> List[str]:
+    """
+    The tables and views the SQL tools query.
+
+    Bookkeeping tables in `skip_tables` are left out. So are the individual
+    partitions of a partitioned table: its view is exported under the table's name.
+    """
+    skip = set(skip_tables) | {PARTITION_CATALOG_TABLE}
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (PARTITION_CATALOG_TABLE,)).fetchone():
+        skip.update(row[0] for row in conn.execute(f"SELECT partition_table FROM {PARTITION_CATALOG_TABLE}"))
+    return [name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    ) if name not in skip]
+
+
+def export_parquet(db_file: str, parquet_directory: Optional[str] = None, skip_tables: Set[str] = frozenset(),
+                   rows_per_file: int = ROWS_PER_PARQUET_FILE) -> int:
+    """
+    Exports every table of a SQLite database to Parquet for the DuckDB engine.
+
+    Each table becomes a directory of Parquet files of up to `rows_per_file` rows,
+    written one chunk at a time so memory stays bounded at any table size. SQLite
+    INTEGER and REAL columns become BIGINT and DOUBLE, everything else VARCHAR, so
+    results render the same on both engines. Files are written under temporary
+    names and swapped in, and the manifest recording the source database version
+    is written last.
+
+    Returns:
+        int: The number of rows exported.
+    """
+    if duckdb is None:
+        raise ImportError("export_parquet needs duckdb: pip install duckdb")
+    parquet_directory = parquet_directory or parquet_directory_for(db_file)
+    os.makedirs(parquet_directory, exist_ok=True)
+    source_version = database_version(db_file)
+    total_rows = 0
+    with sqlite3.connect(f"file:{db_file}?mode=ro", uri=True) as conn:
+        duck = duckdb.connect()
+        try:
+            for table_name in exportable_tables(conn, skip_tables):
+                columns = [(row[1], (row[2] or "TEXT").upper()) for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+                casts = ", ".join(f'CAST("{name}" AS {DUCKDB_TYPES.get(column_type, "VARCHAR")}) AS "{name}"' for name, column_type in columns)
+                staging = os.path.join(parquet_directory, f".{table_name}.tmp")
+                os.makedirs(staging, exist_ok=True)
+                cursor = conn.execute(f'SELECT * FROM "{table_name}"')
+                file_index = 0
+                while True:
+                    rows = cursor.fetchmany(rows_per_file)
+                    if not rows and file_index:
+                        break
+                    chunk = pd.DataFrame(rows, columns=[name for name, _ in columns], dtype=object)
+                    duck.register("chunk", chunk)
+                    duck.execute(f"COPY (SELECT {casts} FROM chunk) TO '{os.path.join(staging, f'part-{file_index:05d}.parquet')}' (FORMAT parquet, COMPRESSION zstd)")
+                    duck.unregister("chunk")
+                    total_rows += len(rows)
+                    file_index += 1
+                    if not rows:
+                        break
+                target = os.path.join(parquet_directory, table_name)
+                if os.path.isdir(target):
+                    for stale in os.listdir(target):
+                        os.remove(os.path.join(target, stale))
+                    os.rmdir(target)
+                os.replace(staging, target)
+        finally:
+            duck.close()
+    with open(os.path.join(parquet_directory, EXPORT_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"db": os.path.abspath(db_file), "source_version": list(source_version)}, f)
+    return total_rows
+
+
+class UnsupportedQueryError(Exception):
+    """Raised for SQL the DuckDB translation cannot reproduce exactly; the query then runs on SQLite."""
+
+
+def like_to_regex(pattern: str) -> str:
+    """
+    Translates a SQLite LIKE pattern into an RE2 regex with the same matches.
+
+    SQLite's LIKE ignores case for ASCII letters only, so each ASCII letter becomes a
+    two-letter class and every other character must match exactly (DuckDB's ILIKE
+    would also fold Ä and ä). % and _ match any characters, newlines included.
+    """
+    parts = ["(?s)"]
+    for character in pattern:
+        if character == "%":
+            parts.append(".*")
+        elif character == "_":
+            parts.append(".")
+        elif character.isascii() and character.isalpha():
+            parts.append(f"[{character.lower()}{character.upper()}]")
+        else:
+            parts.append(re.escape(character))
+    return "".join(parts)
+
+
+def to_duckdb_sql(sql: str) -> str:
+    """
+    Rewrites the SQLite-isms the LLM uses into DuckDB SQL.
+
+    date()/datetime()/strftime() become macros with SQLite's argument order, 'now'
+    and text results, `LIKE '<pattern>'` becomes `SIMILAR TO` an ASCII-case-insensitive
+    regex (see like_to_regex) and CAST(... AS REAL) becomes DOUBLE. Integer division
+    and NULL ordering are handled by connection settings. A LIKE without a literal
+    pattern, or with ESCAPE, raises UnsupportedQueryError; anything else unsupported
+    fails in DuckDB. Either way the query falls back to SQLite.
+    """
+    matches = list(SQL_TOKEN_PATTERN.finditer(sql))
+    tokens = []
+    previous_word = ""
+    pattern_index = None
+    for index, match in enumerate(matches):
+        literal, quoted, comment, space, word, punctuation = match.groups()
+        token = match.group(0)
+        if index == pattern_index:
+            regex = like_to_regex(literal[1:-1].replace("''", "'"))
+            token = "'" + regex.replace("'", "''") + "'"
+        elif word:
+            lowered = word.lower()
+            following = sql[match.end():].lstrip()[:1]
+            if lowered in ("date", "datetime", "strftime") and following == "(":
+                token = f"sqlite_{lowered}"
+            elif lowered == "like":
+                following_tokens = [i for i in range(index + 1, len(matches)) if not (matches[i].group(3) or matches[i].group(4))]
+                pattern_index = following_tokens[0] if following_tokens and matches[following_tokens[0]].group(1) else None
+                if pattern_index is None or (len(following_tokens) > 1 and (matches[following_tokens[1]].group(5) or "").lower() == "escape"):
+                    raise UnsupportedQueryError("LIKE needs a literal pattern without ESCAPE to run on DuckDB")
+                token = "SIMILAR TO"
+            elif lowered == "real" and previous_word == "as":
+                token = "DOUBLE"
+            previous_word = lowered
+        elif not (space or comment):
+            previous_word = ""
+        tokens.append(token)
+    return "".join(tokens)
+
+
+class _RenamedCursor:
+    """A DuckDB cursor whose description carries SQLite's column names, so rendered headers match across engines."""
+
+    def __init__(self, cursor, column_names: List[str]):
+        self._cursor = cursor
+        self.description = [(name,) + tuple(column[1:]) for name, column in zip(column_names, cursor.description)]
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def is_analytical(sql: str) -> bool:
+    """True for aggregations, GROUP BY, DISTINCT and window queries: the shapes a columnar engine speeds up."""
+    return any(word.lower() in ANALYTICAL_KEYWORDS for _, _, _, _, word, _ in SQL_TOKEN_PATTERN.findall(sql) if word)
+
+
+class ColumnarEngine:
+    """
+    Runs SQL tool queries with DuckDB over the Parquet export of a SQLite database.
+
+    The engine only takes a query when DuckDB is installed, the export is current
+    (its manifest matches the database's version stamp) and the configured mode
+    asks for it: always for "duckdb", analytical query shapes for "auto", never for
+    "sqlite". Queries run in worker threads and are interrupted on timeout or
+    cancellation, like SQLitePool's.
+
+    Args:
+        db_file (str): The SQLite database the Parquet files were exported from.
+        parquet_directory (Optional[str]): The export directory. Defaults to `parquet_directory_for(db_file)`.
+        max_workers (int): Worker threads, and so concurrent queries.
+        timeout_seconds (float): Per-query timeout.
+    """
+
+    def __init__(self, db_file: str, parquet_directory: Optional[str] = None, max_workers: int = 4, timeout_seconds: float = 30):
+        self.db_file = db_file
+        self.parquet_directory = parquet_directory or parquet_directory_for(db_file)
+        self.timeout_seconds = timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="duckdb")
+        self._connection = None
+        self._manifest_stamp = None
+        self._source_version = None
+
+    def _read_manifest(self) -> None:
+        path = os.path.join(self.parquet_directory, EXPORT_MANIFEST)
+        try:
+            stamp = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self._manifest_stamp, self._source_version = None, None
+            return
+        if stamp == self._manifest_stamp:
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            self._source_version = tuple(json.load(f)["source_version"])
+        self._manifest_stamp = stamp
+        # A new export may have added or removed tables, so the views are rebuilt on next use.
+        # The old connection is left to in-flight cursors rather than closed under them.
+        self._connection = None
+
+    def is_fresh(self) -> bool:
+        self._read_manifest()
+        return self._source_version is not None and self._source_version == database_version(self.db_file)
+
+    def accepts(self, sql: str, mode: str) -> bool:
+        if duckdb is None or mode == "sqlite":
+            return False
+        if mode == "auto" and not is_analytical(sql):
+            return False
+        return self.is_fresh()
+
+    def _get_connection(self):
+        if self._connection is None:
+            connection = duckdb.connect()
+            # SQLite's / truncates integer operands and NULLs sort first in ascending order;
+            # GLOBAL so the per-query cursors inherit both
+            connection.execute("SET GLOBAL integer_division = true")
+            connection.execute("SET GLOBAL default_null_order = 'nulls_first_on_asc_last_on_desc'")
+            for statement in DUCKDB_SHIM_MACROS:
+                connection.execute(statement)
+            for table_name in sorted(os.listdir(self.parquet_directory)):
+                table_directory = os.path.join(self.parquet_directory, table_name)
+                if os.path.isdir(table_directory) and not table_name.startswith("."):
+                    pattern = os.path.join(os.path.abspath(table_directory), "*.parquet").replace("'", "''")
+                    connection.execute(f"CREATE VIEW \"{table_name}\" AS SELECT * FROM read_parquet('{pattern}')")
+            self._connection = connection
+        return self._connection
+
+    def sqlite_column_names(self, sql: str) -> List[str]:
+        """The result column names SQLite gives `sql`, read from an empty wrapper query."""
+        with sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True) as conn:
+            return [column[0] for column in conn.execute(f"SELECT * FROM ({sql}) WHERE 0").description]
+
+    def _run(self, cursor, sql: str, fetch: Callable[[Any], Any]) -> Any:
+        duckdb_sql = to_duckdb_sql(sql)
+        column_names = self.sqlite_column_names(sql)
+        cursor.execute(duckdb_sql)
+        if len(column_names) != len(cursor.description):
+            raise UnsupportedQueryError(f"DuckDB returned {len(cursor.description)} columns where SQLite returns {len(column_names)}")
+        return fetch(_RenamedCursor(cursor, column_names))
+
+    async def execute(self, sql: str, fetch: Callable[[Any], Any]) -> Any:
+        """
+        Runs `sql`, translated by `to_duckdb_sql`, in a worker thread and returns what `fetch` reads from the cursor.
+
+        The cursor `fetch` sees reports SQLite's column names (`COUNT(*)` rather than DuckDB's
+        `count_star()`), so rendered results are the same whichever engine ran them.
+
+        Raises:
+            QueryTimeoutError: If the query ran past the timeout.
+            UnsupportedQueryError: If the query cannot be translated exactly.
+            duckdb.Error: If DuckDB cannot run the query.
+        """
+        cursor = self._get_connection().cursor()
+        loop = asyncio.get_running_loop()
+        timed_out = []
+
+        def interrupt_on_timeout() -> None:
+            timed_out.append(True)
+            cursor.interrupt()
+
+        future = loop.run_in_executor(self._executor, lambda: self._run(cursor, sql, fetch))
+        timer = loop.call_later(self.timeout_seconds, interrupt_on_timeout)
+
+        def close(done: asyncio.Future) -> None:
+            if not done.cancelled():
+                done.exception()
+            cursor.close()
+
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            cursor.interrupt()
+            raise
+        except duckdb.InterruptException as e:
+            if timed_out:
+                raise QueryTimeoutError(f"Query exceeded its timeout and was interrupted: {sql}") from e
+            raise
+        finally:
+            timer.cancel()
+            future.add_done_callback(close)
+
+    async def try_execute(self, sql: str, fetch: Callable[[Any], Any], mode: str) -> Optional[Any]:
+        """
+        Runs `sql` on DuckDB if `accepts` takes it, returning None when the caller should use SQLite instead.
+
+        A query DuckDB rejects, for example one using a SQLite function the shim does
+        not cover, or one `to_duckdb_sql` cannot translate exactly, also returns None,
+        so the result never depends on the engine.
+        Timeouts are raised rather than retried on SQLite.
+        """
+        if not self.accepts(sql, mode):
+            return None
+        try:
+            return await self.execute(sql, fetch)
+        except (duckdb.Error, sqlite3.Error, UnsupportedQueryError) as e:
+            logger.info(f"DuckDB could not run the query, falling back to SQLite: {e}")
+            return None
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        if self._connection is not None:
+            self._connection.close()
@@ -0,0 +1,132 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from databahn.utils.tokens import CHARS_PER_TOKEN, count_tokens
+
+# Share of the context budget a result gets relative to others, by kind. SQL results are exact
+# answers from the organisation's own data, so they keep more of their rows than web passages do.
+RESULT_PRIORITIES = {"sql": 2, "text": 1}
+# The last line fetch_tsv writes under every SQL result.
+_ROW_COUNT = re.compile(r"^\((\d+) rows?\)$")
+_TRUNCATED_ROW_COUNT = re.compile(r"^\.\.\. truncated: showing (\d+) of (\d+) rows \((.*)\)$")
+
+
+def result_kind(content: str) -> str:
+    """Returns "sql" for the TSV of an SQL tool (recognised by its row-count line) and "text" otherwise."""
+    last_line = content.rstrip().rsplit("\n", 1)[-1]
+    return "sql" if _ROW_COUNT.match(last_line) or _TRUNCATED_ROW_COUNT.match(last_line) else "text"
+
+
+def allocate_budget(sizes: List[int], weights: List[int], budget: int) -> List[int]:
+    """
+    Splits `budget` tokens across results of the given sizes in proportion to their weights.
+
+    A result smaller than its share gets exactly its size and the rest of its share is
+    split again among the larger ones, so no tokens are left unused while any result is cut.
+    """
+    allocation = [0] * len(sizes)
+    remaining = set(range(len(sizes)))
+    left = max(budget, 0)
+    while remaining:
+        total_weight = sum(weights[i] for i in remaining)
+        fits = [i for i in remaining if sizes[i] <= left * weights[i] / total_weight]
+        if not fits:
+            for i in remaining:
+                allocation[i] = int(left * weights[i] / total_weight)
+            break
+        for i in fits:
+            allocation[i] = sizes[i]
+            left -= sizes[i]
+            remaining.discard(i)
+    return allocation
+
+
+def truncate_tsv(content: str, max_tokens: int) -> str:
+    """
+    Keeps the header and as many leading rows of an SQL result as fit in `max_tokens`.
+
+    The row-count line is rewritten in fetch_tsv's format, so the model still learns
+    how many rows the query matched and that it is seeing only some of them.
+    """
+    lines = content.rstrip().split("\n")
+    trailer, rows = lines[-1], lines[1:-1]
+    match = _TRUNCATED_ROW_COUNT.match(trailer)
+    total_rows = int(match.group(2)) if match else int(_ROW_COUNT.match(trailer).group(1))
+    kept = [lines[0]]
+    used = count_tokens(lines[0]) + count_tokens(trailer) + 8
+    for row in rows:
+        row_tokens = count_tokens(row) + 1
+        if used + row_tokens > max_tokens:
+            break
+        kept.append(row)
+        used += row_tokens
+    if len(kept) - 1 == len(rows):
+        return content
+    kept.append(f"... truncated: showing {len(kept) - 1} of {total_rows} rows (context budget)")
+    return "\n".join(kept)
+
+
+def truncate_text(content: str, max_tokens: int) -> str:
+    """Cuts text to about `max_tokens` tokens at a line or word boundary and says how much was dropped."""
+    tokens = count_tokens(content)
+    if tokens <= max_tokens:
+        return content
+    cut = content[:max(max_tokens, 0) * CHARS_PER_TOKEN]
+    while cut and count_tokens(cut) > max_tokens:
+        cut = cut[:int(len(cut) * 0.9)]
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary]
+    return f"{cut.rstrip()}\n[... truncated: {tokens - count_tokens(cut)} more tokens]"
+
+
+def build_context(results: List[Dict[str, Any]], token_budget: int) -> Tuple[str, Dict[str, Any]]:
+    """
+    Renders tool results for a prompt, fitting them into `token_budget` tokens.
+
+    The budget is allocated across results by RESULT_PRIORITIES (see allocate_budget);
+    an SQL result over its allocation keeps its leading rows and its row count, and any
+    other result is cut at its allocation. Each result is rendered as plain text under
+    a "--- Tool result {n} ---" line rather than as JSON, whose escaping of newlines
+    and tabs costs tokens without telling the model anything.
+
+    Args:
+        results (List[Dict[str, Any]]): Tool messages as returned by the dispatcher.
+        token_budget (int): The most tokens the rendered results may take up.
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: The rendered results, and a report with the budget, the
+        tokens of the results before and after fitting, and which results were truncated.
+    """
+    headers = [f"--- Tool result {i + 1} ---" for i in range(len(results))]
+    contents = [str(result.get("content") or "(no result)") if isinstance(result, dict) else str(result) for result in results]
+    kinds = [result_kind(content) for content in contents]
+    sizes = [count_tokens(content) for content in contents]
+    overhead = sum(count_tokens(header) + 2 for header in headers)
+    allocation = allocate_budget(sizes, [RESULT_PRIORITIES[kind] for kind in kinds], token_budget - overhead)
+
+    blocks = []
+    truncated = []
+    for i, (header, content, kind) in enumerate(zip(headers, contents, kinds)):
+        if sizes[i] > allocation[i]:
+            content = truncate_tsv(content, allocation[i]) if kind == "sql" else truncate_text(content, allocation[i])
+            truncated.append(i + 1)
+        blocks.append(f"{header}\n{content}")
+    context = "\n\n".join(blocks)
+    report = {
+        "token_budget": token_budget,
+        "result_tokens": sum(sizes),
+        "context_tokens": count_tokens(context),
+        "truncated_results": truncated,
+    }
+    return context, report
+
+
+def lookup(state: Dict[str, Any], key: str) -> Optional[Any]:
+    """Resolves a dotted key such as "orchestrator.results" in the state, without copying it."""
+    value = state
+    for key_part in key.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key_part)
+    return value
@@ -0,0 +1,161 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from databahn.utils.query_text import normalize_query
+
+
+@dataclass
+class CachedPage:
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes
+    markdown: str
+    fetched_at: float
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """The If-None-Match/If-Modified-Since headers that revalidate this copy."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class CrawlCache:
+    """
+    An on-disk cache of crawled pages and search results, backed by SQLite.
+
+    Pages are keyed by URL and keep the raw body, the ETag/Last-Modified validators
+    and the markdown derived from the body. A page younger than `ttl_seconds` is
+    served as is; an older one is revalidated with a conditional GET and, on a 304,
+    served again without re-parsing. Search results are keyed by normalized query
+    and search endpoint. When the stored bodies exceed `max_bytes`, the least
+    recently used pages are evicted.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 3600, search_ttl_seconds: float = 900, max_bytes: int = 200_000_000,
+                 clock: Callable[[], float] = time.time):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.search_ttl_seconds = search_ttl_seconds
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    body BLOB NOT NULL,
+                    markdown TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_accessed_at ON pages(accessed_at)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS searches (
+                    query_key TEXT PRIMARY KEY,
+                    links TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def is_fresh(self, page: CachedPage) -> bool:
+        return self._clock() - page.fetched_at <= self.ttl_seconds
+
+    def get_page(self, url: str) -> Optional[CachedPage]:
+        """Returns the cached copy of `url`, fresh or stale, and marks it recently used."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT url, etag, last_modified, body, markdown, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (self._clock(), url))
+        page = CachedPage(*row)
+        if self.is_fresh(page):
+            self.hits += 1
+        return page
+
+    def put_page(self, url: str, etag: Optional[str], last_modified: Optional[str], body: bytes, markdown: str) -> None:
+        """Stores a freshly downloaded page and evicts least recently used pages past `max_bytes`."""
+        self.misses += 1
+        size = len(body) + len(markdown.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = self._clock()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, body, markdown, size, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body, markdown, size, now, now),
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+            while total > self.max_bytes:
+                oldest = conn.execute("SELECT url, size FROM pages ORDER BY accessed_at LIMIT 1").fetchone()
+                conn.execute("DELETE FROM pages WHERE url = ?", (oldest[0],))
+                total -= oldest[1]
+
+    def mark_revalidated(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        """Restarts a page's TTL after a 304, keeping validators the server did not resend."""
+        self.revalidated += 1
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE pages SET fetched_at = ?, etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (self._clock(), etag, last_modified, url),
+            )
+
+    @staticmethod
+    def make_search_key(query: str, endpoint: str) -> str:
+        return f"{endpoint}\n{normalize_query(query)}"
+
+    def get_search(self, query: str, endpoint: str) -> Optional[List[str]]:
+        """Returns the cached result links for a query if they are younger than `search_ttl_seconds`."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT links, fetched_at FROM searches WHERE query_key = ?", (self.make_search_key(query, endpoint),)
+            ).fetchone()
+        if row is None or self._clock() - row[1] > self.search_ttl_seconds:
+            return None
+        return json.loads(row[0])
+
+    def put_search(self, query: str, endpoint: str, links: List[str]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO searches (query_key, links, fetched_at) VALUES (?, ?, ?)",
+                (self.make_search_key(query, endpoint), json.dumps(links), self._clock()),
+            )
+            conn.execute("DELETE FROM searches WHERE fetched_at < ?", (self._clock() - self.search_ttl_seconds,))
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the fresh-hit, 304-revalidation and download counters and the number and size of cached pages."""
+        with self._connect() as conn:
+            pages, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses, "pages": pages, "bytes": size}
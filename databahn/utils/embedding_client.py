@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# A backend takes a batch of texts and a model name and returns one vector per text, in order.
+EmbeddingBackend = Callable[[List[str], str], Awaitable[List[List[float]]]]
+
+
+async def openai_embedding_backend(texts: List[str], model: str) -> List[List[float]]:
+    """Embeds a batch of texts with a single call to the async OpenAI client."""
+    # Imported here so that importing the client (as the MCP servers do) does not require an API key
+    from base import openai_client
+    response = await openai_client.embeddings.create(input=texts, model=model)
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+class AsyncEmbeddingClient:
+    """
+    An async embedding client that coalesces concurrent requests into batches.
+
+    Calls to `embed` that arrive within `batch_window` seconds of each other are
+    sent to the backend as one multi-input request, so concurrent queries share a
+    round-trip instead of queueing behind each other on the event loop. The
+    backend is injectable, which lets the client run offline with a fake.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[EmbeddingBackend] = None,
+        model: str = EMBEDDING_MODEL,
+        batch_window: float = 0.01,
+        max_batch_size: int = 256,
+    ):
+        self.backend = backend or openai_embedding_backend
+        self.model = model
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        """
+        Embeds a single text, batching it with any other texts requested concurrently.
+
+        Args:
+            text (str): The text to embed.
+
+        Returns:
+            Optional[List[float]]: The embedding, or None if the text is empty or the backend failed.
+        """
+        if not text or not text.strip():
+            return None
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embeds a known list of texts directly, without waiting for the batch window.
+
+        This is the path used for catalog builds: the whole list goes to the backend
+        in as few calls as `max_batch_size` allows.
+
+        Args:
+            texts (List[str]): The texts to embed.
+
+        Returns:
+            List[Optional[List[float]]]: One embedding per input text, None for empty texts or failed batches.
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        indexed_texts = [(i, text) for i, text in enumerate(texts) if text and text.strip()]
+        for start in range(0, len(indexed_texts), self.max_batch_size):
+            chunk = indexed_texts[start:start + self.max_batch_size]
+            vectors = await self._call_backend([text for _, text in chunk])
+            for (i, _), vector in zip(chunk, vectors):
+                results[i] = vector
+        return results
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run_batch(batch))
+        # Keep a reference so the task is not garbage collected while it runs.
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        # Identical texts in the same window are embedded once.
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = await self._call_backend(unique_texts)
+            vectors_by_text: Dict[str, Optional[List[float]]] = dict(zip(unique_texts, vectors))
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(vectors_by_text.get(text))
+        finally:
+            # If the batch was cancelled mid-call, cancel its waiters rather than leave them pending forever.
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+
+    async def _call_backend(self, texts: List[str]) -> List[Optional[List[float]]]:
+        try:
+            vectors = await self.backend(texts, self.model)
+        except Exception as e:
+            logger.error(f"Error getting embeddings for a batch of {len(texts)} texts: {e}")
+            return [None] * len(texts)
+        if len(vectors) != len(texts):
+            logger.error(f"Embedding backend returned {len(vectors)} vectors for {len(texts)} texts.")
+            return [None] * len(texts)
+        return list(vectors)
+
+
+embedding_client = AsyncEmbeddingClient()
@@ -0,0 +1,157 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Keys bound per SELECT in get_many, well under SQLite's limit on host parameters.
+GET_MANY_CHUNK_SIZE = 500
+
+
+class EmbeddingStore:
+    """
+    A content-addressed, on-disk store for embedding vectors backed by SQLite.
+
+    Every vector is keyed by a hash of the embedded text plus the model name, so
+    a restarted process (or another uvicorn worker) can reuse vectors that were
+    already computed and only re-embed text whose content actually changed.
+    Vectors are stored as raw float32 bytes.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL DEFAULT 0
+                )
+                """
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(embeddings)").fetchall()]
+            if "created_at" not in columns:
+                conn.execute("ALTER TABLE embeddings ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_model ON embeddings(model)")
+
+    @contextmanager
+    def _connect(self):
+        # A generous busy timeout lets several workers warm the store at the same time.
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        """
+        Builds the content address for a piece of text embedded with a given model.
+
+        Args:
+            text (str): The exact text that is sent to the embedding model.
+            model (str): The embedding model name.
+
+        Returns:
+            str: A hex sha256 digest of the model name and text.
+        """
+        return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Iterable[str], model: str) -> Dict[str, np.ndarray]:
+        """
+        Loads the stored vectors for the given keys, looking them up GET_MANY_CHUNK_SIZE keys at a time.
+
+        Args:
+            keys (Iterable[str]): Content addresses built with `make_key`.
+            model (str): The embedding model the keys belong to.
+
+        Returns:
+            Dict[str, np.ndarray]: The vectors that were found, keyed by content address.
+        """
+        wanted = list(dict.fromkeys(keys))
+        if not wanted:
+            return {}
+        found = {}
+        try:
+            with self._connect() as conn:
+                for start in range(0, len(wanted), GET_MANY_CHUNK_SIZE):
+                    chunk = wanted[start:start + GET_MANY_CHUNK_SIZE]
+                    placeholders = ", ".join("?" * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})", (model, *chunk)
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float32)
+        except sqlite3.Error as e:
+            logger.error(f"Error reading the embedding store '{self.db_path}': {e}")
+            return {}
+        return found
+
+    def put_many(self, items: List[Tuple[str, List[float]]], model: str) -> None:
+        """
+        Writes vectors to the store, replacing any vector stored under the same key.
+
+        Args:
+            items (List[Tuple[str, List[float]]]): (content address, vector) pairs.
+            model (str): The embedding model that produced the vectors.
+        """
+        if not items:
+            return
+        created_at = time.time()
+        rows = []
+        for key, vector in items:
+            vector_array = np.asarray(vector, dtype=np.float32)
+            rows.append((key, model, int(vector_array.shape[0]), vector_array.tobytes(), created_at))
+        try:
+            with self._lock, self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Error writing to the embedding store '{self.db_path}': {e}")
+
+    def get(self, key: str, model: str, max_age: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Returns the vector stored under a single key, or None.
+
+        Args:
+            key (str): A content address built with `make_key`.
+            model (str): The embedding model the key belongs to.
+            max_age (Optional[float]): If set, vectors written more than this many seconds ago are treated as missing.
+        """
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT vector, created_at FROM embeddings WHERE key = ? AND model = ?", (key, model)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading the embedding store '{self.db_path}': {e}")
+            return None
+        if not row:
+            return None
+        vector, created_at = row
+        if max_age is not None and time.time() - created_at > max_age:
+            return None
+        return np.frombuffer(vector, dtype=np.float32)
+
+    def delete_older_than(self, max_age: float) -> int:
+        """Deletes vectors written more than `max_age` seconds ago and returns how many were removed."""
+        try:
+            with self._lock, self._connect() as conn:
+                cursor = conn.execute("DELETE FROM embeddings WHERE created_at < ?", (time.time() - max_age,))
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Error pruning the embedding store '{self.db_path}': {e}")
+            return 0
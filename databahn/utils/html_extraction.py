@@ -0,0 +1,397 @@
+import io
+import re
+from typing import List, Optional
+from urllib.parse import urljoin
+
+import html2text
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+except ImportError:  # lxml is optional; without it pages go through BeautifulSoup and html2text
+    lxml = None
+
+try:
+    import pypdf
+except ImportError:  # pypdf is optional; without it PDF advisories are skipped
+    pypdf = None
+
+EXTRACTION_BACKENDS = ("auto", "lxml", "html2text")
+TRUNCATION_MARKER = "\n\n[... content truncated]"
+
+# Never part of the readable content.
+BOILERPLATE_TAGS = ("script", "style", "noscript", "iframe", "svg", "canvas", "form", "button", "template",
+                    "nav", "header", "footer", "aside", "select", "input", "object", "embed")
+# class/id hints, as in Readability: unlikely candidates are dropped, and both adjust block scores.
+NEGATIVE_HINTS = re.compile(r"comment|sidebar|footer|masthead|menu|nav|cookie|banner|share|social|promo|related|"
+                            r"breadcrumb|advert|sponsor|popup|subscribe|newsletter|pagination|widget|\bads?\b", re.I)
+POSITIVE_HINTS = re.compile(r"article|content|main|body|entry|post|text|story|advisory|description|detail|bulletin", re.I)
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "ul", "ol", "li", "pre", "blockquote", "table", "thead", "tbody",
+              "tr", "dl", "dt", "dd", "figure", "figcaption", "hr", "body", "details", "summary", "center"} | set(HEADING_TAGS)
+# A <main>/<article> with less text than this is probably a teaser; score the page instead.
+MIN_LANDMARK_CHARS = 200
+_WHITESPACE = re.compile(r"[ \t\r\f\v\n]+")
+# lxml rejects str input that still carries an XML encoding declaration.
+_XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>")
+
+# What a fetched body is, decided from its Content-Type and first bytes.
+CONTENT_KINDS = ("html", "text", "pdf", "binary")
+HTML_MIME_TYPES = {"text/html", "application/xhtml+xml"}
+TEXT_MIME_TYPES = {"application/json", "application/xml", "application/javascript", "application/x-ndjson"}
+_LANDMARK_TAG = re.compile(rb"<(/?)(main|article)[\s>]", re.I)
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.I)
+
+
+def _collapse(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _hint_weight(element) -> int:
+    hints = f"{element.get('class', '')} {element.get('id', '')}"
+    weight = 0
+    if NEGATIVE_HINTS.search(hints):
+        weight -= 25
+    if POSITIVE_HINTS.search(hints):
+        weight += 25
+    return weight
+
+
+def _link_density(element) -> float:
+    text_length = len(_collapse(element.text_content())) or 1
+    link_length = sum(len(_collapse(link.text_content())) for link in element.iter("a"))
+    return link_length / text_length
+
+
+def _strip_boilerplate(root) -> None:
+    for element in list(root.iter(*BOILERPLATE_TAGS)):
+        if element.getparent() is None:
+            continue
+        # An article's own header (title, date) and footer (references) are content
+        if element.tag in ("header", "footer") and any(ancestor.tag in ("article", "main") for ancestor in element.iterancestors()):
+            continue
+        element.drop_tree()
+    for element in list(root.iter("div", "section", "ul", "table", "span", "p")):
+        if element.getparent() is None:
+            continue
+        hints = f"{element.get('class', '')} {element.get('id', '')}"
+        if NEGATIVE_HINTS.search(hints) and not POSITIVE_HINTS.search(hints):
+            element.drop_tree()
+
+
+def find_main_content(root):
+    """
+    Picks the element holding a page's main content, Readability style.
+
+    A <main>, <article> or role="main" landmark with enough text wins outright.
+    Otherwise every paragraph-like block scores its parent (and half that for its
+    grandparent) by text length and comma count; candidates are weighted by their
+    class/id hints and discounted by link density, and the best one is returned.
+    """
+    for path in ("//main", "//article", "//*[@role='main']"):
+        landmarks = root.xpath(path)
+        if landmarks:
+            best = max(landmarks, key=lambda element: len(element.text_content()))
+            if len(_collapse(best.text_content())) >= MIN_LANDMARK_CHARS:
+                return best
+
+    scores = {}
+    for block in root.iter("p", "pre", "td", "li", "dd"):
+        text = _collapse(block.text_content())
+        if len(text) < 25:
+            continue
+        score = 1 + text.count(",") + min(len(text) // 100, 3)
+        parent = block.getparent()
+        for ancestor, share in ((parent, 1.0), (parent.getparent() if parent is not None else None, 0.5)):
+            if ancestor is None or not isinstance(ancestor.tag, str):
+                continue
+            if ancestor not in scores:
+                scores[ancestor] = _hint_weight(ancestor)
+            scores[ancestor] += score * share
+    if not scores:
+        return root.find("body") if root.find("body") is not None else root
+    return max(scores, key=lambda element: scores[element] * (1 - _link_density(element)))
+
+
+class _MarkdownWriter:
+    """Renders an lxml element tree as Markdown: headings, paragraphs, lists, links, code, quotes and tables."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.blocks: List[str] = []
+
+    def inline(self, element) -> str:
+        parts = [element.text or ""]
+        for child in element:
+            parts.append(self.inline_element(child))
+            parts.append(child.tail or "")
+        return "".join(parts)
+
+    def inline_element(self, element) -> str:
+        tag = element.tag if isinstance(element.tag, str) else ""
+        if not tag:
+            return ""
+        if tag == "br":
+            return "\n"
+        if tag in BLOCK_TAGS:
+            return " " + self.inline(element) + " "
+        inner = _collapse(self.inline(element))
+        if not inner:
+            return ""
+        if tag == "a" and element.get("href") and not element.get("href").startswith(("javascript:", "#")):
+            return f"[{inner}]({urljoin(self.base_url, element.get('href'))})"
+        if tag in ("strong", "b"):
+            return f"**{inner}**"
+        if tag in ("em", "i"):
+            return f"_{inner}_"
+        if tag == "code":
+            return f"`{inner}`"
+        return inner
+
+    def paragraph(self, text: str, prefix: str = "") -> None:
+        lines = [_collapse(line) for line in text.split("\n")]
+        text = "\n".join(line for line in lines if line)
+        if text:
+            self.blocks.append(prefix + text)
+
+    def block(self, element, depth: int = 0) -> None:
+        tag = element.tag if isinstance(element.tag, str) else ""
+        if tag in HEADING_TAGS:
+            self.paragraph(self.inline(element), "#" * HEADING_TAGS[tag] + " ")
+        elif tag == "pre":
+            code = element.text_content().strip("\n")
+            if code.strip():
+                self.blocks.append(f"```\n{code}\n```")
+        elif tag in ("ul", "ol"):
+            self.list(element, depth)
+        elif tag == "table":
+            self.table(element)
+        elif tag == "blockquote":
+            quoted = _MarkdownWriter(self.base_url)
+            quoted.container(element, depth)
+            if quoted.blocks:
+                self.blocks.append("\n".join(f"> {line}" for line in "\n\n".join(quoted.blocks).split("\n")))
+        elif tag == "hr":
+            self.blocks.append("---")
+        else:
+            self.container(element, depth)
+
+    def container(self, element, depth: int) -> None:
+        run = element.text or ""
+        for child in element:
+            if isinstance(child.tag, str) and child.tag in BLOCK_TAGS:
+                self.paragraph(run)
+                self.block(child, depth)
+                run = child.tail or ""
+            else:
+                run += self.inline_element(child) + (child.tail or "")
+        self.paragraph(run)
+
+    def list(self, element, depth: int) -> None:
+        ordered = element.tag == "ol"
+        items = []
+        for number, item in enumerate((child for child in element if child.tag == "li"), start=1):
+            nested = []
+            text = item.text or ""
+            for child in item:
+                if child.tag in ("ul", "ol"):
+                    nested.append(child)
+                    text += child.tail or ""
+                else:
+                    text += self.inline_element(child) + (child.tail or "")
+            marker = f"{number}." if ordered else "-"
+            items.append(f"{'  ' * depth}{marker} {_collapse(text)}")
+            for sublist in nested:
+                writer = _MarkdownWriter(self.base_url)
+                writer.list(sublist, depth + 1)
+                items.extend(writer.blocks)
+        if items:
+            self.blocks.append("\n".join(items))
+
+    def table(self, element) -> None:
+        rows = []
+        for row_number, row in enumerate(element.iter("tr")):
+            cells = [_collapse(self.inline(cell)).replace("|", "\\|") for cell in row if cell.tag in ("td", "th")]
+            if not any(cells):
+                continue
+            rows.append("| " + " | ".join(cells) + " |")
+            if row_number == 0 and any(cell.tag == "th" for cell in row):
+                rows.append("|" + " --- |" * len(cells))
+        if rows:
+            self.blocks.append("\n".join(rows))
+
+    def render(self, element) -> str:
+        self.block(element)
+        return "\n\n".join(self.blocks)
+
+
+def lxml_markdown(html: str, base_url: str) -> Optional[str]:
+    """Main-content Markdown with lxml: boilerplate is stripped, the main block is found and rendered."""
+    root = lxml.html.document_fromstring(_XML_DECLARATION.sub("", html, count=1))
+    _strip_boilerplate(root)
+    content = find_main_content(root)
+    markdown = _MarkdownWriter(base_url).render(content)
+    return markdown or None
+
+
+def html2text_markdown(html: str) -> Optional[str]:
+    """The original path: BeautifulSoup's html.parser, then html2text on article, main or body."""
+    soup = BeautifulSoup(html, 'html.parser')
+    content = soup.find('article') or soup.find('main') or soup.body
+    if not content:
+        return None
+    h = html2text.HTML2Text()
+    h.ignore_links = False
+    return h.handle(str(content))
+
+
+def sniff_content_kind(content_type: Optional[str], head: bytes) -> str:
+    """
+    Classifies a response as html, text, pdf or binary.
+
+    The first bytes win over the Content-Type header, which is often missing or
+    generic (application/octet-stream) for advisories and log dumps: a %PDF-
+    signature is a PDF, an HTML prologue is HTML and NUL bytes mean binary.
+    """
+    mime = (content_type or "").split(";")[0].strip().lower()
+    start = head.lstrip()[:256].lower()
+    if head.startswith(b"%PDF-") or mime == "application/pdf":
+        return "pdf"
+    if b"\x00" in head[:1024]:
+        return "binary"
+    if mime in HTML_MIME_TYPES or start.startswith((b"<!doctype html", b"<html", b"<?xml")) or b"<body" in start:
+        return "html"
+    if mime.startswith("text/") or mime in TEXT_MIME_TYPES:
+        return "text"
+    if mime in ("", "application/octet-stream"):
+        try:
+            head[:1024].decode("utf-8")
+            return "text"
+        except UnicodeDecodeError:
+            pass
+    return "binary"
+
+
+class LandmarkTracker:
+    """
+    Watches streamed HTML for the end of its main content, so the fetch can stop early.
+
+    The content is complete once </main> arrives, or, on pages without <main>,
+    once the first <article> closes after at least `min_article_bytes` (shorter
+    articles are usually teasers on a listing page).
+    """
+
+    def __init__(self, min_article_bytes: int = 4096):
+        self.min_article_bytes = min_article_bytes
+        self._tail = b""
+        self._offset = 0
+        self._main_open = False
+        self._article_start = None
+
+    def feed(self, chunk: bytes) -> bool:
+        """Adds the next chunk; returns True once the main content has been received."""
+        data = self._tail + chunk
+        base = self._offset - len(self._tail)
+        for match in _LANDMARK_TAG.finditer(data):
+            closing, name = match.group(1), match.group(2).lower()
+            position = base + match.start()
+            if not closing:
+                self._main_open = self._main_open or name == b"main"
+                if name == b"article" and self._article_start is None:
+                    self._article_start = position
+            elif name == b"main" and self._main_open:
+                return True
+            elif (name == b"article" and not self._main_open and self._article_start is not None
+                  and position - self._article_start >= self.min_article_bytes):
+                return True
+        self._offset += len(chunk)
+        # Keep enough of the end to catch a tag split across chunks
+        self._tail = data[-16:]
+        return False
+
+
+def decode_body(body: bytes, encoding: Optional[str]) -> str:
+    """Decodes with the Content-Type charset, else a <meta charset> in the first 2 KB, else UTF-8."""
+    if not encoding:
+        match = _META_CHARSET.search(body[:2048])
+        encoding = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        return body.decode(encoding, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+def text_to_markdown(text: str, max_output_chars: int) -> Optional[str]:
+    text = text.strip()
+    if not text:
+        return None
+    return text if len(text) <= max_output_chars else text[:max_output_chars] + TRUNCATION_MARKER
+
+
+def pdf_to_markdown(body: bytes, max_output_chars: int) -> Optional[str]:
+    """The text of a PDF, page by page, stopping once `max_output_chars` is reached."""
+    reader = pypdf.PdfReader(io.BytesIO(body))
+    pages = []
+    size = 0
+    for page in reader.pages:
+        text = (page.extract_text() or "").strip()
+        if text:
+            pages.append(text)
+            size += len(text)
+        if size >= max_output_chars:
+            break
+    return text_to_markdown("\n\n".join(pages), max_output_chars)
+
+
+def extract_document(url: str, body: bytes, kind: str, encoding: Optional[str] = None, content_type: str = "",
+                     truncated: bool = False, max_input_chars: int = 2_000_000, max_output_chars: int = 20_000,
+                     backend: str = "auto") -> str:
+    """
+    Converts a fetched body to Markdown according to its sniffed kind.
+
+    HTML goes through `html_to_markdown`, text is passed through capped, and PDFs are
+    read with pypdf when it is installed. Binary bodies, PDFs cut off by the fetch's
+    byte ceiling (their cross-reference table is at the end) and PDFs without pypdf
+    are skipped with a one-line note. Runs in the extraction process pool.
+    """
+    if kind == "html":
+        return html_to_markdown(url, decode_body(body, encoding), max_input_chars=max_input_chars,
+                                max_output_chars=max_output_chars, backend=backend)
+    if kind == "text":
+        markdown = text_to_markdown(decode_body(body, encoding), max_output_chars)
+    elif kind == "pdf" and pypdf is not None and not truncated:
+        try:
+            markdown = pdf_to_markdown(body, max_output_chars)
+        except pypdf.errors.PdfReadError:
+            markdown = None
+    else:
+        reason = "PDF larger than the fetch limit" if kind == "pdf" and truncated else \
+            "PDF (install pypdf to read it)" if kind == "pdf" else f"non-text content ({content_type or 'unknown type'})"
+        return f"--- Skipped {reason} at {url} ---"
+    if not markdown:
+        return f"--- No text content found at {url} ---"
+    return f"--- Content from {url} ---\n\n{markdown}"
+
+
+def html_to_markdown(url: str, html: str, max_input_chars: int = 2_000_000, max_output_chars: int = 20_000,
+                     backend: str = "auto") -> str:
+    """
+    Converts a page's main content to Markdown, headed by its URL.
+
+    Pure CPU work with picklable arguments, so it can run in a process pool. The HTML
+    is cut to `max_input_chars` before parsing and the Markdown to `max_output_chars`.
+    The "auto" backend uses lxml when it is installed and html2text otherwise.
+    """
+    html = html[:max_input_chars]
+    if backend == "lxml" or (backend == "auto" and lxml is not None):
+        try:
+            markdown = lxml_markdown(html, url)
+        except (ValueError, lxml.etree.ParserError):
+            markdown = None
+    else:
+        markdown = html2text_markdown(html)
+    if not markdown:
+        return f"--- No main content found at {url} ---"
+    if len(markdown) > max_output_chars:
+        markdown = markdown[:max_output_chars] + TRUNCATION_MARKER
+    return f"--- Content from {url} ---\n\n{markdown}"
@@ -0,0 +1,385 @@
+import asyncio
+import os
+import re
+import sqlite3
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from databahn.utils.sql_cache import database_version
+
+# Catalog of the partitions of every partitioned table, kept in the same database.
+PARTITION_CATALOG_TABLE = 'log_partitions'
+PARTITION_GRANULARITIES = ('day', 'week')
+# Rows whose timestamp is missing or unparseable, and rows appended since the last roll, live in the head partition.
+HEAD_SUFFIX = '__head'
+
+# date('now', '-1 day') style expressions that can be evaluated without touching the database.
+CONSTANT_DATE_EXPRESSION = r"(?:date|datetime|strftime)\s*\(\s*'[^']*'(?:\s*,\s*'[^']*')*\s*\)"
+LITERAL_OR_DATE = rf"'[^']*'|{CONSTANT_DATE_EXPRESSION}"
+
+
+def partition_range(day: str, granularity: str) -> Tuple[str, str]:
+    """Returns the [start, end) ISO-date range of the partition holding `day` (YYYY-MM-DD)."""
+    start = date.fromisoformat(day)
+    if granularity == 'week':
+        start -= timedelta(days=start.weekday())
+        end = start + timedelta(days=7)
+    else:
+        end = start + timedelta(days=1)
+    return start.isoformat(), end.isoformat()
+
+
+def partition_name(table_name: str, range_start: str, granularity: str) -> str:
+    return f"{table_name}__{'w' if granularity == 'week' else 'p'}{range_start.replace('-', '')}"
+
+
+def ensure_catalog(conn: sqlite3.Connection) -> None:
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {PARTITION_CATALOG_TABLE} (
+            base_table TEXT NOT NULL,
+            partition_table TEXT PRIMARY KEY,
+            granularity TEXT NOT NULL,
+            timestamp_column TEXT NOT NULL,
+            range_start TEXT NOT NULL,
+            range_end TEXT NOT NULL,
+            archived_to TEXT
+        )""")
+
+
+def _object_type(conn: sqlite3.Connection, name: str) -> Optional[str]:
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ? AND type IN ('table', 'view')", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _renamed_create(table_sql: str, old_name: str, new_name: str) -> str:
+    # sqlite_master keeps the CREATE TABLE text as written, quoted after an ALTER TABLE RENAME
+    return re.sub(rf'CREATE TABLE (?:IF NOT EXISTS )?"?{re.escape(old_name)}"?', f'CREATE TABLE IF NOT EXISTS {new_name}', table_sql, count=1)
+
+
+def _create_like(conn: sqlite3.Connection, template_sql: str, template_name: str, new_name: str, index_columns: List[str]) -> None:
+    conn.execute(_renamed_create(template_sql, template_name, new_name))
+    for column in index_columns:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{new_name}_{column}" ON {new_name} ("{column}")')
+
+
+def _partitions(conn: sqlite3.Connection, table_name: str) -> List[Tuple[str, str, str]]:
+    # Live dated partitions only; the head partition is catalogued with an empty range
+    return conn.execute(
+        f"SELECT partition_table, range_start, range_end FROM {PARTITION_CATALOG_TABLE} "
+        "WHERE base_table = ? AND range_end != '' AND archived_to IS NULL ORDER BY range_start",
+        (table_name,),
+    ).fetchall()
+
+
+def refresh_view(conn: sqlite3.Connection, table_name: str) -> None:
+    """
+    Recreates the UNION ALL view that stands in for the original table, plus the
+    INSTEAD OF INSERT trigger that routes inserts into the head partition.
+    """
+    head = f"{table_name}{HEAD_SUFFIX}"
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{head}")')]
+    branches = [f"SELECT * FROM {name}" for name, _, _ in _partitions(conn, table_name)] + [f"SELECT * FROM {head}"]
+    conn.execute(f"DROP VIEW IF EXISTS {table_name}")
+    conn.execute(f"CREATE VIEW {table_name} AS " + " UNION ALL ".join(branches))
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    values = ", ".join(f'NEW."{column}"' for column in columns)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {table_name}__insert INSTEAD OF INSERT ON {table_name}
+        BEGIN
+            INSERT INTO {head} ({column_list}) VALUES ({values});
+        END""")
+
+
+def roll_head(conn: sqlite3.Connection, table_name: str) -> int:
+    """
+    Moves the dated rows of a partitioned table's head partition into their day/week
+    partitions, creating partitions as needed. Returns the number of rows moved.
+    """
+    head = f"{table_name}{HEAD_SUFFIX}"
+    granularity, timestamp_column = conn.execute(
+        f"SELECT granularity, timestamp_column FROM {PARTITION_CATALOG_TABLE} WHERE partition_table = ?", (head,)
+    ).fetchone()
+    head_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (head,)).fetchone()[0]
+    index_columns = [
+        conn.execute(f'PRAGMA index_info("{index[1]}")').fetchone()[2]
+        for index in conn.execute(f'PRAGMA index_list("{head}")').fetchall()
+    ]
+    dated = f"substr(\"{timestamp_column}\", 1, 10) GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+    days = [row[0] for row in conn.execute(f'SELECT DISTINCT substr("{timestamp_column}", 1, 10) FROM {head} WHERE {dated}')]
+    ranges = {}
+    for day in days:
+        try:
+            ranges.setdefault(partition_range(day, granularity), []).append(day)
+        except ValueError:
+            continue
+
+    moved = 0
+    created = False
+    for (range_start, range_end), range_days in ranges.items():
+        name = partition_name(table_name, range_start, granularity)
+        archived = conn.execute(f"SELECT archived_to FROM {PARTITION_CATALOG_TABLE} WHERE partition_table = ?", (name,)).fetchone()
+        if archived and archived[0]:
+            # Late rows for an archived range stay in the head partition rather than resurrecting it
+            continue
+        if not archived:
+            _create_like(conn, head_sql, head, name, index_columns)
+            conn.execute(
+                f"INSERT INTO {PARTITION_CATALOG_TABLE} VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                (table_name, name, granularity, timestamp_column, range_start, range_end),
+            )
+            created = True
+        placeholders = ", ".join("?" * len(range_days))
+        where = f'substr("{timestamp_column}", 1, 10) IN ({placeholders})'
+        moved += conn.execute(f"INSERT INTO {name} SELECT * FROM {head} WHERE {where}", range_days).rowcount
+        conn.execute(f"DELETE FROM {head} WHERE {where}", range_days)
+    if created:
+        refresh_view(conn, table_name)
+    conn.commit()
+    return moved
+
+
+def partition_table(conn: sqlite3.Connection, table_name: str, granularity: str = 'day', timestamp_column: str = 'timestamp') -> int:
+    """
+    Converts a flat table into day or week partitions behind a UNION ALL view of the same name.
+
+    The table becomes the head partition, its rows are rolled into their partitions, and
+    the view keeps every existing query working. Inserts into the view land in the
+    head partition; `roll_head` moves them into place. Returns the number of partitions.
+    """
+    if granularity not in PARTITION_GRANULARITIES:
+        raise ValueError(f"granularity must be one of {PARTITION_GRANULARITIES}")
+    ensure_catalog(conn)
+    if _object_type(conn, table_name) != 'table':
+        roll_head(conn, table_name)
+        return len(_partitions(conn, table_name))
+    head = f"{table_name}{HEAD_SUFFIX}"
+    conn.execute(f"ALTER TABLE {table_name} RENAME TO {head}")
+    # Indexes keep their names across the rename, so give the head partition its own
+    for index_name, column in [(index[1], conn.execute(f'PRAGMA index_info("{index[1]}")').fetchone()[2])
+                               for index in conn.execute(f'PRAGMA index_list("{head}")').fetchall()]:
+        conn.execute(f'DROP INDEX "{index_name}"')
+        conn.execute(f'CREATE INDEX "idx_{head}_{column}" ON {head} ("{column}")')
+    conn.execute(
+        f"INSERT OR REPLACE INTO {PARTITION_CATALOG_TABLE} VALUES (?, ?, ?, ?, '', '', NULL)",
+        (table_name, head, granularity, timestamp_column),
+    )
+    refresh_view(conn, table_name)
+    roll_head(conn, table_name)
+    conn.commit()
+    return len(_partitions(conn, table_name))
+
+
+def drop_partitioned_table(conn: sqlite3.Connection, table_name: str) -> None:
+    """Drops a partitioned table's view and all of its live partitions, e.g. before a full rebuild."""
+    if _object_type(conn, table_name) != 'view':
+        return
+    conn.execute(f"DROP VIEW {table_name}")
+    for (name,) in conn.execute(f"SELECT partition_table FROM {PARTITION_CATALOG_TABLE} WHERE base_table = ? AND archived_to IS NULL", (table_name,)).fetchall():
+        conn.execute(f"DROP TABLE IF EXISTS {name}")
+    conn.execute(f"DELETE FROM {PARTITION_CATALOG_TABLE} WHERE base_table = ?", (table_name,))
+
+
+def archive_partitions(conn: sqlite3.Connection, table_name: str, before: str, archive_directory: str) -> List[str]:
+    """
+    Moves the partitions that end on or before `before` (YYYY-MM-DD) out of the database.
+
+    Each partition is copied into its own SQLite file in `archive_directory`, dropped
+    from the live database and removed from the view, so queries no longer pay for
+    it. An archived file can be re-attached with ATTACH DATABASE or restored with
+    `restore_partition`. Returns the paths of the archive files written.
+    """
+    ensure_catalog(conn)
+    os.makedirs(archive_directory, exist_ok=True)
+    written = []
+    for name, range_start, range_end in _partitions(conn, table_name):
+        if range_end > before:
+            continue
+        path = os.path.abspath(os.path.join(archive_directory, f"{name}.db"))
+        table_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()[0]
+        conn.commit()
+        conn.execute("ATTACH DATABASE ? AS archive", (path,))
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS archive.{name}")
+            conn.execute(_renamed_create(table_sql, name, f"archive.{name}"))
+            conn.execute(f"INSERT INTO archive.{name} SELECT * FROM main.{name}")
+            conn.commit()
+        finally:
+            conn.execute("DETACH DATABASE archive")
+        conn.execute(f"DROP TABLE main.{name}")
+        conn.execute(f"UPDATE {PARTITION_CATALOG_TABLE} SET archived_to = ? WHERE partition_table = ?", (path, name))
+        written.append(path)
+    if written:
+        refresh_view(conn, table_name)
+        conn.commit()
+    return written
+
+
+def restore_partition(conn: sqlite3.Connection, partition: str) -> None:
+    """Copies an archived partition back into the live database and the view."""
+    base_table, path = conn.execute(
+        f"SELECT base_table, archived_to FROM {PARTITION_CATALOG_TABLE} WHERE partition_table = ?", (partition,)
+    ).fetchone()
+    head = f"{base_table}{HEAD_SUFFIX}"
+    head_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (head,)).fetchone()[0]
+    index_columns = [conn.execute(f'PRAGMA index_info("{index[1]}")').fetchone()[2] for index in conn.execute(f'PRAGMA index_list("{head}")').fetchall()]
+    _create_like(conn, head_sql, head, partition, index_columns)
+    conn.commit()
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
+    try:
+        conn.execute(f"INSERT INTO main.{partition} SELECT * FROM archive.{partition}")
+        conn.execute(f"UPDATE {PARTITION_CATALOG_TABLE} SET archived_to = NULL WHERE partition_table = ?", (partition,))
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE archive")
+    refresh_view(conn, base_table)
+    conn.commit()
+
+
+# --- Partition pruning for the SQL tools ---
+
+def load_partition_catalog(conn: sqlite3.Connection) -> Dict[str, dict]:
+    """Returns base table -> {'timestamp_column', 'partitions': [(name, range_start, range_end)], 'head'} for live partitions."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (PARTITION_CATALOG_TABLE,)).fetchone():
+        return {}
+    catalog: Dict[str, dict] = {}
+    rows = conn.execute(
+        f"SELECT base_table, partition_table, timestamp_column, range_start, range_end FROM {PARTITION_CATALOG_TABLE} "
+        "WHERE archived_to IS NULL ORDER BY range_start"
+    ).fetchall()
+    for base_table, name, timestamp_column, range_start, range_end in rows:
+        entry = catalog.setdefault(base_table, {"timestamp_column": timestamp_column, "partitions": [], "head": None})
+        if name.endswith(HEAD_SUFFIX):
+            entry["head"] = name
+        else:
+            entry["partitions"].append((name, range_start, range_end))
+    return catalog
+
+
+def _strip_string_literals(sql: str) -> str:
+    return re.sub(r"'(?:[^']|'')*'", "''", sql)
+
+
+def _evaluate(expression: str) -> Optional[str]:
+    if expression.startswith("'"):
+        return expression[1:-1]
+    # date('now', '-1 day') and friends: constant, so SQLite can evaluate them without any table
+    with sqlite3.connect(":memory:") as conn:
+        value = conn.execute(f"SELECT {expression}").fetchone()[0]
+    return None if value is None else str(value)
+
+
+def has_other_sources(sql: str) -> bool:
+    """True when the query reads more than one table: several FROM/JOIN sources, a comma join or a nested SELECT."""
+    stripped = _strip_string_literals(sql)
+    if len(re.findall(r"\bSELECT\b", stripped, re.IGNORECASE)) > 1:
+        return True
+    if len(re.findall(r"\b(?:FROM|JOIN)\b", stripped, re.IGNORECASE)) > 1:
+        return True
+    # FROM a, b
+    return bool(re.search(r"\bFROM\s+[\w\"]+(?:\s+(?:AS\s+)?\w+)?\s*,", stripped, re.IGNORECASE))
+
+
+def timestamp_bounds(sql: str, timestamp_column: str, qualifiers: List[str],
+                     qualified_only: bool = False) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Derives inclusive (lower, upper) string bounds on a timestamp column from the SQL's predicates.
+
+    Understands comparisons, BETWEEN, LIKE 'prefix%' and date(<column>) comparisons against
+    string literals or constant date()/datetime() expressions. With `qualified_only`, only
+    predicates on `<qualifier>.<column>` count, for queries where an unqualified column may
+    belong to another table. Returns (None, None) when the query has an OR or a NOT (other
+    than IS NOT NULL / NOT NULL) outside string literals, since the predicates may then not all apply.
+    """
+    stripped = _strip_string_literals(sql)
+    if re.search(r"\bOR\b", stripped, re.IGNORECASE) or re.search(r"\bNOT\b(?!\s+NULL\b)", stripped, re.IGNORECASE):
+        return None, None
+    qualifier = "|".join(re.escape(q) for q in qualifiers)
+    # Not preceded by another table's qualifier or part of a longer name
+    column = rf'(?<![\w."])(?:(?:{qualifier})\.){"" if qualified_only else "?"}"?{re.escape(timestamp_column)}"?(?![\w"])'
+    reference = rf'(?P<fn>(?:date)\s*\(\s*{column}\s*\)|{column})'
+    lower, upper = None, None
+
+    def tighten(low: Optional[str], high: Optional[str]) -> None:
+        nonlocal lower, upper
+        if low is not None and (lower is None or low > lower):
+            lower = low
+        if high is not None and (upper is None or high < upper):
+            upper = high
+
+    for match in re.finditer(rf"{reference}\s*BETWEEN\s+(?P<a>{LITERAL_OR_DATE})\s+AND\s+(?P<b>{LITERAL_OR_DATE})", sql, re.IGNORECASE):
+        low, high = _evaluate(match.group('a')), _evaluate(match.group('b'))
+        tighten(low, high + '￿' if high is not None and match.group('fn').lower().startswith('date') else high)
+    for match in re.finditer(rf"{reference}\s*(?P<op><=|>=|=|<|>)\s*(?P<value>{LITERAL_OR_DATE})", sql, re.IGNORECASE):
+        value = _evaluate(match.group('value'))
+        if value is None:
+            continue
+        is_date = match.group('fn').lower().startswith('date')
+        op = match.group('op')
+        if op == '=':
+            tighten(value, value + '￿' if is_date else value)
+        elif op in ('>', '>='):
+            tighten(value, None)
+        else:
+            tighten(None, value + '￿' if is_date and op == '<=' else value)
+    for match in re.finditer(rf"{column}\s+LIKE\s+'(?P<prefix>[^'%_]+)%'", sql, re.IGNORECASE):
+        tighten(match.group('prefix'), match.group('prefix') + '￿')
+    return lower, upper
+
+
+def prune_partitions(sql: str, catalog: Dict[str, dict]) -> str:
+    """
+    Rewrites references to partitioned tables so only the partitions the query's
+    timestamp predicates can match are read.
+
+    A reference `FROM firewall_logs fl` becomes `FROM (SELECT * FROM <matching partitions>
+    UNION ALL SELECT * FROM <head>) fl`. The query is returned unchanged when a table
+    is referenced more than once or its timestamp range cannot be bounded; in a query
+    with joins or subqueries only predicates qualified with the table or its alias bound it.
+    """
+    for table_name, entry in catalog.items():
+        references = list(re.finditer(rf"\b(FROM|JOIN)\s+\"?{re.escape(table_name)}\"?(?![\w.])(?:\s+(?:AS\s+)?(?!(?:WHERE|JOIN|ON|GROUP|ORDER|LIMIT|LEFT|RIGHT|INNER|CROSS|OUTER|NATURAL|UNION|USING)\b)(\w+))?", sql, re.IGNORECASE))
+        if len(references) != 1:
+            continue
+        reference = references[0]
+        alias = reference.group(2)
+        # With other tables in the query, an unqualified timestamp may be theirs, so only qualified predicates count
+        lower, upper = timestamp_bounds(sql, entry["timestamp_column"], [table_name] + ([alias] if alias else []),
+                                        qualified_only=has_other_sources(sql))
+        if lower is None and upper is None:
+            continue
+        kept = [name for name, range_start, range_end in entry["partitions"]
+                if (upper is None or range_start <= upper) and (lower is None or lower < range_end)]
+        branches = [f"SELECT * FROM {name}" for name in kept] + ([f"SELECT * FROM {entry['head']}"] if entry["head"] else [])
+        if not branches:
+            continue
+        subquery = f"{reference.group(1)} ({' UNION ALL '.join(branches)}) AS {alias or table_name}"
+        sql = sql[:reference.start()] + subquery + sql[reference.end():]
+    return sql
+
+
+class PartitionPruner:
+    """
+    Rewrites SQL tool queries to read only the partitions they can match.
+
+    The partition catalog is re-read, off the event loop, only when the database
+    version stamp changes, so an unpartitioned database costs one stat per query.
+    """
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._version = None
+        self._catalog: Dict[str, dict] = {}
+
+    def _load(self) -> Dict[str, dict]:
+        with sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True) as conn:
+            return load_partition_catalog(conn)
+
+    async def rewrite(self, sql: str) -> str:
+        version = database_version(self.db_file)
+        if version != self._version:
+            try:
+                self._catalog = await asyncio.to_thread(self._load)
+            except sqlite3.Error:
+                self._catalog = {}
+            self._version = version
+        return prune_partitions(sql, self._catalog) if self._catalog else sql
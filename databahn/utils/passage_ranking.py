@@ -0,0 +1,223 @@
+import asyncio
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from databahn.utils.embedding_client import AsyncEmbeddingClient
+from databahn.utils.retrieval_backends import normalize_rows
+from databahn.utils.tokens import CHARS_PER_TOKEN, count_tokens
+
+# Words too common in advisories and prose to say anything about relevance.
+STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have how in is it its of on or that the their this to was were what "
+    "when where which who why will with w r t".split()
+)
+# Words plus hyphenated identifiers such as cve-2025-1234, which are also indexed part by part.
+_TERM = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+_PAGE_HEADER = re.compile(r"^--- Content from (\S+) ---\s*")
+_HEADING = re.compile(r"^#{1,6}\s")
+# Rank constant of reciprocal rank fusion; 60 is the usual choice and keeps either ranking from dominating.
+RRF_K = 60
+
+
+@dataclass
+class Passage:
+    url: str
+    position: int
+    text: str
+    tokens: int
+    score: float = 0.0
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms of `text` without stopwords; a compound identifier yields itself and its parts."""
+    terms = []
+    for match in _TERM.finditer(text.lower()):
+        term = match.group(0)
+        parts = re.split(r"[-_.]", term)
+        if len(parts) > 1:
+            terms.append(term)
+        terms.extend(part for part in parts if part not in STOPWORDS)
+    return terms
+
+
+def split_passages(url: str, markdown: str, max_tokens: int = 200) -> List[Passage]:
+    """
+    Splits a crawled page into passages of about `max_tokens` tokens.
+
+    Paragraphs are packed together up to the limit and never split, except that a
+    paragraph longer than the limit (a big table or code block) is cut by lines.
+    Each passage is prefixed with the heading it falls under, so it still says
+    what it is about once it is shown on its own.
+    """
+    match = _PAGE_HEADER.match(markdown)
+    if match:
+        url, markdown = match.group(1), markdown[match.end():]
+    blocks = []
+    for block in re.split(r"\n\s*\n", markdown):
+        block = block.strip()
+        if not block:
+            continue
+        if count_tokens(block) <= max_tokens:
+            blocks.append(block)
+            continue
+        piece, piece_tokens = [], 0
+        for line in block.splitlines():
+            line_tokens = count_tokens(line) + 1
+            if piece and piece_tokens + line_tokens > max_tokens:
+                blocks.append("\n".join(piece))
+                piece, piece_tokens = [], 0
+            piece.append(line)
+            piece_tokens += line_tokens
+        blocks.append("\n".join(piece))
+
+    passages = []
+    heading = ""
+    current: List[str] = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            text = "\n\n".join(([heading] if heading and current[0] != heading else []) + current)
+            passages.append(Passage(url, len(passages), text, count_tokens(text)))
+        current, current_tokens = [], 0
+
+    for block in blocks:
+        block_tokens = count_tokens(block)
+        if _HEADING.match(block):
+            flush()
+            heading = block.splitlines()[0]
+        elif current and current_tokens + block_tokens > max_tokens:
+            flush()
+        current.append(block)
+        current_tokens += block_tokens
+    flush()
+    return passages
+
+
+class BM25:
+    """Okapi BM25 over a fixed list of documents, each given as a list of terms."""
+
+    def __init__(self, documents: Sequence[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(document) for document in documents]
+        self.lengths = [len(document) for document in documents]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if documents else 0.0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        total = len(documents)
+        self.idf = {term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def scores(self, query_terms: List[str]) -> List[float]:
+        query_terms = [term for term in dict.fromkeys(query_terms) if term in self.idf]
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+            scores.append(sum(
+                self.idf[term] * counts[term] * (self.k1 + 1) / (counts[term] + norm)
+                for term in query_terms if term in counts
+            ))
+        return scores
+
+
+async def _rerank(query: str, candidates: List[Passage], embedding_client: AsyncEmbeddingClient) -> List[Passage]:
+    """Fuses the BM25 order of `candidates` with their embedding similarity to the query by reciprocal rank."""
+    vectors = await embedding_client.embed_many([query] + [passage.text for passage in candidates])
+    if vectors[0] is None or any(vector is None for vector in vectors[1:]):
+        return candidates
+    matrix = normalize_rows(np.asarray(vectors, dtype=np.float32))
+    similarities = matrix[1:] @ matrix[0]
+    embedding_rank = {int(i): rank for rank, i in enumerate(np.argsort(-similarities))}
+    for bm25_rank, passage in enumerate(candidates):
+        passage.score = 1 / (RRF_K + bm25_rank + 1) + 1 / (RRF_K + embedding_rank[bm25_rank] + 1)
+    return sorted(candidates, key=lambda passage: -passage.score)
+
+
+def score_passages(query: str, pages: List[Tuple[str, str]], passage_tokens: int = 200) -> Tuple[List[Passage], List[str]]:
+    """
+    Splits the crawled pages into passages and ranks them against the query with BM25.
+
+    Returns the passages best first, leaving out those that share no term with the
+    query (unless none does), and the messages of pages that could not be crawled.
+    """
+    passages = []
+    notes = []
+    for url, markdown in pages:
+        if _PAGE_HEADER.match(markdown):
+            passages.extend(split_passages(url, markdown, passage_tokens))
+        else:
+            notes.append(markdown)
+    if not passages:
+        return [], notes
+
+    bm25 = BM25([tokenize(passage.text) for passage in passages])
+    for passage, score in zip(passages, bm25.scores(tokenize(query))):
+        passage.score = score
+    page_order = {url: i for i, (url, _) in enumerate(pages)}
+    # Ties (including a query that matches nothing) go to passages nearer the top of higher-ranked pages
+    ranked = sorted(passages, key=lambda passage: (-passage.score, passage.position, page_order.get(passage.url, len(pages))))
+    if ranked[0].score > 0:
+        ranked = [passage for passage in ranked if passage.score > 0]
+    return ranked, notes
+
+
+async def rank_passages(
+    query: str,
+    pages: List[Tuple[str, str]],
+    token_budget: int = 2000,
+    passage_tokens: int = 200,
+    embedding_client: Optional[AsyncEmbeddingClient] = None,
+    rerank_candidates: int = 20,
+) -> str:
+    """
+    Keeps only the passages of the crawled pages that are relevant to the query, within a token budget.
+
+    Every page is split into passages, the passages of all pages are scored against the
+    query with BM25 (in a thread, off the event loop) and, when an embedding client is
+    given, the best `rerank_candidates` are reranked by fusing in their embedding
+    similarity. Passages are then taken best first until `token_budget` is spent, and
+    returned grouped by page under a "--- Passages from {url} ---" line, in page order,
+    each page's passages in reading order.
+
+    Args:
+        query (str): The search query.
+        pages (List[Tuple[str, str]]): (url, markdown) of each crawled page, in search rank order.
+        token_budget (int): The most tokens the returned passages may take up.
+        passage_tokens (int): The target passage size.
+        embedding_client (Optional[AsyncEmbeddingClient]): Enables the embedding rerank.
+        rerank_candidates (int): How many BM25 results are reranked.
+
+    Returns:
+        str: The selected passages. Pages that could not be crawled are listed by their error
+        message only when no passage was selected at all.
+    """
+    ranked, notes = await asyncio.to_thread(score_passages, query, pages, passage_tokens)
+    if not ranked:
+        return "\n\n".join(notes)
+    if embedding_client is not None:
+        ranked = await _rerank(query, ranked[:rerank_candidates], embedding_client) + ranked[rerank_candidates:]
+
+    selected = []
+    used = 0
+    for passage in ranked:
+        if used + passage.tokens <= token_budget:
+            selected.append(passage)
+            used += passage.tokens
+    if not selected:
+        # Even the best passage is over budget; keep its start rather than nothing
+        best = ranked[0]
+        selected.append(Passage(best.url, best.position, best.text[:token_budget * CHARS_PER_TOKEN], token_budget))
+
+    page_order = {url: i for i, (url, _) in enumerate(pages)}
+    by_page: Dict[str, List[Passage]] = {}
+    for passage in sorted(selected, key=lambda passage: (page_order.get(passage.url, len(pages)), passage.position)):
+        by_page.setdefault(passage.url, []).append(passage)
+    return "\n\n".join(
+        f"--- Passages from {url} ---\n\n" + "\n\n".join(passage.text for passage in page_passages)
+        for url, page_passages in by_page.items()
+    )
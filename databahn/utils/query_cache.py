@@ -0,0 +1,107 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from databahn.utils.embedding_store import EmbeddingStore
+from databahn.utils.query_text import normalize_query
+
+
+class QueryEmbeddingCache:
+    """
+    A bounded LRU cache with TTL for query embeddings, with an optional on-disk tier.
+
+    The in-memory tier is per process. The optional disk tier is an EmbeddingStore
+    file that every uvicorn worker can read and write, so a question embedded by one
+    worker is a cache hit for the others. Expired vectors are deleted from the disk
+    tier on startup and then at most once per TTL period, on a put.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 86400,
+        disk_store: Optional[EmbeddingStore] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_store = disk_store
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._last_pruned = self._clock()
+        if self.disk_store is not None:
+            self.disk_store.delete_older_than(self.ttl_seconds)
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        """Builds the cache key from the normalized query text and the model name."""
+        return EmbeddingStore.make_key(normalize_query(text), model)
+
+    async def get(self, text: str, model: str) -> Optional[List[float]]:
+        """
+        Returns the cached embedding for a query, checking memory first and then the disk tier.
+
+        Args:
+            text (str): The raw user query.
+            model (str): The embedding model name.
+
+        Returns:
+            Optional[List[float]]: The cached embedding, or None on a miss or an expired entry.
+        """
+        key = self.make_key(text, model)
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, vector = entry
+            if self._clock() - stored_at <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            del self._entries[key]
+
+        if self.disk_store is not None:
+            disk_vector = await asyncio.to_thread(self.disk_store.get, key, model, self.ttl_seconds)
+            if disk_vector is not None:
+                vector = disk_vector.tolist()
+                self._remember(key, vector)
+                self.disk_hits += 1
+                return vector
+
+        self.misses += 1
+        return None
+
+    async def put(self, text: str, model: str, vector: List[float]) -> None:
+        """Stores a query embedding in memory and, if configured, in the disk tier."""
+        key = self.make_key(text, model)
+        if isinstance(vector, np.ndarray):
+            vector = vector.tolist()
+        self._remember(key, vector)
+        if self.disk_store is not None:
+            await asyncio.to_thread(self.disk_store.put_many, [(key, vector)], model)
+            if self._clock() - self._last_pruned >= self.ttl_seconds:
+                self._last_pruned = self._clock()
+                await asyncio.to_thread(self.disk_store.delete_older_than, self.ttl_seconds)
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._entries[key] = (self._clock(), vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit/miss/eviction counters and the current number of in-memory entries."""
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+        }
+
@@ -0,0 +1,15 @@
+import re
+
+_PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalizes a user query so trivially different phrasings share a cache entry.
+
+    Lower-cases the text, replaces punctuation with spaces and collapses whitespace,
+    e.g. "Critical  pending vulns?" and "critical pending vulns" map to the same key.
+    """
+    text = _PUNCTUATION_PATTERN.sub(" ", text.lower())
+    return _WHITESPACE_PATTERN.sub(" ", text).strip()
@@ -0,0 +1,350 @@
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Tuple, Type
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:  # faiss is optional; the numpy backend covers small catalogs
+    faiss = None
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Returns a contiguous float32 copy of `vectors` with every row scaled to unit length."""
+    matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class RetrievalBackend(ABC):
+    """
+    Interface for the vector index behind schema retrieval.
+
+    Vectors are added under caller-chosen integer ids and are L2-normalized on the
+    way in, so every backend ranks by cosine similarity. `search` returns
+    (scores, ids) arrays of shape (num_queries, top_k), padded with id -1 when fewer
+    than top_k vectors are indexed.
+    """
+
+    name = ""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    @abstractmethod
+    def add(self, ids: Iterable[int], vectors: np.ndarray) -> None:
+        """Adds vectors under the given ids."""
+
+    @abstractmethod
+    def remove(self, ids: Iterable[int]) -> None:
+        """Removes the vectors stored under the given ids. Unknown ids are ignored."""
+
+    @abstractmethod
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the (scores, ids) of the top_k vectors for each query, best first."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def save(self, path: str) -> None:
+        """Writes the index to `path`."""
+
+    @classmethod
+    @abstractmethod
+    def load(cls, path: str) -> "RetrievalBackend":
+        """Reads an index written by `save`."""
+
+
+class NumpyBackend(RetrievalBackend):
+    """Exact brute-force search: one matrix-vector product over a normalized float32 matrix."""
+
+    name = "numpy"
+
+    def __init__(self, dim: int):
+        super().__init__(dim)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray) -> None:
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if ids.size == 0:
+            return
+        self.remove(ids)
+        self.ids = np.concatenate([self.ids, ids])
+        self.matrix = np.ascontiguousarray(np.vstack([self.matrix, normalize_rows(vectors)]))
+
+    def remove(self, ids: Iterable[int]) -> None:
+        keep = ~np.isin(self.ids, np.asarray(list(ids), dtype=np.int64))
+        if not keep.all():
+            self.ids = self.ids[keep]
+            self.matrix = np.ascontiguousarray(self.matrix[keep])
+
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize_rows(queries)
+        num_queries = queries.shape[0]
+        k = min(top_k, len(self))
+        if k <= 0:
+            return _empty_result(num_queries, top_k)
+        scores = queries @ self.matrix.T
+        # argpartition finds the top k per row in linear time; only those k are then sorted.
+        if k < scores.shape[1]:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(scores.shape[1]), (num_queries, 1))
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        rows = np.take_along_axis(candidates, order, axis=1)
+        return _pad_result(np.take_along_axis(scores, rows, axis=1), self.ids[rows], top_k)
+
+    def __len__(self) -> int:
+        return int(self.ids.shape[0])
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            np.savez(f, ids=self.ids, matrix=self.matrix)
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyBackend":
+        with np.load(path) as data:
+            backend = cls(int(data["matrix"].shape[1]))
+            backend.ids = data["ids"]
+            backend.matrix = np.ascontiguousarray(data["matrix"], dtype=np.float32)
+        return backend
+
+
+class _FaissBackend(RetrievalBackend):
+    """Shared plumbing for the FAISS backends, which all index inner products over normalized vectors."""
+
+    def __init__(self, dim: int):
+        if faiss is None:
+            raise ImportError(f"The '{self.name}' retrieval backend requires faiss. Install it with `pip install faiss-cpu`.")
+        super().__init__(dim)
+        self.index = None
+
+    @abstractmethod
+    def _new_index(self, training_vectors: np.ndarray):
+        ...
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray) -> None:
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if ids.size == 0:
+            return
+        vectors = normalize_rows(vectors)
+        if self.index is None:
+            self.index = self._new_index(vectors)
+        self.remove(ids)
+        self.index.add_with_ids(vectors, ids)
+
+    def remove(self, ids: Iterable[int]) -> None:
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if self.index is not None and ids.size:
+            self.index.remove_ids(ids)
+
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize_rows(queries)
+        k = min(top_k, len(self))
+        if k <= 0:
+            return _empty_result(queries.shape[0], top_k)
+        scores, ids = self.index.search(queries, k)
+        return _pad_result(scores, ids, top_k)
+
+    def __len__(self) -> int:
+        return int(self.index.ntotal) if self.index is not None else 0
+
+    def save(self, path: str) -> None:
+        if self.index is not None:
+            faiss.write_index(self.index, path)
+
+    @classmethod
+    def load(cls, path: str) -> "_FaissBackend":
+        index = faiss.read_index(path)
+        backend = cls(index.d)
+        backend.index = index
+        return backend
+
+
+class FaissFlatBackend(_FaissBackend):
+    """Exact FAISS search over a flat inner-product index."""
+
+    name = "faiss_flat"
+
+    def _new_index(self, training_vectors: np.ndarray):
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+
+
+class FaissIVFBackend(_FaissBackend):
+    """
+    Approximate FAISS search over an inverted-file index.
+
+    The coarse quantizer is trained on the first batch that is added. `nlist` is
+    capped at roughly sqrt(n) of that batch so small catalogs still train.
+    """
+
+    name = "faiss_ivf"
+
+    def __init__(self, dim: int, nlist: int = 1024, nprobe: int = 16):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+
+    def _new_index(self, training_vectors: np.ndarray):
+        nlist = max(1, min(self.nlist, int(np.sqrt(training_vectors.shape[0]))))
+        quantizer = faiss.IndexFlatIP(self.dim)
+        index = faiss.IndexIVFFlat(quantizer, self.dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(training_vectors)
+        index.nprobe = min(self.nprobe, nlist)
+        return index
+
+    @classmethod
+    def load(cls, path: str) -> "FaissIVFBackend":
+        backend = super().load(path)
+        backend.nlist = backend.index.nlist
+        backend.nprobe = backend.index.nprobe
+        return backend
+
+
+class FaissHNSWBackend(_FaissBackend):
+    """
+    Approximate FAISS search over an HNSW graph.
+
+    HNSW graphs cannot delete nodes, so removed ids are tombstoned and filtered out
+    of the results; the graph is rebuilt from the live vectors once tombstones make
+    up more than `rebuild_ratio` of it. Re-adding an id that is still in the graph
+    rebuilds it without the old node first, since a graph cannot hold an id twice.
+    """
+
+    name = "faiss_hnsw"
+
+    def __init__(self, dim: int, m: int = 32, ef_search: int = 64, rebuild_ratio: float = 0.3):
+        super().__init__(dim)
+        self.m = m
+        self.ef_search = ef_search
+        self.rebuild_ratio = rebuild_ratio
+        self.removed = set()
+
+    def _new_index(self, training_vectors: np.ndarray):
+        hnsw = faiss.IndexHNSWFlat(self.dim, self.m, faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efSearch = self.ef_search
+        return faiss.IndexIDMap2(hnsw)
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray) -> None:
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if ids.size == 0:
+            return
+        vectors = normalize_rows(vectors)
+        if self.index is None:
+            self.index = self._new_index(vectors)
+        else:
+            existing = set(faiss.vector_to_array(self.index.id_map).tolist()) & set(ids.tolist())
+            if existing:
+                self.removed.update(existing)
+                self._rebuild()
+        self.index.add_with_ids(vectors, ids)
+
+    def remove(self, ids: Iterable[int]) -> None:
+        if self.index is None:
+            return
+        live_ids = set(faiss.vector_to_array(self.index.id_map).tolist())
+        self.removed.update(int(i) for i in ids if int(i) in live_ids)
+        if self.removed and len(self.removed) > self.rebuild_ratio * self.index.ntotal:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        all_ids = faiss.vector_to_array(self.index.id_map)
+        live_ids = np.array([i for i in all_ids if int(i) not in self.removed], dtype=np.int64)
+        vectors = np.vstack([self.index.reconstruct(int(i)) for i in live_ids]) if live_ids.size else None
+        self.index = self._new_index(vectors)
+        self.removed = set()
+        if vectors is not None:
+            self.index.add_with_ids(vectors, live_ids)
+
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize_rows(queries)
+        if len(self) == 0 or top_k <= 0:
+            return _empty_result(queries.shape[0], top_k)
+        # Over-fetch by the number of tombstones so filtering still leaves top_k results.
+        k = min(top_k + len(self.removed), self.index.ntotal)
+        scores, ids = self.index.search(queries, k)
+        if self.removed:
+            filtered_scores, filtered_ids = [], []
+            for score_row, id_row in zip(scores, ids):
+                keep = [j for j, i in enumerate(id_row) if i != -1 and int(i) not in self.removed][:top_k]
+                filtered_scores.append(score_row[keep])
+                filtered_ids.append(id_row[keep])
+            return _pad_rows(filtered_scores, filtered_ids, top_k)
+        return _pad_result(scores, ids, top_k)
+
+    def __len__(self) -> int:
+        return (int(self.index.ntotal) - len(self.removed)) if self.index is not None else 0
+
+    def save(self, path: str) -> None:
+        if self.index is None:
+            return
+        if self.removed:
+            self._rebuild()
+        faiss.write_index(self.index, path)
+
+
+def _empty_result(num_queries: int, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    top_k = max(top_k, 0)
+    return np.full((num_queries, top_k), -np.inf, dtype=np.float32), np.full((num_queries, top_k), -1, dtype=np.int64)
+
+
+def _pad_result(scores: np.ndarray, ids: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if scores.shape[1] >= top_k:
+        return scores[:, :top_k], ids[:, :top_k].astype(np.int64)
+    padded_scores, padded_ids = _empty_result(scores.shape[0], top_k)
+    padded_scores[:, :scores.shape[1]] = scores
+    padded_ids[:, :ids.shape[1]] = ids
+    return padded_scores, padded_ids
+
+
+def _pad_rows(score_rows, id_rows, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    padded_scores, padded_ids = _empty_result(len(score_rows), top_k)
+    for row, (score_row, id_row) in enumerate(zip(score_rows, id_rows)):
+        padded_scores[row, :len(score_row)] = score_row
+        padded_ids[row, :len(id_row)] = id_row
+    return padded_scores, padded_ids
+
+
+RETRIEVAL_BACKENDS: Dict[str, Type[RetrievalBackend]] = {
+    backend.name: backend for backend in (NumpyBackend, FaissFlatBackend, FaissIVFBackend, FaissHNSWBackend)
+}
+
+
+def create_backend(name: str, dim: int, **params) -> RetrievalBackend:
+    """
+    Creates an empty retrieval backend by name.
+
+    Args:
+        name (str): One of 'numpy', 'faiss_flat', 'faiss_ivf' or 'faiss_hnsw'.
+        dim (int): The embedding dimension.
+        **params: Backend-specific parameters such as `nlist`, `nprobe`, `m` or `ef_search`.
+    """
+    if name not in RETRIEVAL_BACKENDS:
+        raise ValueError(f"Unknown retrieval backend '{name}'. Expected one of {sorted(RETRIEVAL_BACKENDS)}.")
+    return RETRIEVAL_BACKENDS[name](dim, **params)
+
+
+def load_backend(path: str) -> RetrievalBackend:
+    """Loads a backend saved with `save_backend`, using the sidecar file to pick the implementation."""
+    with open(f"{path}.json", "r", encoding="utf-8") as f:
+        name = json.load(f)["backend"]
+    return RETRIEVAL_BACKENDS[name].load(path)
+
+
+def save_backend(backend: RetrievalBackend, path: str) -> None:
+    """Saves a backend to `path` and records its implementation in a `<path>.json` sidecar."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    backend.save(path)
+    with open(f"{path}.json", "w", encoding="utf-8") as f:
+        json.dump({"backend": backend.name}, f)
@@ -0,0 +1,186 @@
+import math
+import re
+import sqlite3
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from databahn.utils.embedding_client import EMBEDDING_MODEL
+from databahn.utils.embedding_store import EmbeddingStore
+from databahn.utils.retrieval_backends import normalize_rows
+from databahn.utils.tokens import count_tokens
+
+# Columns the LLM needs to JOIN tables even when the query does not mention them.
+JOIN_KEY_PATTERN = re.compile(r"(^|_)(id|cve|cve_id|cwe|ip|ip_address|source_ip|destination_ip)$", re.IGNORECASE)
+
+
+def is_join_key(column_name: str) -> bool:
+    """Returns True for identifier columns such as asset_id, cve_id, CVE or *_ip that tables are joined on."""
+    return bool(JOIN_KEY_PATTERN.search(column_name))
+
+
+class ColumnIndex:
+    """
+    A per-table index of column embeddings for the second retrieval stage.
+
+    Every (table, column, description) row of the 'metadata' table is embedded on
+    its own. Once the table stage has picked the relevant tables, only the columns
+    of those tables are scored against the query, so the cost of this stage does
+    not grow with the size of the catalog.
+    """
+
+    def __init__(self):
+        self.columns: Dict[str, List[Tuple[str, str]]] = {}
+        self.matrices: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_rows(cls, rows: List[Tuple[str, str, str]], embeddings: List[Optional[List[float]]]) -> "ColumnIndex":
+        """
+        Builds the index from metadata rows and their embeddings.
+
+        Args:
+            rows (List[Tuple[str, str, str]]): (table_name, column_name, column_description) rows.
+            embeddings (List[Optional[List[float]]]): One embedding per row. Rows without one are skipped.
+        """
+        column_index = cls()
+        vectors_by_table: Dict[str, List[List[float]]] = {}
+        for (table_name, column_name, description), embedding in zip(rows, embeddings):
+            if embedding is None:
+                continue
+            column_index.columns.setdefault(table_name, []).append((column_name, description))
+            vectors_by_table.setdefault(table_name, []).append(embedding)
+        for table_name, vectors in vectors_by_table.items():
+            column_index.matrices[table_name] = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        return column_index
+
+    def replace(self, other: "ColumnIndex") -> None:
+        """Takes over the columns of a freshly built index, in place, so holders of this one see them."""
+        self.columns, self.matrices = other.columns, other.matrices
+
+    def rank_columns(self, query_embedding: Union[np.ndarray, List[float]], table_name: str) -> List[Tuple[str, str, float]]:
+        """Returns the table's (column, description, score) triples, most relevant first."""
+        if table_name not in self.matrices:
+            return []
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32))[0]
+        scores = self.matrices[table_name] @ query
+        return [(*self.columns[table_name][i], float(scores[i])) for i in np.argsort(-scores)]
+
+
+def column_embedding_text(table_name: str, column_name: str, description: str) -> str:
+    """The text a single metadata row is embedded as."""
+    return f"{table_name}.{column_name}: {description}"
+
+
+def setup_column_index(
+    conn: sqlite3.Connection,
+    store: EmbeddingStore,
+    get_embeddings: Callable[..., List[Optional[List[float]]]],
+    model: str = EMBEDDING_MODEL,
+) -> ColumnIndex:
+    """
+    Builds a ColumnIndex from the 'metadata' table, reusing vectors from the embedding store.
+
+    Args:
+        conn: An active sqlite3 connection object.
+        store: The embedding store to reuse vectors from.
+        get_embeddings: Embeds a list of texts, e.g. vector_search.get_embeddings; called with `model=`.
+        model: The embedding model name.
+
+    Returns:
+        ColumnIndex: The column index. Empty if the metadata table cannot be read.
+    """
+    try:
+        rows = conn.execute("SELECT table_name, column_name, column_description FROM metadata").fetchall()
+    except sqlite3.Error as e:
+        print(f"Error accessing the database: {e}")
+        return ColumnIndex()
+
+    texts = [column_embedding_text(*row) for row in rows]
+    keys = [store.make_key(text, model) for text in texts]
+    stored_embeddings = store.get_many(keys, model)
+    missing_indices = [i for i, key in enumerate(keys) if key not in stored_embeddings]
+    new_embeddings = []
+    for i, embedding in zip(missing_indices, get_embeddings([texts[i] for i in missing_indices], model=model)):
+        if embedding:
+            stored_embeddings[keys[i]] = embedding
+            new_embeddings.append((keys[i], embedding))
+    store.put_many(new_embeddings, model)
+    print(f"Column index setup complete. {len(rows)} columns processed, {len(new_embeddings)} newly embedded.")
+    return ColumnIndex.from_rows(rows, [stored_embeddings.get(key) for key in keys])
+
+
+def column_budget(num_columns: int, max_columns: int = 4, keep_ratio: float = 0.5, min_columns: int = 1) -> int:
+    """
+    How many of a table's `num_columns` non-join-key columns to keep.
+
+    Half of them by default, at least `min_columns` and at most `max_columns`, so a
+    small table is pruned as well instead of fitting entirely under a fixed cap.
+    """
+    return min(num_columns, max(min_columns, min(max_columns, math.ceil(num_columns * keep_ratio))))
+
+
+def format_table(table_name: str, columns: Dict[str, str]) -> str:
+    """Renders a table as the compact "table(column: description; ...)" line of the schema block."""
+    return f"{table_name}({'; '.join(f'{column}: {description}' for column, description in columns.items())})"
+
+
+def build_schema_block(
+    query_embedding: Union[np.ndarray, List[float]],
+    tables: List[dict],
+    column_index: ColumnIndex,
+    max_columns_per_table: int = 4,
+    keep_ratio: float = 0.5,
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Builds a compact schema block holding only the query-relevant columns of the chosen tables.
+
+    For each table, the non-join-key columns most similar to the query are kept (see
+    column_budget), plus every join key (asset_id, cve_id, ...) so JOINs still resolve.
+    Columns keep their original order. Tables the column index does not know are
+    emitted in full.
+
+    Args:
+        query_embedding (Union[np.ndarray, List[float]]): The query embedding.
+        tables (List[dict]): Table objects from the table stage: 'table_name' plus column descriptions.
+        column_index (ColumnIndex): The column-level index.
+        max_columns_per_table (int): The most non-join-key columns to keep per table.
+        keep_ratio (float): The share of a table's non-join-key columns to keep, within that cap.
+
+    Returns:
+        Tuple[str, Dict[str, int]]: The schema block, and a report of its token counts. The two
+        savings are reported apart: `formatting_saved_tokens` comes from the compact format
+        alone (the dict rendering used without pruning vs all columns in the compact format)
+        and `pruning_saved_tokens` from dropping columns (both sides in the compact format).
+    """
+    full_tables = {}
+    compact_lines = []
+    lines = []
+    for table in tables:
+        table_name = table.get("table_name")
+        columns = {key: value for key, value in table.items() if key != "table_name"}
+        full_tables[table_name] = columns
+        compact_lines.append(format_table(table_name, columns))
+
+        ranked = [column for column, _, _ in column_index.rank_columns(query_embedding, table_name)
+                  if column in columns and not is_join_key(column)]
+        if ranked:
+            keep = set(ranked[:column_budget(len(ranked), max_columns_per_table, keep_ratio)])
+            keep.update(column for column in columns if is_join_key(column) or column not in ranked)
+        else:
+            keep = set(columns)
+        lines.append(format_table(table_name, {column: description for column, description in columns.items() if column in keep}))
+
+    schema_block = "\n".join(lines)
+    full_tokens = count_tokens(str(full_tables))
+    compact_tokens = count_tokens("\n".join(compact_lines))
+    pruned_tokens = count_tokens(schema_block)
+    report = {
+        "full_schema_tokens": full_tokens,
+        "compact_schema_tokens": compact_tokens,
+        "pruned_schema_tokens": pruned_tokens,
+        "formatting_saved_tokens": full_tokens - compact_tokens,
+        "pruning_saved_tokens": compact_tokens - pruned_tokens,
+        "saved_tokens": full_tokens - pruned_tokens,
+    }
+    return schema_block, report
+
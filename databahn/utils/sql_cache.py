@@ -0,0 +1,137 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+try:
+    import sqlglot
+except ImportError:  # sqlglot is optional; fall back to a lexical normalization
+    sqlglot = None
+
+# String literals, quoted identifiers, comments, whitespace, words, then single punctuation characters.
+SQL_TOKEN_PATTERN = re.compile(
+    r"""('(?:[^']|'')*')|("(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])|(--[^\n]*|/\*.*?\*/)|(\s+)|(\w+)|(.)""",
+    re.DOTALL,
+)
+
+
+def _lexical_canonical_sql(sql: str) -> str:
+    tokens = []
+    for literal, quoted, comment, space, word, punctuation in SQL_TOKEN_PATTERN.findall(sql):
+        if comment or space:
+            continue
+        # SQLite keywords and unquoted identifiers are case-insensitive
+        token = literal or quoted or word.lower() or punctuation
+        # a space is only needed between two word-like tokens
+        if tokens and not punctuation and (tokens[-1][-1].isalnum() or tokens[-1][-1] in "_'\"`]") and (word or literal or quoted):
+            tokens.append(" ")
+        tokens.append(token)
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    return "".join(tokens)
+
+
+def canonicalize_sql(sql: str) -> str:
+    """
+    Normalizes SQL text so trivially different spellings of one query share a cache entry.
+
+    With sqlglot installed the query is parsed and re-rendered in the SQLite dialect.
+    Otherwise, or if sqlglot cannot parse it, comments and insignificant whitespace
+    are dropped, trailing semicolons are removed and everything outside quotes is lowercased.
+    """
+    if sqlglot is not None:
+        try:
+            expressions = sqlglot.parse(sql, read="sqlite")
+            if len(expressions) == 1 and expressions[0] is not None:
+                return expressions[0].sql(dialect="sqlite", normalize=True)
+        except Exception:
+            pass
+    return _lexical_canonical_sql(sql)
+
+
+def database_version(db_file: str) -> Tuple[int, ...]:
+    """
+    A stamp that changes whenever the database file is rewritten.
+
+    It is built from the modification time and size of the database and of its WAL
+    file, since commits in WAL mode only touch the WAL until a checkpoint. A rebuild
+    in another process therefore changes the stamp as well. An empty WAL, which
+    read-only connections create and leave behind, counts as no WAL.
+    """
+    stamp = []
+    for path in (db_file, f"{db_file}-wal"):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stat = None
+        if stat is None or (path != db_file and stat.st_size == 0):
+            stamp.extend((0, 0))
+        else:
+            stamp.extend((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+class SQLResultCache:
+    """
+    An LRU cache of rendered SQL tool results.
+
+    Entries are keyed by database file, canonical SQL and database version stamp, so
+    a rebuild of the database makes the old entries unreachable; they then age out of
+    the LRU, including after a rebuild by the db_generator CLI in another process.
+    The cache is bounded by entry count and by the total size of the cached results.
+    Each server process creates its own, from SQL_RESULT_CACHE_SIZE and
+    SQL_RESULT_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 16_000_000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, str]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(db_file: str, sql: str) -> Tuple:
+        return (os.path.abspath(db_file), canonicalize_sql(sql), database_version(db_file))
+
+    def get(self, key: Tuple) -> Optional[str]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: Tuple, result: str) -> None:
+        size = len(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = result
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def invalidate(self, db_file: Optional[str] = None) -> None:
+        """Drops every entry for `db_file`, or the whole cache if no file is given."""
+        with self._lock:
+            if db_file is None:
+                self._entries.clear()
+                self._size = 0
+                return
+            db_path = os.path.abspath(db_file)
+            for key in [key for key in self._entries if key[0] == db_path]:
+                self._size -= len(self._entries.pop(key))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._size}
+
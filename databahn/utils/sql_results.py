@@ -0,0 +1,68 @@
+import sqlite3
+from typing import Any, Callable
+
+
+def format_value(value: Any) -> str:
+    """Renders one cell for TSV output, escaping the characters that would break the row layout."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes>"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def fetch_tsv(cursor: sqlite3.Cursor, max_rows: int = 200, max_bytes: int = 32000, batch_size: int = 256) -> str:
+    """
+    Reads a query result in `fetchmany` batches and renders it as column-labelled TSV.
+
+    At most `max_rows` rows and about `max_bytes` bytes of output are kept, so memory
+    and prompt size stay bounded whatever SQL was generated. Rows past the limit are
+    only counted, not kept. The last line gives the total row count and, if the
+    output was cut, a truncation marker saying which limit was hit.
+
+    Args:
+        cursor (sqlite3.Cursor): A cursor that has executed the query.
+        max_rows (int): Maximum rows in the output.
+        max_bytes (int): Maximum UTF-8 size of the output, header included.
+        batch_size (int): Rows per `fetchmany` call.
+
+    Returns:
+        str: The TSV text.
+    """
+    if cursor.description is None:
+        return "(0 rows)"
+    header = "\t".join(format_value(column[0]) for column in cursor.description)
+    lines = [header]
+    size = len(header.encode("utf-8")) + 1
+    total_rows = 0
+    limit_hit = None
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        for row in batch:
+            total_rows += 1
+            if limit_hit is not None:
+                continue
+            if total_rows > max_rows:
+                limit_hit = f"row limit {max_rows}"
+                continue
+            line = "\t".join(format_value(value) for value in row)
+            line_size = len(line.encode("utf-8")) + 1
+            if size + line_size > max_bytes:
+                limit_hit = f"byte limit {max_bytes}"
+                continue
+            lines.append(line)
+            size += line_size
+
+    shown_rows = len(lines) - 1
+    if limit_hit is None:
+        lines.append(f"({total_rows} row{'' if total_rows == 1 else 's'})")
+    else:
+        lines.append(f"... truncated: showing {shown_rows} of {total_rows} rows ({limit_hit})")
+    return "\n".join(lines)
+
+
+def tsv_fetcher(max_rows: int, max_bytes: int) -> Callable[[sqlite3.Cursor], str]:
+    """Returns a `fetch` callable for SQLitePool.execute that renders capped TSV."""
+    return lambda cursor: fetch_tsv(cursor, max_rows=max_rows, max_bytes=max_bytes)
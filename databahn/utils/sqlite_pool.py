@@ -0,0 +1,135 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Sequence
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a query runs longer than its timeout and is interrupted."""
+
+
+class SQLitePool:
+    """
+    A pool of read-only SQLite connections that run queries in worker threads.
+
+    Queries never block the event loop, and up to `max_connections` of them run in
+    parallel. The database is switched to WAL mode once, so readers do not block on
+    a concurrent rebuild, and every pooled connection is opened read-only with
+    `PRAGMA query_only`. A progress handler interrupts a query once it passes its
+    timeout, or as soon as the awaiting task is cancelled (for example by the
+    Dispatcher's tool-call timeout), which frees the worker thread for the next query.
+
+    Args:
+        db_file (str): Path to the SQLite database.
+        max_connections (int): Connections, and worker threads, in the pool.
+        timeout_seconds (float): Default per-query timeout.
+        progress_steps (int): SQLite VM instructions between timeout/cancellation checks.
+        workload_log (Optional[str]): If set, every successful query is appended to this JSON-lines
+            file with its duration, for `db_generator --suggest-indexes`.
+    """
+
+    def __init__(self, db_file: str, max_connections: int = 4, timeout_seconds: float = 30, progress_steps: int = 10000,
+                 workload_log: Optional[str] = None):
+        self.db_file = db_file
+        self.max_connections = max_connections
+        self.timeout_seconds = timeout_seconds
+        self.progress_steps = progress_steps
+        self.workload_log = workload_log
+        self._workload_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="sqlite-pool")
+        self._connections: Optional[asyncio.Queue] = None
+
+    def _enable_wal(self) -> None:
+        # journal_mode is stored in the database file, so it has to be set from a writable connection.
+        try:
+            with sqlite3.connect(self.db_file) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error as e:
+            print(f"Could not enable WAL mode on {self.db_file}: {e}")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def _get_connections(self) -> asyncio.Queue:
+        if self._connections is None:
+            self._enable_wal()
+            self._connections = asyncio.Queue()
+            for _ in range(self.max_connections):
+                self._connections.put_nowait(self._connect())
+        return self._connections
+
+    def _run(self, conn: sqlite3.Connection, sql: str, parameters: Sequence[Any], fetch: Callable[[sqlite3.Cursor], Any],
+             cancelled: threading.Event, deadline: float) -> Any:
+        conn.set_progress_handler(lambda: int(cancelled.is_set() or time.monotonic() > deadline), self.progress_steps)
+        start = time.perf_counter()
+        try:
+            result = fetch(conn.execute(sql, parameters))
+            if self.workload_log:
+                self._log_query(sql, time.perf_counter() - start)
+            return result
+        except sqlite3.OperationalError as e:
+            if "interrupted" in str(e) and not cancelled.is_set():
+                raise QueryTimeoutError(f"Query exceeded its timeout and was interrupted: {sql}") from e
+            raise
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    def _log_query(self, sql: str, seconds: float) -> None:
+        entry = json.dumps({"db": self.db_file, "sql": sql, "ms": round(seconds * 1000, 3), "ts": time.time()})
+        try:
+            with self._workload_lock, open(self.workload_log, "a", encoding="utf-8") as f:
+                f.write(entry + "\n")
+        except OSError as e:
+            print(f"Could not write the SQL workload log {self.workload_log}: {e}")
+
+    async def execute(self, sql: str, parameters: Sequence[Any] = (), fetch: Optional[Callable[[sqlite3.Cursor], Any]] = None,
+                      timeout: Optional[float] = None) -> Any:
+        """
+        Runs a read-only query on a pooled connection in a worker thread.
+
+        Args:
+            sql (str): The SQL statement.
+            parameters (Sequence[Any]): Bound parameters.
+            fetch (Optional[Callable]): Reads the result from the cursor inside the worker thread. Defaults to fetchall.
+            timeout (Optional[float]): Overrides the pool's per-query timeout.
+
+        Returns:
+            Any: What `fetch` returns.
+
+        Raises:
+            QueryTimeoutError: If the query ran past its timeout.
+            sqlite3.Error: If the query fails, including any attempt to write.
+        """
+        connections = self._get_connections()
+        conn = await connections.get()
+        cancelled = threading.Event()
+        deadline = time.monotonic() + (self.timeout_seconds if timeout is None else timeout)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._run, conn, sql, parameters, fetch or (lambda cursor: cursor.fetchall()), cancelled, deadline)
+
+        def release(done: asyncio.Future) -> None:
+            if not done.cancelled():
+                done.exception()  # the caller is gone if we got here via cancellation; don't warn about it
+            connections.put_nowait(conn)
+
+        try:
+            # shield() so a cancelled caller does not orphan the running query: we interrupt it instead,
+            # and the connection goes back to the pool once the worker thread has stopped.
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        finally:
+            future.add_done_callback(release)
+
+    def close(self) -> None:
+        """Closes every idle connection and stops the worker threads."""
+        self._executor.shutdown(wait=True)
+        if self._connections is not None:
+            while not self._connections.empty():
+                self._connections.get_nowait().close()
@@ -0,0 +1,195 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from redis.exceptions import WatchError
+except ImportError:  # redis is optional; only RedisStateStore needs it
+    WatchError = None
+
+# The state keys whose chat histories are persisted between turns.
+HISTORY_AGENTS = ("orchestrator", "response")
+
+
+class StateConflictError(Exception):
+    """Raised when another turn on the same thread was saved after this turn's state was loaded."""
+
+
+def new_state(histories: Optional[Dict[str, List[dict]]] = None) -> Dict[str, Any]:
+    """Builds the per-request state object the Chat pipeline expects."""
+    histories = histories or {}
+    state: Dict[str, Any] = {"user_message": ""}
+    for agent in HISTORY_AGENTS:
+        state[agent] = {"chat_history": list(histories.get(agent, []))}
+    return state
+
+
+def history_lengths(state: Dict[str, Any]) -> Dict[str, int]:
+    """Records how many history entries each agent had before a turn, for `new_history_entries`."""
+    return {agent: len(state[agent]["chat_history"]) for agent in HISTORY_AGENTS}
+
+
+def new_history_entries(state: Dict[str, Any], lengths: Dict[str, int]) -> Dict[str, List[dict]]:
+    """Returns the chat-history entries a turn appended, per agent."""
+    return {agent: state[agent]["chat_history"][lengths[agent]:] for agent in HISTORY_AGENTS}
+
+
+class StateStore(ABC):
+    """
+    Conversation state keyed by thread_id.
+
+    A turn loads the recent history of its thread with the thread's version, runs,
+    and then appends only the history entries it added. The append is rejected with
+    StateConflictError if another turn on the same thread was saved in between.
+    """
+
+    @abstractmethod
+    async def load(self, thread_id: str, history_limit: int = 5) -> Tuple[Dict[str, Any], int]:
+        """
+        Loads a thread's state.
+
+        Args:
+            thread_id (str): The conversation thread.
+            history_limit (int): How many of the most recent entries of each chat history to load.
+
+        Returns:
+            Tuple[Dict[str, Any], int]: A fresh state object and the thread's version (0 for a new thread).
+        """
+
+    @abstractmethod
+    async def append(self, thread_id: str, entries: Dict[str, List[dict]], expected_version: int) -> int:
+        """
+        Appends new chat-history entries to a thread.
+
+        Args:
+            thread_id (str): The conversation thread.
+            entries (Dict[str, List[dict]]): The new entries per agent, from `new_history_entries`.
+            expected_version (int): The version returned by `load`.
+
+        Returns:
+            int: The thread's new version.
+
+        Raises:
+            StateConflictError: If the thread's version is no longer `expected_version`.
+        """
+
+
+class InMemoryStateStore(StateStore):
+    """
+    A per-process StateStore that keeps the `max_threads` most recently used threads.
+
+    Each thread keeps at most `max_history` entries per chat history. State is not
+    shared between uvicorn workers; use RedisStateStore for that.
+    """
+
+    def __init__(self, max_threads: int = 10000, max_history: int = 200):
+        self.max_threads = max_threads
+        self.max_history = max_history
+        self._threads: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    async def load(self, thread_id: str, history_limit: int = 5) -> Tuple[Dict[str, Any], int]:
+        thread = self._threads.get(thread_id)
+        if thread is None:
+            return new_state(), 0
+        self._threads.move_to_end(thread_id)
+        histories = {agent: history[-history_limit:] if history_limit else [] for agent, history in thread["histories"].items()}
+        return new_state(histories), thread["version"]
+
+    async def append(self, thread_id: str, entries: Dict[str, List[dict]], expected_version: int) -> int:
+        async with self._lock:
+            thread = self._threads.get(thread_id)
+            version = thread["version"] if thread is not None else 0
+            if version != expected_version:
+                raise StateConflictError(f"Thread {thread_id} is at version {version}, expected {expected_version}.")
+            if thread is None:
+                thread = {"version": 0, "histories": {agent: [] for agent in HISTORY_AGENTS}}
+                self._threads[thread_id] = thread
+            for agent, new_entries in entries.items():
+                history = thread["histories"].setdefault(agent, [])
+                history.extend(new_entries)
+                del history[:-self.max_history]
+            thread["version"] += 1
+            self._threads.move_to_end(thread_id)
+            while len(self._threads) > self.max_threads:
+                self._threads.popitem(last=False)
+            return thread["version"]
+
+
+class RedisStateStore(StateStore):
+    """
+    A StateStore on Redis, shared by every uvicorn worker.
+
+    Each chat history is a Redis list of JSON entries that turns RPUSH to, next to a
+    version counter. Appends WATCH the counter and run in a MULTI/EXEC transaction,
+    so two concurrent turns on one thread cannot both be saved.
+
+    Args:
+        client: A `redis.asyncio.Redis` client, or a compatible fake such as `fakeredis.aioredis.FakeRedis`.
+        key_prefix (str): Prefix of every key the store writes.
+        max_history (int): Entries kept per chat history; older ones are trimmed on append.
+        ttl_seconds (Optional[int]): Expire a thread this long after its last turn. None keeps threads forever.
+    """
+
+    def __init__(self, client, key_prefix: str = "databahn:thread:", max_history: int = 200, ttl_seconds: Optional[int] = None):
+        if WatchError is None:
+            raise ImportError("RedisStateStore requires the 'redis' package.")
+        self.client = client
+        self.key_prefix = key_prefix
+        self.max_history = max_history
+        self.ttl_seconds = ttl_seconds
+
+    def _version_key(self, thread_id: str) -> str:
+        return f"{self.key_prefix}{thread_id}:version"
+
+    def _history_key(self, thread_id: str, agent: str) -> str:
+        return f"{self.key_prefix}{thread_id}:{agent}"
+
+    async def load(self, thread_id: str, history_limit: int = 5) -> Tuple[Dict[str, Any], int]:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.get(self._version_key(thread_id))
+            for agent in HISTORY_AGENTS:
+                pipe.lrange(self._history_key(thread_id, agent), -history_limit, -1)
+            version, *histories = await pipe.execute()
+        if not history_limit:
+            histories = [[] for _ in HISTORY_AGENTS]
+        state = new_state({agent: [json.loads(entry) for entry in history] for agent, history in zip(HISTORY_AGENTS, histories)})
+        return state, int(version or 0)
+
+    async def append(self, thread_id: str, entries: Dict[str, List[dict]], expected_version: int) -> int:
+        version_key = self._version_key(thread_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(version_key)
+                version = int(await pipe.get(version_key) or 0)
+                if version != expected_version:
+                    raise StateConflictError(f"Thread {thread_id} is at version {version}, expected {expected_version}.")
+                pipe.multi()
+                keys = [version_key]
+                for agent, new_entries in entries.items():
+                    if not new_entries:
+                        continue
+                    history_key = self._history_key(thread_id, agent)
+                    keys.append(history_key)
+                    pipe.rpush(history_key, *(json.dumps(entry, default=str) for entry in new_entries))
+                    pipe.ltrim(history_key, -self.max_history, -1)
+                pipe.incr(version_key)
+                # each history queued an RPUSH and an LTRIM ahead of the INCR
+                version_position = 2 * (len(keys) - 1)
+                if self.ttl_seconds:
+                    for key in keys:
+                        pipe.expire(key, self.ttl_seconds)
+                results = await pipe.execute()
+            except WatchError:
+                raise StateConflictError(f"Thread {thread_id} was updated by a concurrent turn.")
+        return int(results[version_position])
+
+
+def create_state_store(redis_url: Optional[str] = None, max_threads: int = 10000, max_history: int = 200, ttl_seconds: Optional[int] = None) -> StateStore:
+    """Returns a RedisStateStore for `redis_url`, or an InMemoryStateStore when no URL is set."""
+    if not redis_url:
+        return InMemoryStateStore(max_threads=max_threads, max_history=max_history)
+    import redis.asyncio
+    return RedisStateStore(redis.asyncio.from_url(redis_url), max_history=max_history, ttl_seconds=ttl_seconds)
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from settings import MCP_PINNED_TOOLS, MCP_TOOL_TABLES_TOP_K, MCP_TOOL_TOP_K
+from databahn.utils.embedding_client import AsyncEmbeddingClient, embedding_client
+from databahn.utils.retrieval_backends import normalize_rows
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TABLE_DESCRIPTION_PATTERN = re.compile(r"<table_description>(.*?)</table_description>", re.DOTALL)
+
+
+@dataclass
+class ToolCatalog:
+    """The embedded tool list of one MCP session, rebuilt whenever the session's tools change."""
+    signature: str
+    tool_schemas: List[dict]
+    tool_matrix: np.ndarray
+    # tool name -> (table names, normalized table embeddings, parsed table specs)
+    tool_tables: Dict[str, Tuple[List[str], np.ndarray, Dict[str, dict]]] = field(default_factory=dict)
+
+
+def tool_list_signature(tool_schemas: List[dict]) -> str:
+    """A hash of a session's tool schemas, used to detect when the tool list changed."""
+    return hashlib.sha256(json.dumps(tool_schemas, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def parse_table_description(description: str) -> Optional[Dict[str, dict]]:
+    """Returns the tables embedded in a docstring's <table_description> JSON, or None if there are none."""
+    match = TABLE_DESCRIPTION_PATTERN.search(description or "")
+    if not match:
+        return None
+    try:
+        tables = json.loads(match.group(1))
+    except json.JSONDecodeError:
+        return None
+    return tables if isinstance(tables, dict) and tables else None
+
+
+def tool_embedding_text(tool_schema: dict) -> str:
+    """The text a tool is embedded as: its name, its description without table JSON, and its parameters."""
+    function = tool_schema.get("function", {})
+    description = function.get("description", "")
+    tables = parse_table_description(description)
+    if tables:
+        description = TABLE_DESCRIPTION_PATTERN.sub(f"Tables: {', '.join(tables)}", description)
+    parameters = ", ".join(function.get("parameters", {}).get("properties", {}).keys())
+    return f"{function.get('name', '')}: {' '.join(description.split())} Parameters: {parameters}"
+
+
+class MCPToolIndex:
+    """
+    Retrieval over MCP tool docstrings, so the orchestrator only sees the tools a query needs.
+
+    Each session's tool list is embedded once and re-embedded only when the list
+    changes. Per query, the `top_k` most similar tools are kept, plus every pinned
+    tool. Tools whose docstrings embed a <table_description> JSON also have their
+    tables indexed, and the description sent to the LLM only carries the
+    `top_k_tables` tables most relevant to the query.
+    """
+
+    def __init__(self, embedding_client: AsyncEmbeddingClient, top_k: int = 5, top_k_tables: int = 3, pinned_tools: Optional[Set[str]] = None):
+        self.embedding_client = embedding_client
+        self.top_k = top_k
+        self.top_k_tables = top_k_tables
+        self.pinned_tools = pinned_tools or set()
+        self._catalogs: Dict[str, ToolCatalog] = {}
+
+    async def refresh(self, session_key: str, tool_schemas: List[dict]) -> ToolCatalog:
+        """
+        Returns the embedded catalog for a session, embedding its tools only if the tool list changed.
+
+        Args:
+            session_key (str): A stable identifier of the MCP session.
+            tool_schemas (List[dict]): The session's tools in OpenAI function-tool format.
+        """
+        signature = tool_list_signature(tool_schemas)
+        catalog = self._catalogs.get(session_key)
+        if catalog is not None and catalog.signature == signature:
+            return catalog
+
+        logger.info(f"Embedding {len(tool_schemas)} tools for MCP session {session_key}")
+        table_texts, table_owners = [], []
+        parsed_tables = {}
+        for tool_schema in tool_schemas:
+            tool_name = tool_schema["function"]["name"]
+            tables = parse_table_description(tool_schema["function"].get("description", ""))
+            if tables:
+                parsed_tables[tool_name] = tables
+                for table_name, table_spec in tables.items():
+                    table_texts.append(json.dumps({table_name: table_spec}))
+                    table_owners.append((tool_name, table_name))
+
+        tool_texts = [tool_embedding_text(tool_schema) for tool_schema in tool_schemas]
+        vectors = await self.embedding_client.embed_many(tool_texts + table_texts)
+        tool_vectors, table_vectors = vectors[:len(tool_texts)], vectors[len(tool_texts):]
+
+        catalog = ToolCatalog(signature=signature, tool_schemas=tool_schemas, tool_matrix=self._to_matrix(tool_vectors))
+        for tool_name, tables in parsed_tables.items():
+            owned = [(table_name, vector) for (owner, table_name), vector in zip(table_owners, table_vectors) if owner == tool_name]
+            table_names = [table_name for table_name, _ in owned]
+            catalog.tool_tables[tool_name] = (table_names, self._to_matrix([vector for _, vector in owned]), tables)
+        self._catalogs[session_key] = catalog
+        return catalog
+
+    @staticmethod
+    def _to_matrix(vectors: List[Optional[List[float]]]) -> np.ndarray:
+        # Tools whose embedding failed get a zero row, which scores 0 and is never preferred.
+        dim = next((len(vector) for vector in vectors if vector is not None), 0)
+        if dim == 0:
+            return np.zeros((len(vectors), 0), dtype=np.float32)
+        rows = [vector if vector is not None else [0.0] * dim for vector in vectors]
+        return normalize_rows(np.asarray(rows, dtype=np.float32))
+
+    def select(self, catalogs: List[ToolCatalog], query_embedding) -> List[dict]:
+        """
+        Picks the tools to send to the orchestrator for one query.
+
+        Args:
+            catalogs (List[ToolCatalog]): The catalogs of all sessions, from `refresh`.
+            query_embedding: The query embedding. If None, every tool is returned unfiltered.
+
+        Returns:
+            List[dict]: The selected tools in their original order, with table descriptions pruned per query.
+        """
+        all_tools = [tool_schema for catalog in catalogs for tool_schema in catalog.tool_schemas]
+        if query_embedding is None:
+            return all_tools
+
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32))[0]
+        scored = []
+        for catalog in catalogs:
+            scores = catalog.tool_matrix @ query if catalog.tool_matrix.shape[1] == query.shape[0] else np.zeros(len(catalog.tool_schemas))
+            for tool_schema, score in zip(catalog.tool_schemas, scores):
+                scored.append((float(score), tool_schema, catalog))
+
+        unpinned = [entry for entry in scored if entry[1]["function"]["name"] not in self.pinned_tools]
+        chosen = {id(entry[1]) for entry in sorted(unpinned, key=lambda entry: -entry[0])[:self.top_k]}
+        selected = []
+        for _, tool_schema, catalog in scored:
+            tool_name = tool_schema["function"]["name"]
+            if tool_name in self.pinned_tools or id(tool_schema) in chosen:
+                selected.append(self._prune_tables(tool_schema, catalog, query))
+        logger.info(f"selected {len(selected)} of {len(all_tools)} MCP tools: {[tool['function']['name'] for tool in selected]}")
+        return selected
+
+    def _prune_tables(self, tool_schema: dict, catalog: ToolCatalog, query: np.ndarray) -> dict:
+        tool_name = tool_schema["function"]["name"]
+        if tool_name not in catalog.tool_tables:
+            return tool_schema
+        table_names, table_matrix, tables = catalog.tool_tables[tool_name]
+        if table_matrix.shape[1] != query.shape[0] or len(table_names) <= self.top_k_tables:
+            return tool_schema
+        top_indices = np.argsort(-(table_matrix @ query))[:self.top_k_tables]
+        kept = {table_names[i]: tables[table_names[i]] for i in sorted(top_indices)}
+        description = TABLE_DESCRIPTION_PATTERN.sub(
+            lambda _: f"<table_description>{json.dumps(kept)}</table_description>",
+            tool_schema["function"].get("description", ""),
+        )
+        return {**tool_schema, "function": {**tool_schema["function"], "description": description}}
+
+
+mcp_tool_index = MCPToolIndex(embedding_client, top_k=MCP_TOOL_TOP_K, top_k_tables=MCP_TOOL_TABLES_TOP_K, pinned_tools=MCP_PINNED_TOOLS)
@@ -1,13 +1,23 @@
 from base import openai_client
+from settings import RETRIEVAL_BACKEND, RETRIEVAL_INDEX_PATH
+import asyncio
+import hashlib
+import os
 import sqlite3
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import json
-from typing import Union, List
+from typing import Union, List, Optional, Dict, Tuple
 import pandas as pd
 import openai
+from databahn.utils.embedding_store import EmbeddingStore
+from databahn.utils.embedding_client import EMBEDDING_MODEL
+from databahn.utils.retrieval_backends import RetrievalBackend, create_backend, load_backend, save_backend
+from databahn.utils.schema_pruning import setup_column_index
+from databahn.utils.sql_cache import database_version
 
-def get_embedding(text, model="text-embedding-3-small"):
+EMBEDDING_STORE_FILE = 'databahn/data/embedding_store.db'
+
+def get_embedding(text, model=EMBEDDING_MODEL):
    """Generates an embedding for the given text using OpenAI's API."""
    try:
        if not text.strip(): return None
@@ -16,18 +26,41 @@ def get_embedding(text, model="text-embedding-3-small"):
        print(f"Error getting embedding: {e}")
        return None
 
-def setup_vector_db(conn: sqlite3.Connection) -> List[dict]:
+def get_embeddings(texts: List[str], model=EMBEDDING_MODEL) -> List[Optional[List[float]]]:
+   """Generates embeddings for a batch of texts with a single call to OpenAI's API."""
+   results = [None] * len(texts)
+   indexed_texts = [(i, text) for i, text in enumerate(texts) if text.strip()]
+   if not indexed_texts:
+       return results
+   try:
+       response = openai.embeddings.create(input=[text for _, text in indexed_texts], model=model)
+   except Exception as e:
+       print(f"Error getting embeddings: {e}")
+       return results
+   for (i, _), item in zip(indexed_texts, sorted(response.data, key=lambda item: item.index)):
+       results[i] = item.embedding
+   return results
+
+def setup_vector_db(conn: sqlite3.Connection, store: Optional[EmbeddingStore] = None, model: str = EMBEDDING_MODEL) -> List[dict]:
     """
     Creates a collection of table objects with embeddings from the 'metadata' table.
     This version uses direct SQL queries instead of pandas.
 
+    Embeddings are looked up in the on-disk embedding store first, keyed by a hash of
+    the table's JSON description plus the model name. Only tables whose metadata
+    changed since the store was last written are sent to the embedding API.
+
     Args:
         conn: An active sqlite3 connection object.
+        store: The embedding store to reuse vectors from. Defaults to the store at EMBEDDING_STORE_FILE.
+        model: The embedding model name.
 
     Returns:
         A list of dictionaries, where each dictionary represents a table and its embedding.
     """
     print("Setting up vector database from metadata...")
+    if store is None:
+        store = EmbeddingStore(EMBEDDING_STORE_FILE)
     table_collection = []
     cursor = conn.cursor()
 
@@ -41,6 +74,7 @@ def setup_vector_db(conn: sqlite3.Connection) -> List[dict]:
             return []
 
         # 2. For each table, fetch its columns and descriptions
+        table_objects = []
         for table_name in table_names:
             curr_table_object = {"table_name": table_name}
             
@@ -50,29 +84,219 @@ def setup_vector_db(conn: sqlite3.Connection) -> List[dict]:
             
             for column_name, description in columns_data:
                 curr_table_object[column_name] = description
-            
-            # 3. Generate and add the embedding for the structured table info
-            embedding_text = json.dumps(curr_table_object)
-            embedding = get_embedding(embedding_text)
-            
-            if embedding:
-                curr_table_object['embeddings'] = np.array(embedding)
-                table_collection.append(curr_table_object)
+            table_objects.append(curr_table_object)
 
     except sqlite3.Error as e:
         print(f"Error accessing the database: {e}")
         return []
-        
-    print(f"Vector database setup complete. {len(table_collection)} tables processed.")
+
+    # 3. Reuse stored embeddings and embed the tables whose description changed in one batched call
+    embedding_texts = [json.dumps(table_object) for table_object in table_objects]
+    keys = [store.make_key(text, model) for text in embedding_texts]
+    stored_embeddings = store.get_many(keys, model)
+    missing_indices = [i for i, key in enumerate(keys) if key not in stored_embeddings]
+    fresh_embeddings = get_embeddings([embedding_texts[i] for i in missing_indices], model=model)
+    new_embeddings = []
+    for i, embedding in zip(missing_indices, fresh_embeddings):
+        if embedding:
+            stored_embeddings[keys[i]] = embedding
+            new_embeddings.append((keys[i], embedding))
+    for table_object, key in zip(table_objects, keys):
+        embedding = stored_embeddings.get(key)
+        if embedding is not None:
+            table_object['embeddings'] = np.array(embedding)
+            table_collection.append(table_object)
+    store.put_many(new_embeddings, model)
+
+    print(f"Vector database setup complete. {len(table_collection)} tables processed, {len(new_embeddings)} newly embedded.")
     return table_collection
 
+class TableIndex:
+    """
+    A retrieval index over the table catalog.
+
+    Table embeddings live in a pluggable RetrievalBackend (brute-force numpy or
+    FAISS flat/IVF/HNSW), which keeps them L2-normalized so ranking is by cosine
+    similarity. Table metadata is kept separately, keyed by the backend id, and
+    returned by reference, so nothing is copied per query. Each table is also
+    tracked by a hash of its description, which lets `update` add and remove only
+    the tables whose metadata changed.
+    """
+
+    def __init__(self, backend_name: str = "numpy", **backend_params):
+        """
+        Args:
+            backend_name (str): The retrieval backend to use, see `retrieval_backends.RETRIEVAL_BACKENDS`.
+            **backend_params: Backend-specific parameters such as `nlist` or `ef_search`.
+        """
+        self.backend_name = backend_name
+        self.backend_params = backend_params
+        self.backend: Optional[RetrievalBackend] = None
+        self.tables: Dict[int, dict] = {}
+        self._ids_by_key: Dict[str, int] = {}
+        self._next_id = 0
+
+    @classmethod
+    def from_collection(cls, table_collection: List[dict], backend_name: str = "numpy", **backend_params) -> "TableIndex":
+        """
+        Builds an index from the output of `setup_vector_db`.
+
+        Args:
+            table_collection (List[dict]): Dicts with 'table_name', column descriptions and an 'embeddings' key.
+            backend_name (str): The retrieval backend to use.
+
+        Returns:
+            TableIndex: The index. Empty if the collection is empty.
+        """
+        table_index = cls(backend_name, **backend_params)
+        table_index.update(table_collection)
+        return table_index
+
+    @staticmethod
+    def table_key(table_object: dict) -> str:
+        """Returns a content hash of a table's description, ignoring its embedding."""
+        description = {key: value for key, value in table_object.items() if key != 'embeddings'}
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def update(self, table_collection: List[dict]) -> Tuple[int, int]:
+        """
+        Brings the index in line with a new table collection, touching only changed tables.
+
+        Tables whose description hash is no longer present are removed from the backend
+        and tables with a new hash are added; unchanged tables are left in place.
+
+        Args:
+            table_collection (List[dict]): The current output of `setup_vector_db`.
+
+        Returns:
+            Tuple[int, int]: The number of tables added and removed.
+        """
+        new_objects = {self.table_key(obj): obj for obj in table_collection}
+        stale_keys = [key for key in self._ids_by_key if key not in new_objects]
+        added_keys = [key for key in new_objects if key not in self._ids_by_key]
+
+        if stale_keys and self.backend is not None:
+            stale_ids = [self._ids_by_key.pop(key) for key in stale_keys]
+            self.backend.remove(stale_ids)
+            for table_id in stale_ids:
+                self.tables.pop(table_id, None)
+
+        if added_keys:
+            vectors = np.stack([np.asarray(new_objects[key]['embeddings'], dtype=np.float32) for key in added_keys])
+            if self.backend is None:
+                self.backend = create_backend(self.backend_name, vectors.shape[1], **self.backend_params)
+            added_ids = list(range(self._next_id, self._next_id + len(added_keys)))
+            self._next_id += len(added_keys)
+            self.backend.add(added_ids, vectors)
+            for table_id, key in zip(added_ids, added_keys):
+                self._ids_by_key[key] = table_id
+                self.tables[table_id] = {k: v for k, v in new_objects[key].items() if k != 'embeddings'}
+
+        return len(added_keys), len(stale_keys)
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def search(self, query_embedding: Union[np.ndarray, List[float]], top_k: int = 3) -> List[dict]:
+        """
+        Finds the top_k tables most similar to a single query embedding.
+
+        Args:
+            query_embedding (Union[np.ndarray, List[float]]): The query embedding.
+            top_k (int): The number of tables to return.
+
+        Returns:
+            List[dict]: The table metadata objects, most relevant first. Empty if the query or index is empty.
+        """
+        if query_embedding is None:
+            return []
+        return self.search_batch([query_embedding], top_k=top_k)[0]
+
+    def search_batch(self, query_embeddings: Union[np.ndarray, List[List[float]]], top_k: int = 3) -> List[List[dict]]:
+        """
+        Scores many query embeddings against the catalog in one backend call.
+
+        Args:
+            query_embeddings (Union[np.ndarray, List[List[float]]]): A (num_queries, dim) array of query embeddings.
+            top_k (int): The number of tables to return per query.
+
+        Returns:
+            List[List[dict]]: For each query, the table metadata objects, most relevant first.
+        """
+        if len(query_embeddings) == 0:
+            return []
+        if not self.tables or top_k <= 0:
+            return [[] for _ in range(len(query_embeddings))]
+        _, ids = self.backend.search(np.asarray(query_embeddings, dtype=np.float32), top_k)
+        return [[self.tables[i] for i in row if i in self.tables] for row in ids.tolist()]
+
+    def save(self, path: str) -> None:
+        """Persists the backend index to `path` and the table metadata to `<path>.tables.json`."""
+        if self.backend is None:
+            return
+        save_backend(self.backend, path)
+        tables = [{"id": table_id, "key": key, "table": self.tables[table_id]} for key, table_id in self._ids_by_key.items()]
+        with open(f"{path}.tables.json", "w", encoding="utf-8") as f:
+            json.dump({"next_id": self._next_id, "backend_params": self.backend_params, "tables": tables}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "TableIndex":
+        """Loads an index written by `save`."""
+        with open(f"{path}.tables.json", "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        backend = load_backend(path)
+        table_index = cls(backend.name, **saved.get("backend_params", {}))
+        table_index.backend = backend
+        table_index._next_id = saved["next_id"]
+        for entry in saved["tables"]:
+            table_index._ids_by_key[entry["key"]] = entry["id"]
+            table_index.tables[entry["id"]] = entry["table"]
+        return table_index
+
+
+def load_table_index(table_collection: List[dict], backend_name: str = "numpy", index_path: Optional[str] = None, **backend_params) -> TableIndex:
+    """
+    Returns a TableIndex for the collection, reusing the persisted index at `index_path` when there is one.
+
+    A persisted index built with the same backend is loaded and then updated
+    incrementally, so only tables whose metadata changed are added or removed.
+    The index is written back whenever it changed.
+
+    Args:
+        table_collection (List[dict]): The output of `setup_vector_db`.
+        backend_name (str): The retrieval backend to use.
+        index_path (Optional[str]): Where the index is persisted. Nothing is persisted if None.
+        **backend_params: Backend-specific parameters.
+
+    Returns:
+        TableIndex: The up-to-date index.
+    """
+    table_index = None
+    if index_path and os.path.exists(f"{index_path}.tables.json"):
+        try:
+            table_index = TableIndex.load(index_path)
+        except Exception as e:
+            print(f"Error loading the persisted table index at '{index_path}': {e}")
+        if table_index is not None and table_index.backend_name != backend_name:
+            table_index = None
+    if table_index is None:
+        table_index = TableIndex(backend_name, **backend_params)
+    added, removed = table_index.update(table_collection)
+    if index_path and (added or removed):
+        table_index.save(index_path)
+    print(f"Table index ready with the '{backend_name}' backend: {len(table_index)} tables, {added} added, {removed} removed.")
+    return table_index
+
+
 def find_top_k_relevant_tables(query_embedding: Union[np.ndarray, list[float]], table_collection: list[dict], top_k: int = 3) -> list[dict]:
     """
     Finds the most relevant tables from a collection using cosine similarity.
 
     This function compares a query embedding against a collection of table
     embeddings and returns the top 'k' table objects that are most
-    semantically similar to the query.
+    semantically similar to the query. It builds a throwaway TableIndex, so
+    callers that search the same collection repeatedly should build a
+    TableIndex once and call `search` on it instead.
 
     Args:
         query_embedding (Union[np.ndarray, list[float]]): The vector embedding of the user's query,
@@ -87,47 +311,105 @@ def find_top_k_relevant_tables(query_embedding: Union[np.ndarray, list[float]],
                     from most to least relevant, with the 'embeddings' key
                     removed from each. Returns an empty list if inputs are invalid.
     """
-    # 1. Handle edge cases where inputs are empty or invalid
     if query_embedding is None or not table_collection:
         return []
-
-    # 2. Ensure query_embedding is a 2D numpy array for compatibility with cosine_similarity.
-    # This correctly handles both standard lists and existing numpy arrays.
     try:
-        query_embedding_2d = np.array(query_embedding).reshape(1, -1)
-    except Exception as e:
+        table_index = TableIndex.from_collection(table_collection)
+    except (KeyError, TypeError, ValueError, AttributeError):
+        print("Error: table_collection must be a list of dicts with 'embeddings' keys.")
+        return []
+    try:
+        return table_index.search(query_embedding, top_k=top_k)
+    except ValueError as e:
         print(f"Error converting query_embedding to a valid numpy array: {e}")
         return []
 
-    # 3. Extract table embeddings from the collection
+
+TOOL_DB_FILE = 'databahn/data/security_logs.db'
+conn = sqlite3.connect(TOOL_DB_FILE)
+MANUAL_TOOL_TABLE_COLLECTION = setup_vector_db(conn)
+# The column-level index behind schema pruning, built from the same metadata rows
+MANUAL_TOOL_COLUMN_INDEX = setup_column_index(conn, EmbeddingStore(EMBEDDING_STORE_FILE), get_embeddings)
+conn.close()
+MANUAL_TOOL_TABLE_INDEX = load_table_index(MANUAL_TOOL_TABLE_COLLECTION, RETRIEVAL_BACKEND, RETRIEVAL_INDEX_PATH)
+
+
+def metadata_signature(db_file: str) -> Optional[str]:
+    """A hash of the 'metadata' table's rows, or None if it cannot be read."""
     try:
-        table_embeddings = np.array([obj['embeddings'] for obj in table_collection])
-    except (KeyError, TypeError):
-        print("Error: table_collection must be a list of dicts with 'embeddings' keys.")
-        return []
+        with sqlite3.connect(f"file:{db_file}?mode=ro", uri=True) as signature_conn:
+            rows = signature_conn.execute(
+                "SELECT table_name, column_name, column_description FROM metadata ORDER BY table_name, column_name"
+            ).fetchall()
+    except sqlite3.Error:
+        return None
+    return hashlib.sha256(json.dumps(rows).encode("utf-8")).hexdigest()
 
-    # 4. Calculate cosine similarity between the single query and all table embeddings.
-    # The result is a 2D array, so we select the first (and only) row.
-    similarities = cosine_similarity(query_embedding_2d, table_embeddings)[0]
 
-    # 5. Get the indices of the 'top_k' highest similarity scores.
-    # np.argsort sorts in ascending order, so we use slicing to reverse it.
-    top_k_indices = np.argsort(similarities)[-top_k:][::-1]
+def refresh_manual_tool_table_index(table_collection: Optional[List[dict]] = None) -> Tuple[int, int]:
+    """
+    Re-reads the 'metadata' table and applies any changes to MANUAL_TOOL_TABLE_INDEX in place.
 
-    # 6. Retrieve the full objects and remove the 'embeddings' key for the final result.
-    # This creates a new list of new dictionaries, preserving the original collection.
-    relevant_objects = [
-        {key: value for key, value in table_collection[i].items() if key != 'embeddings'}
-        for i in top_k_indices
-    ]
+    Unchanged tables are served from the embedding store and stay in the index, so
+    only edited, added or dropped tables cost an embedding call or an index update.
 
-    return relevant_objects
+    Args:
+        table_collection (Optional[List[dict]]): An already read `setup_vector_db` collection.
 
+    Returns:
+        Tuple[int, int]: The number of tables added and removed.
+    """
+    if table_collection is None:
+        refresh_conn = sqlite3.connect(TOOL_DB_FILE)
+        try:
+            table_collection = setup_vector_db(refresh_conn)
+        finally:
+            refresh_conn.close()
+    added, removed = MANUAL_TOOL_TABLE_INDEX.update(table_collection)
+    if RETRIEVAL_INDEX_PATH and (added or removed):
+        MANUAL_TOOL_TABLE_INDEX.save(RETRIEVAL_INDEX_PATH)
+    return added, removed
 
-TOOL_DB_FILE = 'databahn/data/security_logs.db'
-conn = sqlite3.connect(TOOL_DB_FILE)
-MANUAL_TOOL_TABLE_COLLECTION = setup_vector_db(conn)
-conn.close()
+
+# The database version and metadata hash the manual tool indexes were last brought in line with
+_manual_tool_metadata = {"version": database_version(TOOL_DB_FILE), "signature": metadata_signature(TOOL_DB_FILE)}
+_manual_tool_refresh_lock = asyncio.Lock()
+
+
+async def refresh_manual_tool_indexes_if_changed() -> Tuple[int, int]:
+    """
+    Refreshes MANUAL_TOOL_TABLE_INDEX and MANUAL_TOOL_COLUMN_INDEX when db_generator has rewritten the 'metadata' table.
+
+    The database version stamp is checked on every call; only when it changed is the
+    metadata table hashed, off the event loop, and the indexes refreshed if the hash
+    changed too, so log ingestion into the same file does not trigger re-embedding.
+    Embedding happens in a thread; the indexes themselves are updated on the event
+    loop, where they are searched.
+
+    Returns:
+        Tuple[int, int]: The number of tables added and removed.
+    """
+    version = database_version(TOOL_DB_FILE)
+    if version == _manual_tool_metadata["version"]:
+        return 0, 0
+    async with _manual_tool_refresh_lock:
+        if version == _manual_tool_metadata["version"]:
+            return 0, 0
+        signature = await asyncio.to_thread(metadata_signature, TOOL_DB_FILE)
+        _manual_tool_metadata["version"] = version
+        if signature is None or signature == _manual_tool_metadata["signature"]:
+            return 0, 0
+        refresh_conn = sqlite3.connect(TOOL_DB_FILE, check_same_thread=False)
+        try:
+            table_collection = await asyncio.to_thread(setup_vector_db, refresh_conn)
+            column_index = await asyncio.to_thread(
+                setup_column_index, refresh_conn, EmbeddingStore(EMBEDDING_STORE_FILE), get_embeddings
+            )
+        finally:
+            refresh_conn.close()
+        _manual_tool_metadata["signature"] = signature
+        MANUAL_TOOL_COLUMN_INDEX.replace(column_index)
+        return refresh_manual_tool_table_index(table_collection)
 
 
 # --- Example Usage ---
@@ -28,6 +28,16 @@ def get_embedding(text, model="text-embedding-3-small"):
        print(f"Error getting embedding: {e}")
        return None
 
+def get_embeddings(texts, model="text-embedding-3-small"):
+   """Generates embeddings for a batch of texts with a single call to OpenAI's API."""
+   if not openai.api_key or not texts: return [None] * len(texts)
+   try:
+       response = openai.embeddings.create(input=texts, model=model)
+       return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+   except Exception as e:
+       print(f"Error getting embeddings: {e}")
+       return [None] * len(texts)
+
 def setup_vector_db(conn):
     """Creates a FAISS vector database from the 'metadata' table."""
     print("Setting up vector database from metadata...")
@@ -37,14 +47,17 @@ def setup_vector_db(conn):
         print("Error: 'metadata' table not found. Vector DB setup failed.")
         return None, None
 
-    table_embeddings, index_to_table_map = [], {}
-    for i, (table_name, group) in enumerate(metadata_df.groupby('table_name')):
+    table_names, schema_infos = [], []
+    for table_name, group in metadata_df.groupby('table_name'):
         cols = [f"{row['column_name']} ({row['description']})" for _, row in group.iterrows()]
-        schema_info = f"Table name: {table_name}. Columns: {', '.join(cols)}."
-        embedding = get_embedding(schema_info)
+        table_names.append(table_name)
+        schema_infos.append(f"Table name: {table_name}. Columns: {', '.join(cols)}.")
+
+    table_embeddings, index_to_table_map = [], {}
+    for table_name, embedding in zip(table_names, get_embeddings(schema_infos)):
         if embedding:
+            index_to_table_map[len(table_embeddings)] = table_name
             table_embeddings.append(embedding)
-            index_to_table_map[i] = table_name
 
     if not table_embeddings: return None, None
     dimension = len(table_embeddings[0])
@@ -0,0 +1,103 @@
+import os
+from dotenv import load_dotenv
+
+# Settings read from the environment (and the .env file). They live apart from base.py, which
+# builds the OpenAI client, so the MCP servers and offline scripts can read them without an API key.
+load_dotenv()
+
+# Query-embedding cache. Set QUERY_EMBEDDING_CACHE_FILE to share cached vectors across uvicorn workers.
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+QUERY_EMBEDDING_CACHE_FILE = os.getenv("QUERY_EMBEDDING_CACHE_FILE")
+
+# Schema retrieval backend: numpy (exact), faiss_flat (exact), faiss_ivf or faiss_hnsw (approximate).
+# Set RETRIEVAL_INDEX_PATH to persist the table index between restarts.
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "numpy")
+RETRIEVAL_INDEX_PATH = os.getenv("RETRIEVAL_INDEX_PATH")
+
+# Column-level schema pruning for the lookup_cybser_security_data tool description.
+SCHEMA_PRUNING_ENABLED = os.getenv("SCHEMA_PRUNING_ENABLED", "true").lower() == "true"
+
+# MCP tool retrieval: the orchestrator sees the top-k tools for a query plus the pinned ones.
+MCP_TOOL_TOP_K = int(os.getenv("MCP_TOOL_TOP_K", "5"))
+MCP_TOOL_TABLES_TOP_K = int(os.getenv("MCP_TOOL_TABLES_TOP_K", "3"))
+MCP_PINNED_TOOLS = {name.strip() for name in os.getenv("MCP_PINNED_TOOLS", "get_cybser_security_info,perform_internet_search_and_crawl").split(",") if name.strip()}
+
+# How long the shared MCP tool registry trusts a session's tool list before re-listing it.
+MCP_TOOL_REGISTRY_TTL_SECONDS = float(os.getenv("MCP_TOOL_REGISTRY_TTL_SECONDS", "300"))
+
+# Tool dispatch: per-call timeout and how many calls may be in flight on one MCP session.
+TOOL_CALL_TIMEOUT_SECONDS = float(os.getenv("TOOL_CALL_TIMEOUT_SECONDS", "60"))
+MCP_SESSION_MAX_CONCURRENCY = int(os.getenv("MCP_SESSION_MAX_CONCURRENCY", "4"))
+
+# Conversation state per thread_id. Set STATE_STORE_REDIS_URL to share state across uvicorn workers;
+# otherwise each worker keeps its own in-process LRU of threads.
+STATE_STORE_REDIS_URL = os.getenv("STATE_STORE_REDIS_URL")
+STATE_STORE_MAX_THREADS = int(os.getenv("STATE_STORE_MAX_THREADS", "10000"))
+STATE_STORE_MAX_HISTORY = int(os.getenv("STATE_STORE_MAX_HISTORY", "200"))
+STATE_STORE_TTL_SECONDS = int(os.getenv("STATE_STORE_TTL_SECONDS", "0")) or None
+CHAT_HISTORY_LIMIT = int(os.getenv("CHAT_HISTORY_LIMIT", "5"))
+
+# Read-only SQLite pools behind the SQL tools: connections (worker threads) per database and the per-query timeout.
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+SQL_QUERY_TIMEOUT_SECONDS = float(os.getenv("SQL_QUERY_TIMEOUT_SECONDS", "30"))
+
+# Caps on what one SQL tool call returns to the LLM; rows past them are counted but not kept.
+SQL_RESULT_MAX_ROWS = int(os.getenv("SQL_RESULT_MAX_ROWS", "200"))
+SQL_RESULT_MAX_BYTES = int(os.getenv("SQL_RESULT_MAX_BYTES", "32000"))
+
+# LRU cache of SQL tool results, keyed by canonical SQL and the database file's version stamp.
+SQL_RESULT_CACHE_SIZE = int(os.getenv("SQL_RESULT_CACHE_SIZE", "256"))
+SQL_RESULT_CACHE_MAX_BYTES = int(os.getenv("SQL_RESULT_CACHE_MAX_BYTES", "16000000"))
+
+# Set SQL_WORKLOAD_LOG to a file path to record every SQL tool query, for db_generator's index suggestions.
+SQL_WORKLOAD_LOG = os.getenv("SQL_WORKLOAD_LOG")
+
+# Engine behind the SQL tools: "sqlite", "duckdb" (the Parquet export, see db_generator --export-parquet)
+# or "auto" to send aggregations to DuckDB. DuckDB is only used while its export matches the database.
+SQL_ENGINE = os.getenv("SQL_ENGINE", "sqlite")
+
+# Internet search MCP server: search endpoint, the shared HTTP session's pool and timeouts, and crawl fan-out.
+SEARCH_ENDPOINT = os.getenv("SEARCH_ENDPOINT", "https://html.duckduckgo.com/html/")
+SEARCH_USER_AGENT = os.getenv("SEARCH_USER_AGENT", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+SEARCH_MAX_LINKS = int(os.getenv("SEARCH_MAX_LINKS", "10"))
+CRAWL_MAX_CONCURRENCY = int(os.getenv("CRAWL_MAX_CONCURRENCY", "4"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "4"))
+HTTP_TOTAL_TIMEOUT_SECONDS = float(os.getenv("HTTP_TOTAL_TIMEOUT_SECONDS", "20"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "10"))
+HTTP_DNS_CACHE_TTL_SECONDS = int(os.getenv("HTTP_DNS_CACHE_TTL_SECONDS", "300"))
+
+# On-disk cache of crawled pages (revalidated with conditional GETs once stale) and search results.
+# Set CRAWL_CACHE_FILE to an empty string to disable it.
+CRAWL_CACHE_FILE = os.getenv("CRAWL_CACHE_FILE", "databahn/data/crawl_cache.db")
+CRAWL_CACHE_TTL_SECONDS = float(os.getenv("CRAWL_CACHE_TTL_SECONDS", "3600"))
+CRAWL_CACHE_MAX_BYTES = int(os.getenv("CRAWL_CACHE_MAX_BYTES", "200000000"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "900"))
+
+# HTML-to-markdown extraction for crawled pages: worker processes (0 runs it in a thread instead),
+# input/output caps, and the backend ("auto" uses lxml when installed, else BeautifulSoup + html2text).
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACTION_MAX_INPUT_CHARS = int(os.getenv("EXTRACTION_MAX_INPUT_CHARS", "2000000"))
+EXTRACTION_MAX_OUTPUT_CHARS = int(os.getenv("EXTRACTION_MAX_OUTPUT_CHARS", "20000"))
+EXTRACTION_BACKEND = os.getenv("EXTRACTION_BACKEND", "auto")
+
+# Streamed page fetches: the byte ceiling per page (a larger one for PDFs, which are unreadable
+# when cut short) and the read chunk size. Content past the ceiling is never downloaded.
+CRAWL_MAX_BYTES = int(os.getenv("CRAWL_MAX_BYTES", "3000000"))
+CRAWL_MAX_PDF_BYTES = int(os.getenv("CRAWL_MAX_PDF_BYTES", "10000000"))
+CRAWL_CHUNK_BYTES = int(os.getenv("CRAWL_CHUNK_BYTES", "65536"))
+
+# Passage ranking of crawl results: only the passages most relevant to the search query are
+# returned, within PASSAGE_TOKEN_BUDGET tokens. The embedding rerank of the BM25 candidates
+# costs one embeddings call per search, so it is off by default.
+PASSAGE_RANKING_ENABLED = os.getenv("PASSAGE_RANKING_ENABLED", "true").lower() == "true"
+PASSAGE_TOKEN_BUDGET = int(os.getenv("PASSAGE_TOKEN_BUDGET", "2000"))
+PASSAGE_MAX_TOKENS = int(os.getenv("PASSAGE_MAX_TOKENS", "200"))
+PASSAGE_RERANK_ENABLED = os.getenv("PASSAGE_RERANK_ENABLED", "false").lower() == "true"
+PASSAGE_RERANK_CANDIDATES = int(os.getenv("PASSAGE_RERANK_CANDIDATES", "20"))
+
+# Token budget of the response agent's prompt. The system and user prompts and the chat history
+# come first; tool results get the rest, allocated by priority and truncated to fit.
+RESPONSE_CONTEXT_TOKEN_BUDGET = int(os.getenv("RESPONSE_CONTEXT_TOKEN_BUDGET", "12000"))
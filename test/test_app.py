@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from databahn.utils.state_store import InMemoryStateStore
+
+
+class StubChat:
+    """Streams a fixed turn the way Chat.process_query_stream does, adding to both chat histories."""
+
+    async def process_query_stream(self, input_query, tool_registry, state):
+        yield "started", {}
+        yield "retrieval", {"tables": ["incidents"], "tools": ["lookup_cybser_security_data"]}
+        state["orchestrator"]["chat_history"].append({"role": "user", "content": input_query})
+        yield "tools_selected", {"tools": [{"id": "call_1", "name": "lookup_cybser_security_data"}]}
+        yield "tool_finished", {"id": "call_1", "name": "lookup_cybser_security_data", "ok": True}
+        for token in ["Two ", "incidents."]:
+            yield "token", {"text": token}
+        answer = {"role": "assistant", "content": "Two incidents."}
+        state["orchestrator"]["chat_history"].append(answer)
+        state["response"]["chat_history"].append(answer)
+        yield "done", {"response": "Two incidents."}
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch):
+    state_store = InMemoryStateStore()
+    monkeypatch.setattr(app_module, "app_state", {
+        "chat_instance": StubChat(),
+        "tool_registry": object(),
+        "state_store": state_store,
+    })
+    # Not entered as a context manager, so the lifespan (which starts the MCP servers) does not run
+    return TestClient(app_module.app), state_store
+
+
+def test_stream_events_arrive_in_order_and_the_turn_is_saved(client):
+    test_client, state_store = client
+    response = test_client.post("/query/stream", json={"query": "how many incidents?", "thread_id": "t1"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(response.text)
+    assert [event for event, _ in events] == ["started", "retrieval", "tools_selected", "tool_finished", "token", "token", "done"]
+    assert events[1][1]["tables"] == ["incidents"]
+    assert "".join(data["text"] for event, data in events if event == "token") == events[-1][1]["response"]
+
+    state, version = asyncio.run(state_store.load("t1"))
+    assert version == 1
+    assert state["response"]["chat_history"] == [{"role": "assistant", "content": "Two incidents."}]
+    assert [entry["role"] for entry in state["orchestrator"]["chat_history"]] == ["user", "assistant"]
+
+
+def test_stream_reports_a_conflicting_turn(client):
+    test_client, state_store = client
+    original_load = state_store.load
+
+    async def stale_load(thread_id, history_limit=5):
+        """Loads the thread, then lets another turn on it finish first."""
+        state, version = await original_load(thread_id, history_limit)
+        await state_store.append(thread_id, {"orchestrator": [{"role": "user", "content": "concurrent"}]}, version)
+        return state, version
+
+    state_store.load = stale_load
+    events = parse_sse(test_client.post("/query/stream", json={"query": "q", "thread_id": "t1"}).text)
+    assert events[-1][0] == "error" and events[-1][1]["status"] == 409
@@ -0,0 +1,50 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from databahn.utils.columnar import ColumnarEngine, export_parquet, to_duckdb_sql, UnsupportedQueryError
+from databahn.utils.sql_results import tsv_fetcher
+
+duckdb = pytest.importorskip("duckdb")
+
+fetch_result = tsv_fetcher(200, 32000)
+
+PARITY_QUERIES = [
+    "SELECT a, b FROM t ORDER BY a",
+    "SELECT a, b FROM t ORDER BY a DESC",
+    "SELECT b, COUNT(*), MAX(a) / 2, AVG(a) FROM t GROUP BY b ORDER BY b",
+    "SELECT name FROM t WHERE name LIKE 'ä%' ORDER BY name",
+    "SELECT name FROM t WHERE name LIKE 'AL_CE' ORDER BY name",
+    "SELECT name FROM t WHERE name NOT LIKE '%e' ORDER BY name",
+    "SELECT COUNT(DISTINCT b) FROM t",
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    db_file = str(tmp_path / "t.db")
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("CREATE TABLE t (a INTEGER, b TEXT, name TEXT)")
+        conn.executemany("INSERT INTO t VALUES (?, ?, ?)", [
+            (3, "x", "Älice"), (None, "y", "alice"), (1, None, "BOB"), (2, "x", "äbe"),
+        ])
+    export_parquet(db_file)
+    engine = ColumnarEngine(db_file, max_workers=1)
+    yield engine
+    engine.close()
+
+
+@pytest.mark.parametrize("sql", PARITY_QUERIES)
+def test_rendered_results_match_sqlite(engine, sql):
+    assert engine.accepts(sql, "duckdb")
+    with sqlite3.connect(engine.db_file) as conn:
+        expected = fetch_result(conn.execute(sql))
+    assert asyncio.run(engine.execute(sql, fetch_result)) == expected
+
+
+def test_like_without_literal_pattern_falls_back(engine):
+    sql = "SELECT name FROM t WHERE name LIKE b"
+    with pytest.raises(UnsupportedQueryError):
+        to_duckdb_sql(sql)
+    assert asyncio.run(engine.try_execute(sql, fetch_result, "duckdb")) is None
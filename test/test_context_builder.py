@@ -0,0 +1,79 @@
+import pytest
+
+from databahn.utils import tokens
+from databahn.utils.context_builder import allocate_budget, build_context, lookup, result_kind, truncate_text, truncate_tsv
+from databahn.utils.tokens import count_tokens
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    """Counts tokens as characters / 4, whether or not the tiktoken files are available."""
+    monkeypatch.setattr(tokens, "_get_encoding", lambda model: None)
+
+
+def sql_result(rows):
+    return "\n".join(["host\tbytes"] + [f"host{i:03d}\t{i * 100}" for i in range(rows)] + [f"({rows} rows)"])
+
+
+def test_result_kind_recognises_fetch_tsv_output():
+    assert result_kind(sql_result(3)) == "sql"
+    assert result_kind("id\n1\n... truncated: showing 1 of 9 rows (row limit 1)") == "sql"
+    assert result_kind("CVE-2024-1234 is a heap overflow.") == "text"
+
+
+def test_allocation_is_proportional_to_the_weights():
+    assert allocate_budget([1000, 1000], [2, 1], 300) == [200, 100]
+
+
+def test_small_results_give_their_unused_share_to_the_others():
+    assert allocate_budget([10, 1000, 1000], [1, 1, 1], 310) == [10, 150, 150]
+    assert allocate_budget([10, 20], [2, 1], 1000) == [10, 20]
+    assert allocate_budget([10], [1], -5) == [0]
+
+
+def test_truncated_tsv_keeps_the_header_and_the_row_count():
+    truncated = truncate_tsv(sql_result(50), 40)
+    lines = truncated.split("\n")
+    assert lines[0] == "host\tbytes" and lines[1] == "host000\t0"
+    assert lines[-1] == f"... truncated: showing {len(lines) - 2} of 50 rows (context budget)"
+    assert count_tokens(truncated) <= 40 + 8
+
+
+def test_tsv_within_its_allocation_is_unchanged():
+    assert truncate_tsv(sql_result(2), 1000) == sql_result(2)
+
+
+def test_truncating_a_truncated_tsv_keeps_the_original_total():
+    already_cut = "\n".join(["id"] + [str(i) for i in range(20)] + ["... truncated: showing 20 of 5000 rows (row limit 20)"])
+    assert truncate_tsv(already_cut, 20).endswith("of 5000 rows (context budget)")
+
+
+def test_truncated_text_says_how_much_was_dropped():
+    text = " ".join(f"word{i}" for i in range(200))
+    truncated = truncate_text(text, 50)
+    assert truncated.startswith("word0 word1") and "[... truncated:" in truncated
+    assert count_tokens(truncated.rsplit("\n", 1)[0]) <= 50
+
+
+def test_build_context_fits_the_budget_and_favours_sql():
+    results = [{"content": sql_result(200)}, {"content": " ".join(f"word{i}" for i in range(500))}, {"content": "short"}]
+    context, report = build_context(results, 600)
+    assert report["context_tokens"] <= 600 + 20
+    assert report["truncated_results"] == [1, 2]
+    assert report["result_tokens"] == sum(count_tokens(result["content"]) for result in results)
+    sql_block, text_block, short_block = context.split("\n\n--- Tool result ")
+    assert count_tokens(sql_block) > count_tokens(text_block)
+    assert short_block == "3 ---\nshort"
+
+
+def test_build_context_renders_plain_text_without_truncation():
+    context, report = build_context([{"content": "a\tb\n(0 rows)"}, {"content": ""}, "raw"], 1000)
+    assert context == "--- Tool result 1 ---\na\tb\n(0 rows)\n\n--- Tool result 2 ---\n(no result)\n\n--- Tool result 3 ---\nraw"
+    assert report["truncated_results"] == []
+
+
+def test_lookup_resolves_dotted_keys():
+    state = {"orchestrator": {"results": [1, 2]}, "flat": 3}
+    assert lookup(state, "orchestrator.results") == [1, 2]
+    assert lookup(state, "flat.results") is None
+    assert lookup(state, "missing.results") is None
@@ -0,0 +1,114 @@
+import sqlite3
+
+import pytest
+
+from databahn.scripts.db_generator import MAX_REPORTED_BAD_ROWS, index_columns, insert_rows, load_column_types
+
+
+def write_metadata(tmp_path, text):
+    path = tmp_path / "metadata.csv"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_declared_types_are_mapped(tmp_path):
+    metadata = write_metadata(tmp_path, (
+        "table_name,column_name,data_type,description\n"
+        "asset_inventory,asset_id,integer,Unique id\n"
+        "asset_inventory,purchase date,Date,When it was bought\n"
+        "firewall_logs,bytes,REAL,Bytes sent\n"
+    ))
+    assert load_column_types(metadata) == {
+        "asset_inventory": {"asset_id": "INTEGER", "purchase_date": "DATE"},
+        "firewall_logs": {"bytes": "REAL"},
+    }
+
+
+def test_unknown_or_empty_type_falls_back_to_text(tmp_path):
+    metadata = write_metadata(tmp_path, (
+        "table_name,column_name,data_type\n"
+        "dns_logs,query,VARCHAR(255)\n"
+        "dns_logs,answer,\n"
+    ))
+    assert load_column_types(metadata) == {"dns_logs": {"query": "TEXT", "answer": "TEXT"}}
+
+
+def test_metadata_without_data_type_warns(tmp_path, capsys):
+    metadata = write_metadata(tmp_path, "table_name,column_name,column_description\ncve_details,CVE_id,The CVE id\n")
+    assert load_column_types(metadata) == {}
+    assert "has no data_type column" in capsys.readouterr().out
+
+
+def test_missing_metadata_file_is_untyped(tmp_path, capsys):
+    assert load_column_types(str(tmp_path / "missing.csv")) == {}
+    assert load_column_types(None) == {}
+    assert capsys.readouterr().out == ""
+
+
+@pytest.mark.parametrize("column", ["asset_id", "id", "cve", "CVE_id", "source_ip", "ip_address", "timestamp", "scan_date", "login_time"])
+def test_join_keys_and_timestamps_are_indexed(column):
+    assert index_columns([column], {}) == [column]
+
+
+@pytest.mark.parametrize("column", ["identity", "description", "zip", "ip_count", "timestamps", "bytes_sent"])
+def test_other_columns_are_not_indexed(column):
+    assert index_columns([column], {}) == []
+
+
+def test_declared_date_columns_are_indexed():
+    columns = ["detected", "first_seen", "severity"]
+    types = {"detected": "DATETIME", "first_seen": "DATE", "severity": "INTEGER"}
+    assert index_columns(columns, types) == ["detected", "first_seen"]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE logs (log_id INTEGER PRIMARY KEY, host TEXT, bytes INTEGER)")
+    yield conn
+    conn.close()
+
+
+INSERT_SQL = "INSERT INTO logs VALUES (?, ?, ?)"
+
+
+def test_rows_are_committed_in_chunks(conn):
+    rows = [[str(i), f"host{i}", str(i * 10)] for i in range(1, 8)]
+    committed = []
+    inserted, skipped = insert_rows(conn, INSERT_SQL, rows, 3, [2], "logs.csv", chunk_size=3,
+                                    before_commit=committed.append)
+    assert (inserted, skipped) == (7, 0)
+    assert committed == [3, 3, 1]
+    assert conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 7
+
+
+def test_malformed_and_empty_rows_are_skipped_and_reported(conn, capsys):
+    rows = [["1", "a", "10"], [], ["2", "b"], ["3", "c", "30", "extra"], ["4", "d", "40"]]
+    inserted, skipped = insert_rows(conn, INSERT_SQL, rows, 3, [2], "logs.csv")
+    assert (inserted, skipped) == (2, 2)
+    out = capsys.readouterr().out
+    assert "Skipping malformed row 4 in logs.csv" in out and "Skipping malformed row 5 in logs.csv" in out
+    assert [row[0] for row in conn.execute("SELECT log_id FROM logs ORDER BY log_id")] == [1, 4]
+
+
+def test_failing_chunk_is_retried_row_by_row(conn, capsys):
+    rows = [["1", "a", "10"], ["1", "duplicate", "20"], ["2", "b", "30"], ["3", "c", "40"]]
+    committed = []
+    inserted, skipped = insert_rows(conn, INSERT_SQL, rows, 3, [2], "logs.csv", chunk_size=4,
+                                    before_commit=committed.append)
+    assert (inserted, skipped) == (3, 1)
+    assert committed == [3]
+    assert "Error inserting row 3 from logs.csv" in capsys.readouterr().out
+    assert conn.execute("SELECT host FROM logs WHERE log_id = 1").fetchone()[0] == "a"
+
+
+def test_empty_typed_cells_become_null(conn):
+    insert_rows(conn, INSERT_SQL, [["1", "", ""]], 3, [2], "logs.csv")
+    assert conn.execute("SELECT host, bytes FROM logs").fetchone() == ("", None)
+
+
+def test_only_the_first_bad_rows_are_printed(conn, capsys):
+    rows = [["x"]] * (MAX_REPORTED_BAD_ROWS + 5)
+    inserted, skipped = insert_rows(conn, INSERT_SQL, rows, 3, [], "logs.csv")
+    assert (inserted, skipped) == (0, MAX_REPORTED_BAD_ROWS + 5)
+    assert capsys.readouterr().out.count("Skipping malformed row") == MAX_REPORTED_BAD_ROWS
@@ -0,0 +1,97 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from databahn.scripts.dispatcher import Dispatcher
+
+
+class FakeSession:
+    """An MCP session whose tools sleep for `args['delay']` and echo their name, tracking calls in flight."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def call_tool(self, name, args):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(args.get("delay", 0))
+        finally:
+            self.in_flight -= 1
+        return SimpleNamespace(content=[SimpleNamespace(text=f"{name} done")])
+
+
+class FakeRegistry:
+    def __init__(self, sessions):
+        self.sessions = sessions
+
+    async def get_tool_sessions(self):
+        return self.sessions
+
+
+def tool_call(call_id, name, arguments):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def sleep_call(call_id, name, delay):
+    return tool_call(call_id, name, json.dumps({"delay": delay}))
+
+
+def test_results_keep_the_order_of_the_calls():
+    session = FakeSession()
+    registry = FakeRegistry({"slow": session, "fast": session})
+    calls = [sleep_call("1", "slow", 0.05), sleep_call("2", "fast", 0), tool_call("3", "fast", "{not json")]
+    results = asyncio.run(Dispatcher(tool_call_timeout=5, max_calls_per_session=4).dispatcher_invoke(calls, registry))
+    assert [(result["tool_call_id"], result["content"]) for result in results] == [("1", "slow done"), ("2", "fast done")]
+    assert session.max_in_flight == 2
+
+
+def test_a_timed_out_call_returns_empty_content():
+    registry = FakeRegistry({"stuck": FakeSession(), "fast": FakeSession()})
+    calls = [sleep_call("1", "stuck", 10), sleep_call("2", "fast", 0)]
+    results = asyncio.run(Dispatcher(tool_call_timeout=0.05).dispatcher_invoke(calls, registry))
+    assert [result["content"] for result in results] == ["", "fast done"]
+
+
+def test_unknown_tool_returns_empty_content():
+    results = asyncio.run(Dispatcher().dispatcher_invoke([sleep_call("1", "missing", 0)], FakeRegistry({})))
+    assert results == [{"role": "tool", "tool_call_id": "1", "content": ""}]
+
+
+def test_calls_in_flight_are_bounded_per_session():
+    busy, other = FakeSession(), FakeSession()
+    registry = FakeRegistry({"busy": busy, "other": other})
+    calls = [sleep_call(str(i), "busy", 0.02) for i in range(5)] + [sleep_call(str(i), "other", 0.02) for i in range(5, 8)]
+    results = asyncio.run(Dispatcher(max_calls_per_session=2).dispatcher_invoke(calls, registry))
+    assert len(results) == 8
+    assert busy.max_in_flight == 2
+    assert other.max_in_flight == 2
+
+
+def test_dispatch_as_completed_yields_in_completion_order():
+    registry = FakeRegistry({"slow": FakeSession(), "fast": FakeSession()})
+    calls = [sleep_call("1", "slow", 0.05), tool_call("2", "fast", "{not json"), sleep_call("3", "fast", 0)]
+
+    async def run():
+        return [(position, result and result["content"]) async for position, result in Dispatcher().dispatch_as_completed(calls, registry)]
+
+    completed = asyncio.run(run())
+    assert completed[-1] == (0, "slow done")
+    assert sorted(completed[:2], key=lambda item: item[0]) == [(1, None), (2, "fast done")]
+
+
+def test_consumer_stopping_early_cancels_the_rest():
+    session = FakeSession()
+    registry = FakeRegistry({"slow": session, "fast": session})
+    calls = [sleep_call("1", "slow", 10), sleep_call("2", "fast", 0)]
+
+    async def run():
+        stream = Dispatcher(tool_call_timeout=30).dispatch_as_completed(calls, registry)
+        first = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0)
+        return first
+
+    assert asyncio.run(run()) == (1, {"role": "tool", "tool_call_id": "2", "content": "fast done"})
+    assert session.in_flight == 0
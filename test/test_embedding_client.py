@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from databahn.utils.embedding_client import AsyncEmbeddingClient
+
+
+class FakeBackend:
+    """Embeds a text as [len(text), position in its batch] and records every batch it is sent."""
+
+    def __init__(self, delay=0.0, fail=False, drop_last=False):
+        self.delay = delay
+        self.fail = fail
+        self.drop_last = drop_last
+        self.batches = []
+
+    async def __call__(self, texts, model):
+        self.batches.append(list(texts))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("embedding service unavailable")
+        vectors = [[float(len(text)), float(i)] for i, text in enumerate(texts)]
+        return vectors[:-1] if self.drop_last else vectors
+
+
+def test_concurrent_embeds_within_the_window_share_one_batch():
+    backend = FakeBackend()
+    client = AsyncEmbeddingClient(backend=backend, batch_window=0.05)
+
+    async def run():
+        return await asyncio.gather(client.embed("a"), client.embed("bb"), client.embed("ccc"))
+
+    assert asyncio.run(run()) == [[1.0, 0.0], [2.0, 1.0], [3.0, 2.0]]
+    assert backend.batches == [["a", "bb", "ccc"]]
+
+
+def test_embeds_past_max_batch_size_are_split():
+    backend = FakeBackend()
+    client = AsyncEmbeddingClient(backend=backend, batch_window=0.05, max_batch_size=2)
+
+    async def run():
+        return await asyncio.gather(*(client.embed(text) for text in ["a", "bb", "ccc", "dddd", "eeeee"]))
+
+    results = asyncio.run(run())
+    assert [vector[0] for vector in results] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert backend.batches == [["a", "bb"], ["ccc", "dddd"], ["eeeee"]]
+
+
+def test_embed_many_is_split_by_max_batch_size():
+    backend = FakeBackend()
+    client = AsyncEmbeddingClient(backend=backend, max_batch_size=2)
+    results = asyncio.run(client.embed_many(["a", "", "bb", "ccc"]))
+    assert results == [[1.0, 0.0], None, [2.0, 1.0], [3.0, 0.0]]
+    assert backend.batches == [["a", "bb"], ["ccc"]]
+
+
+def test_duplicate_texts_in_a_batch_are_embedded_once():
+    backend = FakeBackend()
+    client = AsyncEmbeddingClient(backend=backend, batch_window=0.05)
+
+    async def run():
+        return await asyncio.gather(client.embed("same"), client.embed("other"), client.embed("same"))
+
+    first, other, second = asyncio.run(run())
+    assert first == second == [4.0, 0.0] and other == [5.0, 1.0]
+    assert backend.batches == [["same", "other"]]
+
+
+@pytest.mark.parametrize("backend", [FakeBackend(fail=True), FakeBackend(drop_last=True)], ids=["raises", "wrong_length"])
+def test_a_failed_batch_resolves_every_waiter_to_none(backend):
+    client = AsyncEmbeddingClient(backend=backend, batch_window=0.01)
+
+    async def run():
+        return await asyncio.gather(client.embed("a"), client.embed("bb"))
+
+    assert asyncio.run(run()) == [None, None]
+    assert asyncio.run(client.embed_many(["a", "bb"])) == [None, None]
+
+
+def test_cancelled_batch_does_not_leave_waiters_pending():
+    backend = FakeBackend(delay=10)
+    client = AsyncEmbeddingClient(backend=backend, batch_window=0.01)
+
+    async def run():
+        waiter = asyncio.ensure_future(client.embed("a"))
+        while not backend.batches:
+            await asyncio.sleep(0.01)
+        for task in list(client._batch_tasks):
+            task.cancel()
+        done, _ = await asyncio.wait([waiter], timeout=1)
+        return waiter, done
+
+    waiter, done = asyncio.run(run())
+    assert waiter in done and waiter.cancelled()
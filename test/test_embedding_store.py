@@ -0,0 +1,36 @@
+import logging
+
+import numpy as np
+
+from databahn.utils import embedding_store
+from databahn.utils.embedding_store import EmbeddingStore
+
+
+def test_get_many_reads_only_the_requested_keys(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_store, "GET_MANY_CHUNK_SIZE", 2)
+    store = EmbeddingStore(str(tmp_path / "embeddings.db"))
+    store.put_many([(f"k{i}", [float(i), 1.0]) for i in range(5)], "small")
+    store.put_many([("other", [9.0, 9.0])], "large")
+
+    found = store.get_many(["k0", "k2", "k4", "k4", "missing"], "small")
+    assert sorted(found) == ["k0", "k2", "k4"]
+    assert np.array_equal(found["k0"], np.array([0.0, 1.0], dtype=np.float32))
+    assert list(store.get_many(["k0", "other"], "large")) == ["other"]
+    assert store.get_many([], "small") == {}
+
+
+def test_single_reads_honour_max_age(tmp_path, monkeypatch):
+    store = EmbeddingStore(str(tmp_path / "embeddings.db"))
+    store.put_many([("k", [1.0])], "small")
+    assert store.get("k", "small", max_age=60) is not None
+    monkeypatch.setattr(embedding_store.time, "time", lambda: 10 ** 12)
+    assert store.get("k", "small", max_age=60) is None
+    assert store.delete_older_than(60) == 1
+
+
+def test_read_errors_are_logged(tmp_path, caplog):
+    store = EmbeddingStore(str(tmp_path / "embeddings.db"))
+    store.db_path = str(tmp_path / "missing" / "embeddings.db")
+    with caplog.at_level(logging.ERROR, logger=embedding_store.__name__):
+        assert store.get_many(["k"], "small") == {}
+    assert "Error reading the embedding store" in caplog.text
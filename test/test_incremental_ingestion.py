@@ -0,0 +1,127 @@
+import sqlite3
+
+import pytest
+
+from databahn.scripts import db_generator
+
+HEADER = "log_id,timestamp,source_ip,action\n"
+
+
+def log_line(log_id, day=26):
+    return f"{log_id},2023-10-{day} 10:00:00,10.0.0.{log_id},DENY\n"
+
+
+@pytest.fixture
+def feed(tmp_path):
+    path = tmp_path / "firewall_logs.csv"
+    path.write_text(HEADER + log_line(1) + log_line(2, 27), encoding="utf-8")
+    return path
+
+
+def count_calls(monkeypatch, name):
+    calls = []
+    original = getattr(db_generator, name)
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(db_generator, name, wrapper)
+    return calls
+
+
+def test_tail_keeps_one_connection_and_only_partitions_after_appending(tmp_path, feed, monkeypatch):
+    db_name = str(tmp_path / "logs.db")
+    connects = count_calls(monkeypatch, "_connect_for_appending")
+    conversions = count_calls(monkeypatch, "partition_table")
+    rolls = count_calls(monkeypatch, "roll_head")
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            with open(feed, "a", encoding="utf-8") as f:
+                f.write(log_line(3, 28))
+        elif len(sleeps) == 3:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(db_generator.time, "sleep", sleep)
+    assert db_generator.tail_logs(db_name, [str(feed)], interval_seconds=0.5, partition_by="day") == 3
+
+    # Pass 1 creates the flat table and converts it, pass 2 is idle, pass 3 rolls its new row into place
+    assert len(connects) == 1
+    assert len(conversions) == 1
+    assert len(rolls) == 1
+    with sqlite3.connect(db_name) as conn:
+        assert [row[0] for row in conn.execute("SELECT log_id FROM firewall_logs ORDER BY log_id")] == ["1", "2", "3"]
+        assert conn.execute("SELECT type FROM sqlite_master WHERE name = 'firewall_logs'").fetchone()[0] == "view"
+
+
+def manifest(db_name, feed):
+    with sqlite3.connect(db_name) as conn:
+        return conn.execute(f"SELECT byte_offset, rows_ingested, high_water_column, high_water_mark FROM {db_generator.MANIFEST_TABLE} "
+                            "WHERE file_path = ?", (str(feed),)).fetchone()
+
+
+def log_ids(db_name):
+    with sqlite3.connect(db_name) as conn:
+        return [row[0] for row in conn.execute("SELECT log_id FROM firewall_logs ORDER BY CAST(log_id AS INTEGER)")]
+
+
+def test_only_new_rows_are_appended(tmp_path, feed):
+    db_name = str(tmp_path / "logs.db")
+    assert db_generator.ingest_incremental(db_name, [str(feed)]) == 2
+    assert manifest(db_name, feed) == (feed.stat().st_size, 2, "log_id", "2")
+    assert db_generator.ingest_incremental(db_name, [str(feed)]) == 0
+
+    with open(feed, "a", encoding="utf-8") as f:
+        f.write(log_line(3) + log_line(4))
+    assert db_generator.ingest_incremental(db_name, [str(feed)]) == 2
+    assert manifest(db_name, feed) == (feed.stat().st_size, 4, "log_id", "4")
+    assert log_ids(db_name) == ["1", "2", "3", "4"]
+
+
+def test_partial_trailing_line_waits_for_the_next_pass(tmp_path, feed):
+    db_name = str(tmp_path / "logs.db")
+    complete_size = feed.stat().st_size
+    with open(feed, "a", encoding="utf-8") as f:
+        f.write("3,2023-10-28 10:00")
+    assert db_generator.ingest_incremental(db_name, [str(feed)]) == 2
+    assert manifest(db_name, feed)[0] == complete_size
+
+    with open(feed, "a", encoding="utf-8") as f:
+        f.write(":00,10.0.0.3,DENY\n")
+    assert db_generator.ingest_incremental(db_name, [str(feed)]) == 1
+    assert log_ids(db_name) == ["1", "2", "3"]
+
+
+def test_rotated_file_is_reread_past_the_high_water_mark(tmp_path, feed, capsys):
+    db_name = str(tmp_path / "logs.db")
+    with open(feed, "a", encoding="utf-8") as f:
+        f.write(log_line(3))
+    db_generator.ingest_incremental(db_name, [str(feed)])
+    # The rotated file is shorter than the offset and still holds row 3, which must not be appended twice
+    feed.write_text(HEADER + log_line(3) + log_line(4), encoding="utf-8")
+    assert db_generator.ingest_incremental(db_name, [str(feed)]) == 1
+    assert "was rotated or rewritten" in capsys.readouterr().out
+    assert log_ids(db_name) == ["1", "2", "3", "4"]
+    assert manifest(db_name, feed) == (feed.stat().st_size, 4, "log_id", "4")
+
+
+def test_rebuilt_table_resumes_from_its_maximum(tmp_path, feed):
+    db_name = str(tmp_path / "logs.db")
+    assert db_generator.create_database_and_tables(db_name, [str(feed)], build_indexes=False) == 2
+    with open(feed, "a", encoding="utf-8") as f:
+        f.write(log_line(3))
+    assert db_generator.ingest_incremental(db_name, [str(feed)]) == 1
+    assert log_ids(db_name) == ["1", "2", "3"]
+    assert manifest(db_name, feed)[1:] == (1, "log_id", "3")
+
+
+def test_rebuild_clears_the_manifest_entry(tmp_path, feed):
+    db_name = str(tmp_path / "logs.db")
+    db_generator.ingest_incremental(db_name, [str(feed)])
+    db_generator.create_database_and_tables(db_name, [str(feed)], build_indexes=False)
+    assert manifest(db_name, feed) is None
+    assert db_generator.ingest_incremental(db_name, [str(feed)]) == 0
+    assert log_ids(db_name) == ["1", "2"]
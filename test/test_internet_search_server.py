@@ -0,0 +1,178 @@
+import asyncio
+from urllib.parse import quote
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from databahn.mcp_servers.scripts import internet_search_server as server
+from databahn.utils.crawl_cache import CrawlCache
+
+PAGE_HTML = "<html><body><main><h1>Advisory {n}</h1><p>Patch the exposed storage bucket {n}.</p></main></body></html>"
+
+
+@pytest.fixture(autouse=True)
+def isolated_server(monkeypatch):
+    """No crawl cache, extraction in a thread and no passage ranking, unless a test says otherwise."""
+    monkeypatch.setattr(server, "http_session", None)
+    monkeypatch.setattr(server, "crawl_cache", None)
+    monkeypatch.setattr(server, "EXTRACTION_WORKERS", 0)
+    monkeypatch.setattr(server, "PASSAGE_RANKING_ENABLED", False)
+
+
+class StubSite:
+    """
+    A search endpoint returning DuckDuckGo-style redirect links to `pages` slow pages.
+
+    It records the pages requested and the most requests it was serving at once.
+    Tests add their own routes to `app` before the site is started.
+    """
+
+    def __init__(self, pages=8, delay=0.05):
+        self.pages = pages
+        self.delay = delay
+        self.requested = []
+        self.active = 0
+        self.max_active = 0
+        self.base_url = ""
+        self.app = web.Application()
+        self.app.router.add_post("/html/", self.search)
+        self.app.router.add_get("/page/{n}", self.page)
+
+    async def search(self, request):
+        results = "".join(
+            f'<div class="result"><a class="result__a" href="//duckduckgo.com/l/?uddg={quote(self.url(f"/page/{n}"), safe="")}&rut=x">'
+            f"Result {n}</a></div>"
+            for n in range(self.pages)
+        )
+        return web.Response(text=f"<html><body>{results}</body></html>", content_type="text/html")
+
+    async def page(self, request):
+        self.requested.append(request.path)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return web.Response(text=PAGE_HTML.format(n=request.match_info["n"]), content_type="text/html")
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    async def run(self, monkeypatch, coroutine_factory):
+        """Serves the site and runs `coroutine_factory()` inside the server lifespan, with the search endpoint pointed at it."""
+        async with TestServer(self.app) as test_server:
+            self.base_url = str(test_server.make_url("")).rstrip("/")
+            monkeypatch.setattr(server, "SEARCH_ENDPOINT", self.url("/html/"))
+            async with server.http_session_lifespan(server.mcp):
+                return await coroutine_factory()
+
+
+def test_resolve_result_url_unwraps_redirects():
+    target = "https://example.com/advisory?id=1"
+    assert server.resolve_result_url(f"//duckduckgo.com/l/?uddg={quote(target, safe='')}&rut=abc") == target
+    assert server.resolve_result_url("https://example.com/direct") == "https://example.com/direct"
+
+
+def test_lifespan_closes_the_shared_session():
+    async def run():
+        async with server.http_session_lifespan(server.mcp) as context:
+            session = context["http_session"]
+            assert server.get_http_session() is session and not session.closed
+        return session
+
+    assert asyncio.run(run()).closed
+
+
+def test_search_crawls_the_unwrapped_top_k_links(monkeypatch):
+    site = StubSite()
+    result = asyncio.run(site.run(monkeypatch, lambda: server.perform_internet_search_and_crawl("bucket", top_k_links=3)))
+    assert sorted(site.requested) == ["/page/0", "/page/1", "/page/2"]
+    assert result.index("Advisory 0") < result.index("Advisory 1") < result.index("Advisory 2")
+
+
+def test_crawls_are_bounded_by_the_concurrency_limit(monkeypatch):
+    monkeypatch.setattr(server, "CRAWL_MAX_CONCURRENCY", 2)
+    site = StubSite()
+    asyncio.run(site.run(monkeypatch, lambda: server.perform_internet_search_and_crawl("bucket", top_k_links=6)))
+    assert len(site.requested) == 6
+    assert site.max_active == 2
+
+
+def test_read_body_stops_at_the_byte_ceiling(monkeypatch):
+    monkeypatch.setattr(server, "CRAWL_MAX_BYTES", 100_000)
+    monkeypatch.setattr(server, "CRAWL_CHUNK_BYTES", 16_384)
+    site = StubSite()
+
+    async def big_page(request):
+        return web.Response(body=b"<html><body>" + b"<p>log line</p>\n" * 500_000, content_type="text/html")
+
+    site.app.router.add_get("/big", big_page)
+
+    async def fetch():
+        async with server.get_http_session().get(site.url("/big")) as response:
+            return await server.read_body(response, response.headers["Content-Type"])
+
+    body, kind, truncated = asyncio.run(site.run(monkeypatch, fetch))
+    assert kind == "html" and truncated
+    assert len(body) == 100_000
+
+
+def test_binary_content_is_skipped_and_cached_empty(monkeypatch, tmp_path):
+    cache = CrawlCache(str(tmp_path / "crawl.db"))
+    monkeypatch.setattr(server, "crawl_cache", cache)
+    site = StubSite()
+
+    async def firmware(request):
+        return web.Response(body=b"\x7fELF\x00\x01" * 200_000, content_type="application/octet-stream")
+
+    site.app.router.add_get("/firmware.bin", firmware)
+
+    markdown = asyncio.run(site.run(monkeypatch, lambda: server.crawl_page(server.get_http_session(), site.url("/firmware.bin"))))
+    assert markdown.startswith("--- Skipped non-text content")
+    cached = cache.get_page(site.url("/firmware.bin"))
+    assert cached.body == b"" and cached.markdown == markdown
+
+
+def test_stale_page_is_revalidated_with_a_304(monkeypatch, tmp_path):
+    now = [1000.0]
+    cache = CrawlCache(str(tmp_path / "crawl.db"), ttl_seconds=60, clock=lambda: now[0])
+    monkeypatch.setattr(server, "crawl_cache", cache)
+    site = StubSite()
+    conditional_requests = []
+
+    async def advisory(request):
+        conditional_requests.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers={"ETag": '"v1"'})
+        return web.Response(text=PAGE_HTML.format(n="changed"), content_type="text/html", headers={"ETag": '"v2"'})
+
+    site.app.router.add_get("/advisory", advisory)
+
+    async def crawl_twice():
+        url = site.url("/advisory")
+        cache.put_page(url, '"v1"', None, b"<html>old</html>", "--- Content from cached copy ---")
+        now[0] += 120
+        return await server.crawl_page(server.get_http_session(), url)
+
+    assert asyncio.run(site.run(monkeypatch, crawl_twice)) == "--- Content from cached copy ---"
+    assert conditional_requests == ['"v1"']
+    assert cache.revalidated == 1
+    assert cache.is_fresh(cache.get_page(site.url("/advisory")))
+
+
+def test_extraction_pool_does_not_fork_the_server(monkeypatch):
+    monkeypatch.setattr(server, "EXTRACTION_WORKERS", 1)
+    monkeypatch.setattr(server, "extraction_pool", None)
+    body = PAGE_HTML.format(n=7).encode()
+
+    async def run():
+        async with server.http_session_lifespan(server.mcp):
+            markdown = await server.extract_markdown("https://example.com/7", body, "html")
+            return markdown, server.extraction_pool._mp_context.get_start_method()
+
+    markdown, start_method = asyncio.run(run())
+    assert "Advisory 7" in markdown
+    assert start_method == "forkserver"
+    assert server.extraction_pool is None
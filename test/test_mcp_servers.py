@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVERS = ["databahn.mcp_servers.scripts.cyber_sec_server", "databahn.mcp_servers.scripts.internet_search_server"]
+
+
+@pytest.mark.parametrize("module", SERVERS)
+def test_server_starts_without_an_openai_key(module):
+    """
+    The MCP servers read settings.py only; importing base.py would build the OpenAI client and need a key.
+    Nor do they load the query-embedding cache, whose disk tier belongs to the app.
+    """
+    env = {key: value for key, value in os.environ.items() if key != "OPENAI_API_KEY"}
+    env["SQL_ENGINE"] = "sqlite"
+    env["PYTHONPATH"] = REPO_ROOT
+    code = f"import sys, {module}; assert not {{'base', 'openai', 'databahn.utils.query_cache'}} & set(sys.modules)"
+    completed = subprocess.run([sys.executable, "-c", code], env=env, cwd=REPO_ROOT, capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0, completed.stderr
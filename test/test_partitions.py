@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+
+from databahn.utils.partitions import load_partition_catalog, partition_table, prune_partitions, timestamp_bounds
+
+
+@pytest.fixture
+def conn():
+    """firewall_logs partitioned by day over 2023-10-26..2023-10-30, and an unpartitioned ids_alerts."""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE firewall_logs (timestamp TEXT, src_ip TEXT, action TEXT)")
+    conn.execute("CREATE TABLE ids_alerts (timestamp TEXT, src_ip TEXT, signature TEXT)")
+    conn.executemany("INSERT INTO firewall_logs VALUES (?, ?, ?)", [
+        (f"2023-10-{day} 10:00:00", f"10.0.0.{day}", "DENY") for day in range(26, 31)
+    ])
+    conn.executemany("INSERT INTO ids_alerts VALUES (?, ?, ?)", [
+        (f"2023-10-{day} 12:00:00", f"10.0.0.{day}", "scan") for day in range(26, 31)
+    ])
+    partition_table(conn, "firewall_logs", "day")
+    yield conn
+    conn.close()
+
+
+def run_both(conn, sql):
+    """Returns the rows of `sql` as written and after pruning."""
+    pruned = prune_partitions(sql, load_partition_catalog(conn))
+    return sorted(conn.execute(sql).fetchall()), sorted(conn.execute(pruned).fetchall()), pruned
+
+
+def test_single_table_predicate_prunes(conn):
+    sql = "SELECT * FROM firewall_logs WHERE timestamp >= '2023-10-29'"
+    original, pruned_rows, pruned = run_both(conn, sql)
+    assert pruned_rows == original and len(original) == 2
+    assert "firewall_logs__p20231026" not in pruned and "firewall_logs__p20231029" in pruned
+
+
+def test_joined_tables_timestamp_is_not_applied(conn):
+    sql = ("SELECT fl.src_ip, ia.signature FROM firewall_logs fl JOIN ids_alerts ia ON fl.src_ip = ia.src_ip "
+           "WHERE ia.timestamp > '2023-10-28'")
+    original, pruned_rows, pruned = run_both(conn, sql)
+    assert pruned_rows == original and len(original) == 3
+    assert pruned == sql
+
+
+def test_unqualified_timestamp_in_join_is_ignored(conn):
+    sql = ("SELECT fl.src_ip FROM firewall_logs fl JOIN ids_alerts ia ON fl.src_ip = ia.src_ip "
+           "WHERE timestamp > '2023-10-28'")
+    assert prune_partitions(sql, load_partition_catalog(conn)) == sql
+
+
+def test_qualified_timestamp_in_join_prunes(conn):
+    sql = ("SELECT fl.src_ip, ia.signature FROM firewall_logs fl JOIN ids_alerts ia ON fl.src_ip = ia.src_ip "
+           "WHERE fl.timestamp >= '2023-10-29'")
+    original, pruned_rows, pruned = run_both(conn, sql)
+    assert pruned_rows == original and len(original) == 2
+    assert "firewall_logs__p20231026" not in pruned
+
+
+def test_subquery_timestamp_is_not_applied(conn):
+    sql = ("SELECT * FROM firewall_logs WHERE src_ip IN "
+           "(SELECT src_ip FROM ids_alerts WHERE timestamp >= '2023-10-28')")
+    original, pruned_rows, pruned = run_both(conn, sql)
+    assert pruned_rows == original and len(original) == 3
+    assert pruned == sql
+
+
+def test_not_disables_pruning(conn):
+    sql = "SELECT * FROM firewall_logs WHERE NOT (timestamp >= '2023-10-29')"
+    original, pruned_rows, pruned = run_both(conn, sql)
+    assert pruned_rows == original and len(original) == 3
+    assert pruned == sql
+
+
+def test_bounds_ignore_other_qualifiers():
+    assert timestamp_bounds("SELECT * FROM t WHERE x.timestamp > '2023-10-28'", "timestamp", ["t"]) == (None, None)
+    assert timestamp_bounds("SELECT * FROM t WHERE t.timestamp > '2023-10-28' AND flag IS NOT NULL", "timestamp", ["t"]) == ("2023-10-28", None)
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from databahn.utils import tokens
+from databahn.utils.passage_ranking import rank_passages, split_passages
+from databahn.utils.tokens import count_tokens
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    """Counts tokens as characters / 4, whether or not the tiktoken files are available."""
+    monkeypatch.setattr(tokens, "_get_encoding", lambda model: None)
+
+
+def page(url, *paragraphs):
+    return url, f"--- Content from {url} ---\n\n" + "\n\n".join(paragraphs)
+
+
+def filler(topic, words=30):
+    return " ".join([f"{topic}{i % 5}" for i in range(words)])
+
+
+ADVISORY = page(
+    "https://vendor.example/advisory",
+    "# CVE-2024-1234",
+    "CVE-2024-1234 is a heap overflow in the parser, fixed in version 2.4.1.",
+    filler("changelog"),
+    "Upgrade to 2.4.1 to fix CVE-2024-1234; there is no workaround.",
+)
+BLOG = page(
+    "https://blog.example/post",
+    filler("company"),
+    "Our analysis of CVE-2024-1234 shows active exploitation since March.",
+)
+
+
+def test_selected_passages_fit_the_budget():
+    result = asyncio.run(rank_passages("CVE-2024-1234 fix", [ADVISORY, BLOG], token_budget=40, passage_tokens=20))
+    passages = [block for block in result.split("\n\n") if not block.startswith("--- Passages from")]
+    assert sum(count_tokens(passage) for passage in passages) <= 40
+    assert "Upgrade to 2.4.1" in result
+    assert "changelog0" not in result and "company0" not in result
+
+
+def test_passages_are_grouped_by_page_in_reading_order():
+    result = asyncio.run(rank_passages("CVE-2024-1234", [ADVISORY, BLOG], token_budget=1000, passage_tokens=20))
+    assert result.index("--- Passages from https://vendor.example/advisory ---") < \
+        result.index("--- Passages from https://blog.example/post ---")
+    assert result.index("heap overflow") < result.index("Upgrade to 2.4.1")
+    assert result.count("--- Passages from") == 2
+
+
+def test_passages_keep_their_heading():
+    passages = split_passages(*ADVISORY, max_tokens=20)
+    assert all(passage.text.startswith("# CVE-2024-1234") for passage in passages)
+
+
+def test_an_over_budget_best_passage_is_cut_to_fit():
+    long_page = page("https://long.example", "CVE-2024-1234 " + filler("detail", 200))
+    result = asyncio.run(rank_passages("CVE-2024-1234", [long_page], token_budget=10, passage_tokens=1000))
+    body = result.split("\n\n", 1)[1]
+    assert body.startswith("CVE-2024-1234") and count_tokens(body) <= 10
+
+
+def test_failed_pages_are_reported_only_without_passages():
+    failed = ("https://down.example", "Error crawling https://down.example: timeout")
+    assert asyncio.run(rank_passages("CVE-2024-1234", [failed])) == failed[1]
+    assert "Error crawling" not in asyncio.run(rank_passages("CVE-2024-1234", [failed, BLOG]))
+
+
+class FakeEmbeddingClient:
+    """Embeds the query and texts about exploitation alike, the upgrade advice opposite, and the rest orthogonal."""
+
+    async def embed_many(self, texts):
+        def embed(i, text):
+            if i == 0 or "exploitation" in text:
+                return [1.0, 0.0]
+            return [-1.0, 0.0] if "Upgrade" in text else [0.0, 1.0]
+        return [embed(i, text) for i, text in enumerate(texts)]
+
+
+def test_embedding_rerank_can_change_the_pick():
+    query = "CVE-2024-1234 fix"
+    without = asyncio.run(rank_passages(query, [ADVISORY, BLOG], token_budget=21, passage_tokens=20))
+    reranked = asyncio.run(rank_passages(query, [ADVISORY, BLOG], token_budget=21, passage_tokens=20,
+                                         embedding_client=FakeEmbeddingClient()))
+    assert "Upgrade to 2.4.1" in without and "exploitation" not in without
+    assert "exploitation" in reranked and "Upgrade to 2.4.1" not in reranked
@@ -0,0 +1,42 @@
+import asyncio
+import sqlite3
+
+from databahn.utils.embedding_store import EmbeddingStore
+from databahn.utils.query_cache import QueryEmbeddingCache
+
+
+def stored_keys(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return {row[0] for row in conn.execute("SELECT key FROM embeddings")}
+
+
+def backdate(db_path, seconds):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE embeddings SET created_at = created_at - ?", (seconds,))
+
+
+def test_expired_disk_entries_are_deleted_on_startup(tmp_path):
+    db_path = str(tmp_path / "queries.db")
+    store = EmbeddingStore(db_path)
+    store.put_many([("old", [1.0, 0.0])], "m")
+    backdate(db_path, 120)
+    store.put_many([("new", [0.0, 1.0])], "m")
+
+    QueryEmbeddingCache(ttl_seconds=60, disk_store=store)
+    assert stored_keys(db_path) == {"new"}
+
+
+def test_expired_disk_entries_are_deleted_on_put_once_per_ttl(tmp_path):
+    db_path = str(tmp_path / "queries.db")
+    now = [0.0]
+    cache = QueryEmbeddingCache(ttl_seconds=60, disk_store=EmbeddingStore(db_path), clock=lambda: now[0])
+
+    asyncio.run(cache.put("first query", "m", [1.0, 0.0]))
+    backdate(db_path, 120)
+    now[0] = 30.0
+    asyncio.run(cache.put("second query", "m", [0.0, 1.0]))
+    assert len(stored_keys(db_path)) == 2
+
+    now[0] = 61.0
+    asyncio.run(cache.put("third query", "m", [1.0, 1.0]))
+    assert stored_keys(db_path) == {cache.make_key("second query", "m"), cache.make_key("third query", "m")}
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from databahn.utils.retrieval_backends import create_backend
+
+faiss = pytest.importorskip("faiss")
+
+
+def random_vectors(count, dim=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+
+
+@pytest.mark.parametrize("backend_name", ["numpy", "faiss_flat", "faiss_hnsw"])
+def test_readding_an_id_replaces_its_vector(backend_name):
+    backend = create_backend(backend_name, 16)
+    vectors = random_vectors(10)
+    backend.add(range(10), vectors)
+    replacement = random_vectors(1, seed=1)
+    backend.add([3], replacement)
+
+    assert len(backend) == 10
+    _, ids = backend.search(replacement, 10)
+    assert ids[0][0] == 3
+    assert sorted(ids[0].tolist()) == list(range(10))
+
+
+def test_hnsw_readding_a_removed_id_is_searchable_once():
+    backend = create_backend("faiss_hnsw", 16)
+    vectors = random_vectors(10)
+    backend.add(range(10), vectors)
+    backend.remove([4])
+    assert len(backend) == 9
+
+    backend.add([4], vectors[4:5])
+    assert len(backend) == 10
+    _, ids = backend.search(vectors[4:5], 10)
+    assert ids[0].tolist().count(4) == 1
+    assert sorted(ids[0].tolist()) == list(range(10))
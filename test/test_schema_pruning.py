@@ -0,0 +1,78 @@
+import sqlite3
+
+import pytest
+
+from databahn.utils.embedding_store import EmbeddingStore
+from databahn.utils.schema_pruning import ColumnIndex, build_schema_block, column_budget, format_table, setup_column_index
+from databahn.utils.tokens import count_tokens
+
+# incidents: asset_id and cve_id are join keys; the rest rank by the first vector component against the query [1, 0, 0].
+ROWS = [
+    ("incidents", "asset_id", "Asset the incident hit"),
+    ("incidents", "severity", "Severity of the incident"),
+    ("incidents", "status", "Open or closed"),
+    ("incidents", "summary", "Free-text summary"),
+    ("incidents", "reporter", "Who reported it"),
+    ("incidents", "cve_id", "CVE involved"),
+]
+EMBEDDINGS = [[0, 1, 0], [0.9, 0.1, 0], [0.8, 0.2, 0], [0.1, 0, 1], [0, 0.2, 1], [0, 1, 1]]
+TABLE = {"table_name": "incidents", **{column: description for _, column, description in ROWS}}
+
+
+@pytest.mark.parametrize("num_columns, expected", [(0, 0), (1, 1), (2, 1), (3, 2), (6, 3), (8, 4), (30, 4)])
+def test_column_budget_prunes_small_tables_too(num_columns, expected):
+    assert column_budget(num_columns) == expected
+
+
+def test_schema_block_keeps_the_best_columns_and_every_join_key():
+    column_index = ColumnIndex.from_rows(ROWS, EMBEDDINGS)
+    block, _ = build_schema_block([1, 0, 0], [TABLE], column_index)
+    # 4 non-join-key columns -> budget 2: severity and status; both join keys stay, in table order
+    assert block == format_table("incidents", {
+        "asset_id": "Asset the incident hit",
+        "severity": "Severity of the incident",
+        "status": "Open or closed",
+        "cve_id": "CVE involved",
+    })
+
+
+def test_unknown_tables_and_columns_are_kept_in_full():
+    column_index = ColumnIndex.from_rows(ROWS, EMBEDDINGS)
+    other = {"table_name": "patches", "patch_id": "Patch", "vendor": "Vendor"}
+    block, _ = build_schema_block([1, 0, 0], [{**TABLE, "notes": "Not in the metadata"}, other], column_index)
+    lines = block.split("\n")
+    assert "notes: Not in the metadata" in lines[0]
+    assert lines[1] == format_table("patches", {"patch_id": "Patch", "vendor": "Vendor"})
+
+
+def test_report_separates_formatting_and_pruning_savings():
+    column_index = ColumnIndex.from_rows(ROWS, EMBEDDINGS)
+    block, report = build_schema_block([1, 0, 0], [TABLE], column_index)
+    columns = {key: value for key, value in TABLE.items() if key != "table_name"}
+    assert report["full_schema_tokens"] == count_tokens(str({"incidents": columns}))
+    assert report["compact_schema_tokens"] == count_tokens(format_table("incidents", columns))
+    assert report["pruned_schema_tokens"] == count_tokens(block)
+    assert report["formatting_saved_tokens"] == report["full_schema_tokens"] - report["compact_schema_tokens"]
+    assert report["pruning_saved_tokens"] == report["compact_schema_tokens"] - report["pruned_schema_tokens"] > 0
+    assert report["saved_tokens"] == report["formatting_saved_tokens"] + report["pruning_saved_tokens"]
+
+
+def test_setup_column_index_embeds_only_new_rows_and_replaces_in_place(tmp_path):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE metadata (table_name TEXT, column_name TEXT, column_description TEXT)")
+    conn.executemany("INSERT INTO metadata VALUES (?, ?, ?)", ROWS[:3])
+    store = EmbeddingStore(str(tmp_path / "embeddings.db"))
+    embedded = []
+
+    def get_embeddings(texts, model):
+        embedded.extend(texts)
+        return [[1.0, float(len(text)), 0.0] for text in texts]
+
+    column_index = setup_column_index(conn, store, get_embeddings)
+    assert [column for column, _ in column_index.columns["incidents"]] == ["asset_id", "severity", "status"]
+    assert len(embedded) == 3
+
+    conn.execute("INSERT INTO metadata VALUES (?, ?, ?)", ROWS[3])
+    column_index.replace(setup_column_index(conn, store, get_embeddings))
+    assert len(embedded) == 4
+    assert [column for column, _ in column_index.columns["incidents"]][-1] == "summary"
@@ -0,0 +1,85 @@
+import sqlite3
+
+import pytest
+
+from databahn.utils import sql_cache
+from databahn.utils.sql_cache import SQLResultCache, canonicalize_sql, database_version
+
+
+@pytest.fixture
+def lexical(monkeypatch):
+    """Exercises the fallback normalization whether or not sqlglot is installed."""
+    monkeypatch.setattr(sql_cache, "sqlglot", None)
+
+
+def test_spelling_differences_share_a_canonical_form(lexical):
+    assert canonicalize_sql("SELECT  *\nFROM Hosts -- all of them\nWHERE id = 1;;") == \
+        canonicalize_sql("select * from hosts where id=1")
+
+
+def test_quoted_text_is_left_alone(lexical):
+    assert canonicalize_sql("SELECT 'Admin' FROM \"Hosts\"") == "select 'Admin' from \"Hosts\""
+    assert canonicalize_sql("SELECT 'Admin'") != canonicalize_sql("SELECT 'admin'")
+
+
+def test_block_comments_are_dropped(lexical):
+    assert canonicalize_sql("SELECT /* cached? */ id FROM hosts") == "select id from hosts"
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / "logs.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE hosts (id INTEGER)")
+    return path
+
+
+def test_version_changes_when_the_database_is_written(db_file):
+    before = database_version(db_file)
+    assert before == database_version(db_file)
+    conn = sqlite3.connect(db_file)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("INSERT INTO hosts VALUES (1)")
+    conn.commit()
+    try:
+        assert database_version(db_file) != before
+    finally:
+        conn.close()
+
+
+def test_missing_database_has_an_empty_stamp(tmp_path):
+    assert database_version(str(tmp_path / "missing.db")) == (0, 0, 0, 0)
+
+
+def test_rewrite_makes_old_entries_unreachable(db_file):
+    cache = SQLResultCache()
+    key = SQLResultCache.make_key(db_file, "SELECT id FROM hosts")
+    cache.put(key, "id\n(0 rows)")
+    assert cache.get(SQLResultCache.make_key(db_file, "select id from hosts;")) == "id\n(0 rows)"
+
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("INSERT INTO hosts VALUES (1)")
+    assert cache.get(SQLResultCache.make_key(db_file, "SELECT id FROM hosts")) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_cache_is_bounded_by_entries_and_bytes():
+    cache = SQLResultCache(max_entries=2, max_bytes=10)
+    cache.put(("a",), "1234")
+    cache.put(("b",), "1234")
+    cache.get(("a",))
+    cache.put(("c",), "1234")
+    assert cache.get(("b",)) is None and cache.get(("a",)) == "1234"
+    cache.put(("d",), "12345678")
+    assert cache.stats()["entries"] == 1 and cache.stats()["bytes"] == 8
+    cache.put(("e",), "x" * 11)
+    assert cache.get(("e",)) is None
+
+
+def test_invalidate_drops_only_that_database(db_file, tmp_path):
+    cache = SQLResultCache()
+    cache.put(SQLResultCache.make_key(db_file, "SELECT 1"), "1")
+    other = SQLResultCache.make_key(str(tmp_path / "other.db"), "SELECT 1")
+    cache.put(other, "1")
+    cache.invalidate(db_file)
+    assert cache.stats()["entries"] == 1 and cache.get(other) == "1"
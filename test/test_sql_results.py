@@ -0,0 +1,42 @@
+import sqlite3
+
+import pytest
+
+from databahn.utils.sql_results import fetch_tsv, format_value
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE hosts (id INTEGER, name TEXT)")
+    conn.executemany("INSERT INTO hosts VALUES (?, ?)", [(i, f"host{i}") for i in range(1, 11)])
+    yield conn
+    conn.close()
+
+
+def test_full_result_ends_with_row_count(conn):
+    tsv = fetch_tsv(conn.execute("SELECT id, name FROM hosts WHERE id <= 2 ORDER BY id"))
+    assert tsv == "id\tname\n1\thost1\n2\thost2\n(2 rows)"
+    assert fetch_tsv(conn.execute("SELECT id FROM hosts WHERE id = 1")).endswith("(1 row)")
+    assert fetch_tsv(conn.execute("SELECT id FROM hosts WHERE id > 100")) == "id\n(0 rows)"
+
+
+def test_row_limit_counts_the_rest(conn):
+    tsv = fetch_tsv(conn.execute("SELECT id FROM hosts ORDER BY id"), max_rows=3, batch_size=2)
+    assert tsv.splitlines() == ["id", "1", "2", "3", "... truncated: showing 3 of 10 rows (row limit 3)"]
+
+
+def test_byte_limit_includes_the_header(conn):
+    # "id\tname\n" is 8 bytes and each "N\thostN\n" row 8 bytes, so 30 bytes fit the header and 2 rows
+    tsv = fetch_tsv(conn.execute("SELECT id, name FROM hosts ORDER BY id"), max_bytes=30)
+    assert tsv.splitlines()[1:] == ["1\thost1", "2\thost2", "... truncated: showing 2 of 10 rows (byte limit 30)"]
+
+
+def test_statement_without_result_columns(conn):
+    assert fetch_tsv(conn.execute("UPDATE hosts SET name = name")) == "(0 rows)"
+
+
+def test_cells_that_would_break_the_layout_are_escaped():
+    assert format_value(None) == "NULL"
+    assert format_value(b"\x00\x01") == "<2 bytes>"
+    assert format_value("a\tb\nc\\d\r") == "a\\tb\\nc\\\\d\\r"
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+from databahn.utils.sqlite_pool import QueryTimeoutError, SQLitePool
+
+# Counts far enough to run for minutes unless it is interrupted
+SLOW_QUERY = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM (SELECT i FROM n LIMIT 1000000000)"
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / "logs.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE hosts (id INTEGER, name TEXT)")
+        conn.executemany("INSERT INTO hosts VALUES (?, ?)", [(1, "web"), (2, "db")])
+    return path
+
+
+def test_queries_run_on_a_wal_database(db_file):
+    pool = SQLitePool(db_file, max_connections=2)
+    try:
+        rows = asyncio.run(pool.execute("SELECT name FROM hosts WHERE id = ?", (2,)))
+    finally:
+        pool.close()
+    assert rows == [("db",)]
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+@pytest.mark.parametrize("sql", ["DELETE FROM hosts", "CREATE TABLE notes (text TEXT)"])
+def test_writes_are_refused(db_file, sql):
+    pool = SQLitePool(db_file, max_connections=1)
+    try:
+        with pytest.raises(sqlite3.Error):
+            asyncio.run(pool.execute(sql))
+    finally:
+        pool.close()
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM hosts").fetchone()[0] == 2
+
+
+def test_query_past_its_timeout_is_interrupted(db_file):
+    pool = SQLitePool(db_file, max_connections=1, timeout_seconds=0.2, progress_steps=1000)
+
+    async def run():
+        with pytest.raises(QueryTimeoutError):
+            await pool.execute(SLOW_QUERY)
+        # The interrupted query gave its connection back
+        return await pool.execute("SELECT COUNT(*) FROM hosts", timeout=5)
+
+    try:
+        assert asyncio.run(run()) == [(2,)]
+    finally:
+        pool.close()
+
+
+def test_cancelled_caller_interrupts_its_query(db_file):
+    pool = SQLitePool(db_file, max_connections=1, timeout_seconds=600, progress_steps=1000)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pool.execute(SLOW_QUERY), timeout=0.2)
+        return await asyncio.wait_for(pool.execute("SELECT COUNT(*) FROM hosts"), timeout=5)
+
+    try:
+        assert asyncio.run(run()) == [(2,)]
+    finally:
+        pool.close()
+
+
+def test_workload_log_records_successful_queries(db_file, tmp_path):
+    workload_log = tmp_path / "workload.jsonl"
+    pool = SQLitePool(db_file, max_connections=1, workload_log=str(workload_log))
+
+    async def run():
+        await pool.execute("SELECT * FROM hosts")
+        with pytest.raises(sqlite3.Error):
+            await pool.execute("SELECT * FROM missing")
+
+    try:
+        asyncio.run(run())
+    finally:
+        pool.close()
+    entries = [json.loads(line) for line in workload_log.read_text().splitlines()]
+    assert [(entry["db"], entry["sql"]) for entry in entries] == [(db_file, "SELECT * FROM hosts")]
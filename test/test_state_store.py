@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from databahn.utils.state_store import RedisStateStore, StateConflictError
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class ConcurrentWriter:
+    """Wraps a client so that another client bumps the watched key right after an append reads it."""
+
+    def __init__(self, client, other_client):
+        self.client = client
+        self.other_client = other_client
+
+    def pipeline(self, transaction=True):
+        pipe = self.client.pipeline(transaction=transaction)
+        get = pipe.get
+
+        async def get_then_write(key):
+            value = await get(key)
+            await self.other_client.incr(key)
+            return value
+
+        pipe.get = get_then_write
+        return pipe
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def entry(role, content):
+    return {"role": role, "content": content}
+
+
+def test_load_of_a_new_thread_is_empty(server):
+    store = RedisStateStore(fakeredis.aioredis.FakeRedis(server=server))
+    state, version = asyncio.run(store.load("t1"))
+    assert version == 0
+    assert state["orchestrator"]["chat_history"] == [] and state["response"]["chat_history"] == []
+
+
+def test_append_then_load_returns_the_recent_history(server):
+    store = RedisStateStore(fakeredis.aioredis.FakeRedis(server=server), max_history=3)
+
+    async def run():
+        version = await store.append("t1", {"orchestrator": [entry("user", "q1"), entry("assistant", "a1")], "response": []}, 0)
+        version = await store.append("t1", {"orchestrator": [entry("user", "q2"), entry("assistant", "a2")]}, version)
+        return version, await store.load("t1", history_limit=2), await store.load("t1", history_limit=5)
+
+    version, (recent, loaded_version), (trimmed, _) = asyncio.run(run())
+    assert version == loaded_version == 2
+    assert recent["orchestrator"]["chat_history"] == [entry("user", "q2"), entry("assistant", "a2")]
+    assert trimmed["orchestrator"]["chat_history"] == [entry("assistant", "a1"), entry("user", "q2"), entry("assistant", "a2")]
+    assert recent["response"]["chat_history"] == []
+
+
+def test_append_at_a_stale_version_conflicts(server):
+    store = RedisStateStore(fakeredis.aioredis.FakeRedis(server=server))
+
+    async def run():
+        await store.append("t1", {"orchestrator": [entry("user", "first")]}, 0)
+        with pytest.raises(StateConflictError):
+            await store.append("t1", {"orchestrator": [entry("user", "second")]}, 0)
+        return await store.load("t1")
+
+    state, version = asyncio.run(run())
+    assert version == 1
+    assert state["orchestrator"]["chat_history"] == [entry("user", "first")]
+
+
+def test_write_between_watch_and_exec_conflicts(server):
+    store = RedisStateStore(ConcurrentWriter(fakeredis.aioredis.FakeRedis(server=server), fakeredis.aioredis.FakeRedis(server=server)))
+    reader = RedisStateStore(fakeredis.aioredis.FakeRedis(server=server))
+
+    async def run():
+        with pytest.raises(StateConflictError, match="concurrent turn"):
+            await store.append("t1", {"orchestrator": [entry("user", "lost")]}, 0)
+        return await reader.load("t1")
+
+    state, version = asyncio.run(run())
+    assert version == 1
+    assert state["orchestrator"]["chat_history"] == []
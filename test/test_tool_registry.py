@@ -0,0 +1,108 @@
+import asyncio
+from types import SimpleNamespace
+
+from mcp import types
+
+from databahn.tools import tool_registry
+from databahn.tools.tool_registry import ToolRegistry
+
+
+def make_tool(name, properties=None):
+    return types.Tool(name=name, description=f"{name} tool",
+                      inputSchema={"type": "object", "properties": {"query": {"type": "string"}} if properties is None else properties})
+
+
+class FakeSession:
+    def __init__(self, *tools):
+        self.tools = list(tools)
+        self.list_calls = 0
+        self.fail = False
+
+    async def list_tools(self):
+        self.list_calls += 1
+        await asyncio.sleep(0)
+        if self.fail:
+            raise ConnectionError("server went away")
+        return SimpleNamespace(tools=list(self.tools))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def registry_with(monkeypatch, ttl_seconds=60, **sessions):
+    clock = Clock()
+    monkeypatch.setattr(tool_registry, "time", clock)
+    registry = ToolRegistry(ttl_seconds=ttl_seconds)
+    for name, session in sessions.items():
+        registry.register(name, session)
+    return registry, clock
+
+
+def test_first_read_lists_every_session(monkeypatch):
+    search, db = FakeSession(make_tool("web_search")), FakeSession(make_tool("lookup"), make_tool("ping", properties={}))
+    registry, _ = registry_with(monkeypatch, search=search, db=db)
+    sessions = asyncio.run(registry.get_tool_sessions())
+    assert sessions == {"web_search": search, "lookup": db, "ping": db}
+    # Tools without parameters are not offered to the model
+    schemas = asyncio.run(registry.get_tool_schemas())
+    assert [schema["function"]["name"] for schema in schemas["db"]] == ["lookup"]
+    assert (search.list_calls, db.list_calls) == (1, 1)
+
+
+def test_tools_are_cached_until_the_ttl(monkeypatch):
+    session = FakeSession(make_tool("lookup"))
+    registry, clock = registry_with(monkeypatch, ttl_seconds=60, db=session)
+    asyncio.run(registry.get_tool_sessions())
+    clock.now += 59
+    asyncio.run(registry.get_tool_sessions())
+    assert session.list_calls == 1
+    clock.now += 2
+    session.tools.append(make_tool("describe"))
+    assert set(asyncio.run(registry.get_tool_sessions())) == {"lookup", "describe"}
+    assert session.list_calls == 2
+
+
+def test_list_changed_notification_refreshes_only_that_session(monkeypatch):
+    search, db = FakeSession(make_tool("web_search")), FakeSession(make_tool("lookup"))
+    registry, _ = registry_with(monkeypatch, search=search, db=db)
+    asyncio.run(registry.get_tool_sessions())
+
+    notification = types.ServerNotification(types.ToolListChangedNotification(method="notifications/tools/list_changed"))
+    asyncio.run(registry.message_handler("db")(notification))
+    db.tools = [make_tool("lookup_v2")]
+    assert set(asyncio.run(registry.get_tool_sessions())) == {"web_search", "lookup_v2"}
+    assert (search.list_calls, db.list_calls) == (1, 2)
+
+
+def test_other_messages_do_not_mark_tools_stale(monkeypatch):
+    session = FakeSession(make_tool("lookup"))
+    registry, _ = registry_with(monkeypatch, db=session)
+    asyncio.run(registry.get_tool_sessions())
+    asyncio.run(registry.message_handler("db")(RuntimeError("transport error")))
+    asyncio.run(registry.get_tool_sessions())
+    assert session.list_calls == 1
+
+
+def test_failed_listing_keeps_the_cached_tools(monkeypatch):
+    session = FakeSession(make_tool("lookup"))
+    registry, clock = registry_with(monkeypatch, ttl_seconds=60, db=session)
+    asyncio.run(registry.get_tool_sessions())
+    session.fail = True
+    clock.now += 61
+    assert asyncio.run(registry.get_tool_sessions()) == {"lookup": session}
+
+
+def test_concurrent_readers_share_one_refresh(monkeypatch):
+    session = FakeSession(make_tool("lookup"))
+    registry, _ = registry_with(monkeypatch, db=session)
+
+    async def run():
+        await asyncio.gather(*(registry.get_tool_sessions() for _ in range(5)))
+
+    asyncio.run(run())
+    assert session.list_calls == 1
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import pytest
+
+from databahn.utils.tool_retrieval import MCPToolIndex
+
+# Each text is embedded as one axis per topic it mentions
+TOPICS = ["search", "browser", "mail", "firewall", "dns", "assets"]
+
+
+class FakeEmbeddingClient:
+    def __init__(self):
+        self.embedded = []
+
+    async def embed_many(self, texts):
+        self.embedded.extend(texts)
+        return [embed(text) for text in texts]
+
+
+def embed(text):
+    return [1.0 if topic in text.lower() else 0.0 for topic in TOPICS] + [0.1]
+
+
+def tool(name, description="", **tables):
+    if tables:
+        description += f" <table_description>{json.dumps(tables)}</table_description>"
+    return {"type": "function", "function": {"name": name, "description": description,
+                                             "parameters": {"type": "object", "properties": {"query": {"type": "string"}}}}}
+
+
+@pytest.fixture
+def client():
+    return FakeEmbeddingClient()
+
+
+def catalogs_for(index, *sessions):
+    return [asyncio.run(index.refresh(f"session{i}", tools)) for i, tools in enumerate(sessions)]
+
+
+def names(tools):
+    return [tool_schema["function"]["name"] for tool_schema in tools]
+
+
+def test_top_k_plus_pinned_tools_in_original_order(client):
+    index = MCPToolIndex(client, top_k=1, pinned_tools={"send_mail"})
+    catalogs = catalogs_for(index, [tool("send_mail", "mail a report"), tool("web_search", "search the web")],
+                            [tool("open_page", "browser page")])
+    assert names(index.select(catalogs, embed("search for it"))) == ["send_mail", "web_search"]
+    assert names(index.select(catalogs, embed("open it in the browser"))) == ["send_mail", "open_page"]
+
+
+def test_pinned_tools_do_not_use_up_top_k(client):
+    index = MCPToolIndex(client, top_k=2, pinned_tools={"web_search"})
+    catalogs = catalogs_for(index, [tool("web_search", "search the web"), tool("open_page", "browser page"), tool("send_mail", "mail")])
+    assert names(index.select(catalogs, embed("search the browser and mail"))) == ["web_search", "open_page", "send_mail"]
+
+
+def test_without_a_query_embedding_every_tool_is_returned(client):
+    index = MCPToolIndex(client, top_k=1)
+    catalogs = catalogs_for(index, [tool("web_search", "search"), tool("open_page", "browser")])
+    assert names(index.select(catalogs, None)) == ["web_search", "open_page"]
+
+
+def test_tools_are_embedded_again_only_when_the_list_changes(client):
+    index = MCPToolIndex(client)
+    tools = [tool("web_search", "search")]
+    first = asyncio.run(index.refresh("search", tools))
+    assert asyncio.run(index.refresh("search", [dict(tools[0])])) is first
+    assert len(client.embedded) == 1
+    asyncio.run(index.refresh("search", tools + [tool("open_page", "browser")]))
+    assert len(client.embedded) == 3
+
+
+def test_table_descriptions_are_pruned_to_the_query(client):
+    index = MCPToolIndex(client, top_k=1, top_k_tables=1)
+    lookup = tool("lookup", "Run SQL.", firewall_logs={"description": "firewall events"},
+                  dns_logs={"description": "dns queries"}, asset_inventory={"description": "assets"})
+    selected, = index.select(catalogs_for(index, [lookup]), embed("which dns names"))
+    assert "dns_logs" in selected["function"]["description"]
+    assert "firewall_logs" not in selected["function"]["description"]
+    # The cached schema is left untouched
+    assert "firewall_logs" in lookup["function"]["description"]